@@ -0,0 +1,507 @@
+import asyncio
+import collections
+import json
+import random
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+# Локальные заглушки Notion, Reddit и Telegram Bot API для бенчмарков.
+# Отвечают в формате настоящих API ровно настолько, насколько это нужно
+# notion_client, asyncpraw и python-telegram-bot.
+
+WORDS = ("lag", "stream", "controller", "login", "payment", "resolution", "freeze", "audio", "queue", "latency",
+         "disconnect", "keyboard", "mouse", "fps", "ping", "subscription", "refund", "browser", "android", "tv")
+STATUSES = ("In queue", "In progress", "Solved", "Not relevant")
+FLAIRS = ("Help", "Discussion", "Suggestion", "Misc", "Gameplay", "Feedback")
+PLATFORMS = ("Reddit", "Discord", "Telegram")
+MODERATORS = ("Alex_Boosteroid", "Andrew__Boosteroid", "Arthur_Boosteroid", "Mark_Boosteroid")
+REACTIONS = ("Positive", "Negative")
+PROFILES = ("New to cloud", "User in choice", "Boosteroid User")
+AUTHORS = ("Ivan", "Arthur", "Denys", "Roman")
+SUBREDDIT = "BoosteroidCommunity"
+
+
+class FakeApiConfig:
+    """Задержка ответа, доля искусственных 429 по сервисам и Retry-After."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rates: dict = None,
+                 retry_after: float = 1.0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rates = error_rates or {}
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+    def inject_429(self, service: str) -> bool:
+        rate = self.error_rates.get(service, 0.0)
+        return rate > 0 and self.random.random() < rate
+
+
+def parse_error_rates(value: str) -> dict:
+    """'notion=0.02,telegram=0.01' -> {"notion": 0.02, "telegram": 0.01}"""
+    rates = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            service, rate = part.split("=", 1)
+            rates[service.strip()] = float(rate)
+    return rates
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _ts(value: str) -> float:
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _text(content: str) -> list:
+    return [{"type": "text", "text": {"content": content}, "plain_text": content}]
+
+
+class FakeServer:
+    """aiohttp-приложение на свободном порту 127.0.0.1."""
+
+    service = ""
+
+    def __init__(self, config: FakeApiConfig):
+        self.config = config
+        self.requests = collections.Counter()
+        self.injected_429 = 0
+        self.runner = None
+        self.port = None
+
+    def routes(self, app: web.Application):
+        raise NotImplementedError
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.routes(app)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self.runner, sock).start()
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _begin(self, name: str) -> bool:
+        """Учитывает запрос, выдерживает задержку. False — ответить 429."""
+        self.requests[name] += 1
+        await self.config.delay()
+        if self.config.inject_429(self.service):
+            self.injected_429 += 1
+            return False
+        return True
+
+    def snapshot(self) -> dict:
+        return {"requests": sum(self.requests.values()), "by_endpoint": dict(self.requests),
+                "injected_429": self.injected_429}
+
+
+# --- Notion ---
+
+def _match_condition(value, condition: dict, kind: str) -> bool:
+    for op, expected in condition.items():
+        if op == "is_empty":
+            ok = not value
+        elif op == "is_not_empty":
+            ok = bool(value)
+        elif value is None or value == "":
+            ok = op == "does_not_equal"
+        elif kind == "date":
+            left, right = _ts(value), _ts(expected)
+            ok = {"equals": left == right, "before": left < right, "after": left > right,
+                  "on_or_before": left <= right, "on_or_after": left >= right}.get(op, True)
+        elif op == "equals":
+            ok = value == expected
+        elif op == "does_not_equal":
+            ok = value != expected
+        elif op == "contains":
+            ok = expected.casefold() in value.casefold()
+        elif op == "does_not_contain":
+            ok = expected.casefold() not in value.casefold()
+        else:
+            ok = True
+        if not ok:
+            return False
+    return True
+
+
+def _property_value(prop: dict, kind: str):
+    if kind == "date":
+        return (prop.get("date") or {}).get("start")
+    if kind in ("rich_text", "title"):
+        return "".join(item.get("plain_text", "") for item in prop.get(kind) or [])
+    if kind in ("status", "select"):
+        return (prop.get(kind) or {}).get("name")
+    return prop.get(kind)
+
+
+def page_matches(page: dict, flt: dict) -> bool:
+    if not flt:
+        return True
+    if "and" in flt:
+        return all(page_matches(page, item) for item in flt["and"])
+    if "or" in flt:
+        return any(page_matches(page, item) for item in flt["or"])
+    if "timestamp" in flt:
+        field = flt["timestamp"]
+        return _match_condition(page.get(field), flt[field], "date")
+    prop = page["properties"].get(flt.get("property")) or {}
+    for kind in ("date", "rich_text", "title", "status", "select", "url", "email"):
+        if kind in flt:
+            return _match_condition(_property_value(prop, kind), flt[kind], kind)
+    return True
+
+
+class FakeNotion(FakeServer):
+    """/v1/databases/{id}/query, POST /v1/pages, PATCH /v1/pages/{id}."""
+
+    service = "notion"
+
+    def __init__(self, config: FakeApiConfig, databases: dict):
+        super().__init__(config)
+        self.databases = databases
+        self.pages = {page["id"]: (db, page) for db, pages in databases.items() for page in pages}
+        self._versions = collections.Counter()
+        self._results = {}
+
+    def routes(self, app):
+        app.router.add_post("/v1/databases/{database_id}/query", self.query)
+        app.router.add_post("/v1/pages", self.create)
+        app.router.add_patch("/v1/pages/{page_id}", self.update)
+
+    @staticmethod
+    def rate_limited() -> web.Response:
+        return web.json_response({"object": "error", "status": 429, "code": "rate_limited",
+                                  "message": "You have been rate limited."}, status=429)
+
+    def _error_429(self):
+        response = self.rate_limited()
+        response.headers["Retry-After"] = str(self.config.retry_after)
+        return response
+
+    def _filtered(self, database_id: str, body: dict) -> list:
+        # Страницы одного запроса идут по одному отфильтрованному списку, пока база не изменилась
+        key = (database_id, self._versions[database_id],
+               json.dumps(body.get("filter"), sort_keys=True), json.dumps(body.get("sorts"), sort_keys=True))
+        results = self._results.get(key)
+        if results is None:
+            results = [page for page in self.databases.get(database_id, []) if page_matches(page, body.get("filter"))]
+            for sort in reversed(body.get("sorts") or []):
+                if "timestamp" in sort:
+                    field = sort["timestamp"]
+                    sort_key = lambda page: page.get(field) or ""
+                else:
+                    prop = sort["property"]
+                    sort_key = lambda page: _property_value(page["properties"].get(prop) or {}, "date") or ""
+                results.sort(key=sort_key, reverse=sort.get("direction") == "descending")
+            if len(self._results) > 256:
+                self._results.clear()
+            self._results[key] = results
+        return results
+
+    async def query(self, request):
+        if not await self._begin("databases.query"):
+            return self._error_429()
+        database_id = request.match_info["database_id"]
+        if database_id not in self.databases:
+            return web.json_response({"object": "error", "status": 404, "code": "object_not_found",
+                                      "message": f"Could not find database with ID: {database_id}."}, status=404)
+        body = await request.json()
+        results = self._filtered(database_id, body)
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size") or 100), 100)
+        chunk = results[start:start + size]
+        has_more = start + size < len(results)
+        return web.json_response({"object": "list", "results": chunk, "has_more": has_more,
+                                  "next_cursor": str(start + size) if has_more else None})
+
+    async def create(self, request):
+        if not await self._begin("pages.create"):
+            return self._error_429()
+        body = await request.json()
+        database_id = body["parent"]["database_id"]
+        now = iso(time.time())
+        page = {"object": "page", "id": str(uuid.uuid4()), "created_time": now, "last_edited_time": now,
+                "parent": body["parent"], "properties": _with_plain_text(body.get("properties", {}))}
+        self.databases.setdefault(database_id, []).append(page)
+        self.pages[page["id"]] = (database_id, page)
+        self._versions[database_id] += 1
+        return web.json_response(page)
+
+    async def update(self, request):
+        if not await self._begin("pages.update"):
+            return self._error_429()
+        body = await request.json()
+        found = self.pages.get(request.match_info["page_id"])
+        if found is None:
+            return web.json_response({"object": "error", "status": 404, "code": "object_not_found",
+                                      "message": "Could not find page."}, status=404)
+        database_id, page = found
+        page["properties"].update(_with_plain_text(body.get("properties", {})))
+        page["last_edited_time"] = iso(time.time())
+        self._versions[database_id] += 1
+        return web.json_response(page)
+
+
+def _with_plain_text(properties: dict) -> dict:
+    """Как в ответах Notion: у текстовых свойств есть plain_text."""
+    for prop in properties.values():
+        for kind in ("rich_text", "title"):
+            for item in prop.get(kind) or []:
+                item.setdefault("plain_text", item.get("text", {}).get("content", ""))
+    return properties
+
+
+def generate_databases(size: int, db_ids: dict, days: int = 35, seed: int = 1) -> dict:
+    """
+    Синтетические базы: size технических проблем и комментариев Reddit,
+    по size // 10 записей аналитики и комментариев Youtube, даты за последние days дней.
+    db_ids: {"issues": ..., "reddit_comments": ..., "analytics": ..., "youtube": ...}
+    """
+    rnd = random.Random(seed)
+    now = time.time()
+    span = days * 86400
+
+    def page(properties, ts):
+        edited = iso(ts)
+        return {"object": "page", "id": str(uuid.UUID(int=rnd.getrandbits(128))), "created_time": edited,
+                "last_edited_time": edited, "properties": properties}
+
+    def dates(count):
+        return sorted(now - rnd.random() * span for _ in range(count))
+
+    databases = {}
+    issues = []
+    for i, ts in enumerate(dates(size)):
+        title = " ".join(rnd.sample(WORDS, 3))
+        answered = rnd.random() < 0.6
+        issues.append(page({
+            "Date": {"type": "date", "date": {"start": iso(ts)}},
+            "ID": {"type": "rich_text", "rich_text": _text(f"p{i:06d}")},
+            "Username": {"type": "title", "title": _text(f"user_{rnd.randrange(size // 3 + 1)}")},
+            "Title": {"type": "rich_text", "rich_text": _text(title)},
+            "Platform": {"type": "select", "select": {"name": rnd.choice(PLATFORMS)}},
+            "URL": {"type": "url", "url": f"https://www.reddit.com/r/{SUBREDDIT}/comments/p{i:06d}/"},
+            "Description": {"type": "rich_text", "rich_text": _text(f"{title} " * 8)},
+            "Status": {"type": "status", "status": {"name": rnd.choice(STATUSES)}},
+            "Post Flair": {"type": "select", "select": {"name": rnd.choice(FLAIRS)}},
+            "Email": {"type": "email", "email": None},
+            "Responsible moderator": {"type": "rich_text",
+                                      "rich_text": _text(rnd.choice(MODERATORS)) if answered else []},
+            "Response from moderator": {"type": "rich_text", "rich_text": _text("Thanks, fixed") if answered else []},
+        }, ts))
+    databases[db_ids["issues"]] = issues
+    databases[db_ids["reddit_comments"]] = [page({
+        "Date": {"type": "date", "date": {"start": iso(ts)}},
+        "Username": {"type": "title", "title": _text(f"user_{rnd.randrange(size // 3 + 1)}")},
+        "Comment Text": {"type": "rich_text", "rich_text": _text(" ".join(rnd.sample(WORDS, 5)))},
+        "URL": {"type": "url", "url": f"https://reddit.com/r/{SUBREDDIT}/comments/x/c{i}/"},
+    }, ts) for i, ts in enumerate(dates(size))]
+    databases[db_ids["analytics"]] = [page({
+        "Date": {"type": "date", "date": {"start": iso(ts)}},
+        "Title": {"type": "rich_text", "rich_text": _text(" ".join(rnd.sample(WORDS, 3)))},
+        "Reaction": {"type": "select", "select": {"name": rnd.choice(REACTIONS)}},
+        "URL": {"type": "url", "url": f"https://www.reddit.com/r/{SUBREDDIT}/comments/a{i}/"},
+    }, ts) for i, ts in enumerate(dates(max(1, size // 10)))]
+    if db_ids.get("youtube"):
+        databases[db_ids["youtube"]] = [page({
+            "Date": {"type": "date", "date": {"start": iso(ts)}},
+            "Youtube Channel": {"type": "rich_text", "rich_text": _text("Channel")},
+            "Link to the video": {"type": "url", "url": f"https://youtube.com/watch?v=v{i}"},
+            "Text of the comment": {"type": "rich_text", "rich_text": _text(" ".join(rnd.sample(WORDS, 4)))},
+            "Profile": {"type": "select", "select": {"name": rnd.choice(PROFILES)}},
+            "Author ( Community Manager )": {"type": "select", "select": {"name": rnd.choice(AUTHORS)}},
+        }, ts) for i, ts in enumerate(dates(max(1, size // 10)))]
+    return databases
+
+
+# --- Reddit ---
+
+class FakeReddit(FakeServer):
+    """Токен OAuth, листинги /r/{sub}/new и /r/{sub}/comments, /comments/{id} для submission.load()."""
+
+    service = "reddit"
+    LISTING = re.compile(r"^/r/[^/]+/(new|comments)/?$")
+    SUBMISSION = re.compile(r"^/comments/([^/]+)/?")
+
+    def __init__(self, config: FakeApiConfig, posts: int = 200, comments: int = 500, window: float = 3000,
+                 moderator_every: int = 5, seed: int = 1):
+        super().__init__(config)
+        rnd = random.Random(seed)
+        now = time.time()
+        # От новых к старым, как отдаёт Reddit; все элементы укладываются в окно первого запуска
+        self.posts = [self._post(i, now - window * i / max(posts, 1), rnd) for i in range(posts)]
+        self.comments = [self._comment(i, now - window * i / max(comments, 1), rnd, self.posts)
+                         for i in range(comments)]
+        self.moderator_every = moderator_every
+
+    @staticmethod
+    def _post(i, created, rnd):
+        post_id = f"p{i:06d}"
+        title = " ".join(rnd.sample(WORDS, 3))
+        return {"id": post_id, "name": f"t3_{post_id}", "title": title, "selftext": f"{title} " * 5,
+                "author": f"user_{rnd.randrange(1000)}", "created_utc": created,
+                "link_flair_text": rnd.choice(FLAIRS + ("Announcement",)), "subreddit": SUBREDDIT,
+                "url": f"https://www.reddit.com/r/{SUBREDDIT}/comments/{post_id}/",
+                "permalink": f"/r/{SUBREDDIT}/comments/{post_id}/", "num_comments": 0, "is_self": True}
+
+    @staticmethod
+    def _comment(i, created, rnd, posts, author=None):
+        comment_id = f"c{i:06d}"
+        post = posts[rnd.randrange(len(posts))] if posts else {"id": "p000000"}
+        return {"id": comment_id, "name": f"t1_{comment_id}", "body": " ".join(rnd.sample(WORDS, 6)),
+                "author": author or f"user_{rnd.randrange(1000)}", "created_utc": created,
+                "link_id": f"t3_{post['id']}", "parent_id": f"t3_{post['id']}", "subreddit": SUBREDDIT,
+                "permalink": f"/r/{SUBREDDIT}/comments/{post['id']}/_/{comment_id}/", "replies": ""}
+
+    def routes(self, app):
+        app.router.add_post("/api/v1/access_token", self.token)
+        app.router.add_get("/{tail:.*}", self.get)
+
+    def _response(self, payload):
+        return web.json_response(payload, headers={
+            "x-ratelimit-remaining": "600", "x-ratelimit-used": "0", "x-ratelimit-reset": "600"})
+
+    async def token(self, request):
+        self.requests["access_token"] += 1
+        return web.json_response({"access_token": "bench", "token_type": "bearer", "expires_in": 86400,
+                                  "scope": "*"})
+
+    @staticmethod
+    def _listing(kind, items, after=None):
+        return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(items),
+                                            "children": [{"kind": kind, "data": item} for item in items]}}
+
+    def _page(self, items, query):
+        limit = min(int(query.get("limit", 25)), 100)
+        before = query.get("before")
+        if before:
+            names = [item["name"] for item in items]
+            items = items[:names.index(before)] if before in names else items
+        start = 0
+        after = query.get("after")
+        if after:
+            names = [item["name"] for item in items]
+            start = names.index(after) + 1 if after in names else len(items)
+        chunk = items[start:start + limit]
+        next_after = chunk[-1]["name"] if len(chunk) == limit and start + limit < len(items) else None
+        return chunk, next_after
+
+    async def get(self, request):
+        path = request.path
+        listing = self.LISTING.match(path)
+        submission = self.SUBMISSION.match(path)
+        name = f"listing.{listing.group(1)}" if listing else "submission" if submission else "other"
+        if not await self._begin(name):
+            return web.json_response({"message": "Too Many Requests", "error": 429}, status=429)
+        if listing:
+            if listing.group(1) == "new":
+                chunk, after = self._page(self.posts, request.query)
+                return self._response(self._listing("t3", chunk, after))
+            chunk, after = self._page(self.comments, request.query)
+            return self._response(self._listing("t1", chunk, after))
+        if submission:
+            post_id = submission.group(1)
+            post = next((p for p in self.posts if p["id"] == post_id), None)
+            if post is None:
+                return web.json_response({"message": "Not Found", "error": 404}, status=404)
+            index = int(post_id[1:])
+            replies = []
+            if self.moderator_every and index % self.moderator_every == 0:
+                moderator = MODERATORS[index % len(MODERATORS)]
+                reply = self._comment(index, post["created_utc"] + 60, random.Random(index), [post], moderator)
+                replies.append(reply)
+            return self._response([self._listing("t3", [post]), self._listing("t1", replies)])
+        return web.json_response({"message": "Not Found", "error": 404}, status=404)
+
+
+# --- Telegram ---
+
+class FakeTelegram(FakeServer):
+    """/bot{token}/{method}: getMe, sendMessage, sendDocument, editMessage*, answerCallbackQuery."""
+
+    service = "telegram"
+
+    def __init__(self, config: FakeApiConfig):
+        super().__init__(config)
+        self.message_id = 0
+        self.sent_bytes = 0
+        # Успешно выполненные вызовы по методам (без ответов 429)
+        self.delivered = collections.Counter()
+        # Последняя клавиатура по чату — бенчмарк «нажимает» её кнопки
+        self.last_markup = {}
+
+    def routes(self, app):
+        app.router.add_post("/bot{token}/{method}", self.call)
+        app.router.add_get("/bot{token}/{method}", self.call)
+
+    def _message(self, chat_id, text="", message_id=None):
+        if message_id is None:
+            self.message_id += 1
+            message_id = self.message_id
+        return {"message_id": int(message_id), "date": int(time.time()), "text": text,
+                "chat": {"id": int(chat_id), "type": "group", "title": "bench"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}}
+
+    async def call(self, request):
+        method = request.match_info["method"]
+        if not await self._begin(method):
+            retry_after = max(1, int(round(self.config.retry_after)))
+            return web.json_response({"ok": False, "error_code": 429,
+                                      "description": f"Too Many Requests: retry after {retry_after}",
+                                      "parameters": {"retry_after": retry_after}}, status=429)
+        params = dict(await request.post()) if request.can_read_body else {}
+        chat_id = params.get("chat_id", "0")
+        if "reply_markup" in params:
+            self.last_markup[str(chat_id)] = json.loads(params["reply_markup"])
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": True,
+                      "supports_inline_queries": False}
+        elif method == "sendMessage":
+            self.sent_bytes += len(params.get("text", "").encode("utf-8"))
+            result = self._message(chat_id, params.get("text", ""))
+        elif method == "sendDocument":
+            document = params.get("document")
+            if hasattr(document, "file"):
+                self.sent_bytes += len(document.file.read())
+            result = self._message(chat_id)
+            result["document"] = {"file_id": "doc", "file_unique_id": "doc"}
+        elif method in ("editMessageText", "editMessageReplyMarkup"):
+            result = self._message(chat_id, params.get("text", ""), params.get("message_id"))
+        else:
+            result = True
+        self.delivered[method] += 1
+        return web.json_response({"ok": True, "result": result})
+
+    def snapshot(self) -> dict:
+        stats = super().snapshot()
+        stats["sent_bytes"] = self.sent_bytes
+        stats["delivered"] = dict(self.delivered)
+        return stats
@@ -0,0 +1,404 @@
+"""
+Бенчмарки пайплайнов на локальных заглушках Notion, Reddit и Telegram (benchmarks/fakeApis).
+Продакшен-API не используются. Запуск из папки NewBoosteroidCode:
+
+    python -m benchmarks.runBenchmarks.runBenchmarks --sizes 1k,10k --latency-ms 20 \\
+        --inject-429 notion=0.01,telegram=0.01 --output bench.json --baseline bench_prev.json
+
+Результат — JSON со временем и числом запросов по каждому сценарию. С --baseline
+сценарии, ставшие медленнее больше чем на --tolerance или упавшие с ошибкой
+(в базовом прогоне без ошибки), помечаются как регрессии (код выхода 1).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fakeApis.fakeApis import (
+    FakeApiConfig, FakeNotion, FakeReddit, FakeTelegram, generate_databases, parse_error_rates, WORDS
+)
+
+DB_IDS = {
+    "issues": "11111111-1111-1111-1111-111111111111",
+    "reddit_comments": "22222222-2222-2222-2222-222222222222",
+    "analytics": "33333333-3333-3333-3333-333333333333",
+    "youtube": "44444444-4444-4444-4444-444444444444",
+}
+TELEGRAM_TOKEN = "123456:bench"
+CHAT_ID = 1000
+# Параметры стенда, при различии которых прогоны несравнимы
+COMPARABLE_CONFIG = ("latency_ms", "jitter_ms", "inject_429", "retry_after", "notion_rate", "notion_burst",
+                     "reddit_posts", "reddit_comments", "commands", "seed")
+SCENARIOS = ("mirror_sync", "search_index", "send_report", "scan_posts", "scan_comments", "telegram_commands")
+
+# Без init_config модули берут базы из конфигурации, собранной из окружения при первом обращении
+os.environ.update({
+    "NOTION_TECHNICAL_ISSUES_DB": DB_IDS["issues"],
+    "NOTION_REDDIT_COMMENTS_DB": DB_IDS["reddit_comments"],
+    "NOTION_ANALYTICS_DB": DB_IDS["analytics"],
+    "NOTION_YOUTUBE_DB": DB_IDS["youtube"],
+})
+
+from notion_client import AsyncClient  # noqa: E402
+from telegram import Bot, Update  # noqa: E402
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler  # noqa: E402
+
+from common.checkpointStore.checkpointStore import init_checkpoint_store  # noqa: E402
+from notion.notionMirror.notionMirror import NotionMirror  # noqa: E402
+from notion.notionPageIndex.notionPageIndex import init_page_index  # noqa: E402
+from notion.notionRateLimiter.notionRateLimiter import (  # noqa: E402
+    init_rate_limiter, rate_limited, BACKGROUND, INTERACTIVE
+)
+from notion.notionRollups.notionRollups import NotionRollups, ISSUES, REDDIT_COMMENTS, ANALYTICS, YOUTUBE  # noqa: E402
+from notion.notionSearchIndex.notionSearchIndex import IssueSearchIndex  # noqa: E402
+from notion.notionWriter.notionWriter import NotionWriter  # noqa: E402
+from notion.redditToNotion.redditToNotion import scan_posts_and_add_to_notion  # noqa: E402
+from notion.redditCommentsToNotion.redditCommentsToNotion import scan_comments_and_add_to_notion  # noqa: E402
+from redditFunctions.redditClient.redditClient import init_reddit_client, close_reddit  # noqa: E402
+from telegramFunctions.telegramReport.telegramReport import init_report_vars, send_report  # noqa: E402
+from telegramFunctions.сhangeStatus.changeStatus import handle_change_status, button_handler  # noqa: E402
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    return int(value)
+
+
+class Stand:
+    """Заглушки API и клиенты приложения, настроенные на них, для одного размера данных."""
+
+    def __init__(self, args, size: int, workdir: str):
+        self.args = args
+        self.size = size
+        self.workdir = workdir
+        config = FakeApiConfig(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                               error_rates=parse_error_rates(args.inject_429), retry_after=args.retry_after,
+                               seed=args.seed)
+        self.notion = FakeNotion(config, generate_databases(size, DB_IDS, seed=args.seed))
+        self.reddit = FakeReddit(config, posts=args.reddit_posts, comments=args.reddit_comments, seed=args.seed)
+        self.telegram = FakeTelegram(config)
+        self.servers = {"notion": self.notion, "reddit": self.reddit, "telegram": self.telegram}
+
+    async def start(self):
+        for server in self.servers.values():
+            await server.start()
+        self.limiter = init_rate_limiter(rate=self.args.notion_rate, burst=self.args.notion_burst)
+        self.client = AsyncClient(auth="bench", base_url=self.notion.url)
+        self.mirror = NotionMirror(
+            rate_limited(self.client, BACKGROUND), list(DB_IDS.values()),
+            path=os.path.join(self.workdir, "notion_mirror.sqlite3"),
+            rollups=NotionRollups({
+                DB_IDS["issues"]: ISSUES,
+                DB_IDS["reddit_comments"]: REDDIT_COMMENTS,
+                DB_IDS["analytics"]: ANALYTICS,
+                DB_IDS["youtube"]: YOUTUBE,
+            }),
+        )
+        self.report_bot = Bot(token=TELEGRAM_TOKEN, base_url=f"{self.telegram.url}/bot")
+        await self.report_bot.initialize()
+        init_report_vars("bench", DB_IDS["issues"], DB_IDS["analytics"], TELEGRAM_TOKEN, CHAT_ID, self.mirror,
+                         notion_client=self.client, telegram_bot=self.report_bot)
+        init_checkpoint_store(os.path.join(self.workdir, "checkpoints.json"))
+        init_page_index(os.path.join(self.workdir, "page_index.sqlite3"))
+        self.writer = NotionWriter(client=self.client, limiter=self.limiter)
+        init_reddit_client("bench", "bench", "boosteroid-bench/1.0",
+                           oauth_url=self.reddit.url, reddit_url=self.reddit.url)
+        self.search_index = IssueSearchIndex(self.mirror, DB_IDS["issues"])
+        return self
+
+    async def stop(self):
+        await close_reddit()
+        await self.report_bot.shutdown()
+        self.mirror.close()
+        for server in self.servers.values():
+            await server.stop()
+
+    def counters(self) -> dict:
+        return {name: server.snapshot() for name, server in self.servers.items()}
+
+
+def _delta(before: dict, after: dict, field: str) -> dict:
+    return {name: after[name][field] - before[name][field] for name in after}
+
+
+async def measure(stand: Stand, scenario: str, variant: str, run, ops=None) -> dict:
+    before = stand.counters()
+    error = None
+    started = time.perf_counter()
+    try:
+        result = await run()
+    except Exception as e:
+        result = None
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    after = stand.counters()
+    ops = ops(result) if callable(ops) else ops
+    entry = {
+        "scenario": scenario,
+        "variant": variant,
+        "dataset": stand.size,
+        "seconds": round(seconds, 4),
+        "ops": ops,
+        "ops_per_sec": round(ops / seconds, 2) if ops and seconds > 0 else None,
+        "requests": _delta(before, after, "requests"),
+        "injected_429": _delta(before, after, "injected_429"),
+        "error": error,
+    }
+    if isinstance(result, dict) and "errors" in result:
+        entry["handler_errors"] = result["errors"]
+    print(f"  {scenario}/{variant} [{stand.size}]: {seconds:.3f} с"
+          f"{' — ' + error if error else ''}", file=sys.stderr)
+    return entry
+
+
+# --- Команды Telegram ---
+
+def _user():
+    return {"id": 42, "is_bot": False, "first_name": "Moderator", "username": "moderator"}
+
+
+def _chat():
+    return {"id": CHAT_ID, "type": "group", "title": "bench"}
+
+
+def command_update(bot, update_id: int, text: str) -> Update:
+    command = text.split()[0]
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": int(time.time()), "chat": _chat(), "from": _user(),
+                    "text": text, "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}]},
+    }, bot)
+
+
+def callback_update(bot, update_id: int, data: str) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {"id": str(update_id), "from": _user(), "chat_instance": "bench", "data": data,
+                           "message": {"message_id": update_id, "date": int(time.time()), "chat": _chat(),
+                                       "from": {"id": 1, "is_bot": True, "first_name": "Bench"}, "text": "…"}},
+    }, bot)
+
+
+def _buttons(telegram: FakeTelegram) -> list:
+    markup = telegram.last_markup.get(str(CHAT_ID)) or {}
+    return [button.get("callback_data", "") for row in markup.get("inline_keyboard", []) for button in row]
+
+
+async def run_telegram_commands(stand: Stand, iterations: int) -> dict:
+    """
+    /changestatus <слово> → следующая страница результатов → выбор записи → новый статус,
+    через настоящий Application и обработчики из changeStatus.
+    """
+    app = (Application.builder().token(TELEGRAM_TOKEN).base_url(f"{stand.telegram.url}/bot")
+           .updater(None).build())
+    app.bot_data["notion"] = rate_limited(stand.client, INTERACTIVE)
+    app.bot_data["NOTION_TECHNICAL_ISSUES_DB"] = DB_IDS["issues"]
+    app.bot_data["mirror"] = stand.mirror
+    app.bot_data["search_index"] = stand.search_index
+    app.add_handler(CommandHandler("changestatus", handle_change_status))
+    app.add_handler(CallbackQueryHandler(button_handler))
+    outcome = {"errors": 0, "updates": 0}
+
+    async def on_error(update, context):
+        outcome["errors"] += 1
+
+    app.add_error_handler(on_error)
+    await app.initialize()
+    update_id = 0
+    try:
+        for i in range(iterations):
+            update_id += 1
+            stand.telegram.last_markup.pop(str(CHAT_ID), None)
+            await app.process_update(command_update(app.bot, update_id, f"/changestatus {WORDS[i % len(WORDS)]}"))
+            outcome["updates"] += 1
+            for prefix in ("pg|", "csp_", "ss|"):
+                data = next((data for data in _buttons(stand.telegram)
+                             if data.startswith(prefix) and not data.endswith("|-")), None)
+                if data is None:
+                    break
+                update_id += 1
+                await app.process_update(callback_update(app.bot, update_id, data))
+                outcome["updates"] += 1
+    finally:
+        await app.shutdown()
+    return outcome
+
+
+# --- Сценарии ---
+
+async def run_report(stand: Stand, report_type: str, force_refresh: bool = False):
+    """send_report сам перехватывает ошибки отправки — успех проверяется по доставленным в заглушку вызовам."""
+    before = dict(stand.telegram.delivered)
+    await send_report(report_type, force_refresh)
+    missing = [method for method in ("sendMessage", "sendDocument")
+               if stand.telegram.delivered[method] <= before.get(method, 0)]
+    if missing:
+        raise RuntimeError(f"отчёт не доставлен: нет {', '.join(missing)}")
+
+
+async def run_size(args, size: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="boosteroid-bench-") as workdir:
+        stand = await Stand(args, size, workdir).start()
+        try:
+            selected = set(args.scenarios)
+            if "mirror_sync" in selected or "send_report" in selected or "search_index" in selected \
+                    or "telegram_commands" in selected:
+                results.append(await measure(stand, "mirror_sync", "full", lambda: stand.mirror.sync_all(full=True),
+                                             ops=lambda stats: sum(s.rows for s in stats.values())))
+            if "search_index" in selected or "telegram_commands" in selected:
+                results.append(await measure(stand, "search_index", "refresh",
+                                             lambda: stand.search_index.refresh(sync=False),
+                                             ops=lambda _: len(stand.search_index)))
+            if "send_report" in selected:
+                for report_type in args.reports:
+                    results.append(await measure(stand, "send_report", f"{report_type}/mirror",
+                                                 lambda: run_report(stand, report_type), ops=1))
+                    if args.api_reports:
+                        results.append(await measure(stand, "send_report", f"{report_type}/api",
+                                                     lambda: run_report(stand, report_type, force_refresh=True),
+                                                     ops=1))
+            if "scan_posts" in selected:
+                results.append(await measure(stand, "scan_posts", "initial",
+                                             lambda: scan_posts_and_add_to_notion(stand.writer, DB_IDS["issues"]),
+                                             ops=args.reddit_posts))
+            if "scan_comments" in selected:
+                results.append(await measure(stand, "scan_comments", "initial",
+                                             lambda: scan_comments_and_add_to_notion(stand.writer, []),
+                                             ops=args.reddit_comments))
+            if "telegram_commands" in selected:
+                results.append(await measure(stand, "telegram_commands", "changestatus",
+                                             lambda: run_telegram_commands(stand, args.commands),
+                                             ops=lambda outcome: outcome["updates"] if outcome else None))
+        finally:
+            await stand.stop()
+    return results
+
+
+def compare(results: list, baseline: dict, tolerance: float, min_delta: float) -> list:
+    """
+    Сценарии, ставшие медленнее базового прогона больше чем на tolerance (и на min_delta
+    секунд), а также упавшие с ошибкой, хотя в базовом прогоне ошибки не было.
+    """
+    previous = {(r["scenario"], r["variant"], r["dataset"]): r for r in baseline.get("results", [])}
+    comparison = []
+    for result in results:
+        base = previous.get((result["scenario"], result["variant"], result["dataset"]))
+        if base is None or base.get("error"):
+            continue
+        if result.get("error"):
+            comparison.append({"scenario": result["scenario"], "variant": result["variant"],
+                               "dataset": result["dataset"], "baseline_seconds": base["seconds"],
+                               "seconds": result["seconds"], "ratio": None, "regression": True,
+                               "error": result["error"]})
+            continue
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] else None
+        regression = (ratio is not None and ratio > 1 + tolerance
+                      and result["seconds"] - base["seconds"] > min_delta)
+        comparison.append({"scenario": result["scenario"], "variant": result["variant"],
+                           "dataset": result["dataset"], "baseline_seconds": base["seconds"],
+                           "seconds": result["seconds"], "ratio": round(ratio, 3) if ratio else None,
+                           "regression": regression})
+    return comparison
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки на локальных заглушках Notion, Reddit и Telegram")
+    parser.add_argument("--sizes", default="1k", help="размеры баз Notion через запятую: 1k,10k,100k")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="сценарии через запятую")
+    parser.add_argument("--reports", default="day,weekly", help="типы отчётов для send_report")
+    parser.add_argument("--api-reports", action="store_true", help="также строить отчёты напрямую из Notion API")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка каждого ответа заглушек")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="случайная добавка к задержке")
+    parser.add_argument("--inject-429", default="", help="доля ответов 429 по сервисам: notion=0.02,telegram=0.01")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After в ответах 429, секунды")
+    parser.add_argument("--notion-rate", type=float, default=1000.0, help="лимит запросов к Notion в секунду")
+    parser.add_argument("--notion-burst", type=int, default=50)
+    parser.add_argument("--reddit-posts", type=int, default=200)
+    parser.add_argument("--reddit-comments", type=int, default=500)
+    parser.add_argument("--commands", type=int, default=50, help="число сценариев /changestatus")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="файл для JSON-результатов (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление, доля")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="игнорировать разницу меньше, секунды")
+    parser.add_argument("--log", default=os.devnull, help="куда писать вывод print приложения")
+    args = parser.parse_args(argv)
+    args.sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    args.reports = [name.strip() for name in args.reports.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    return args
+
+
+async def run(args) -> list:
+    results = []
+    for size in args.sizes:
+        print(f"Набор данных {size} страниц", file=sys.stderr)
+        results.extend(await run_size(args, size))
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with open(args.log, "a", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "log")},
+        },
+        "results": results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline, args.tolerance, args.min_delta)
+        differs = sorted(key for key in COMPARABLE_CONFIG
+                         if baseline.get("meta", {}).get("config", {}).get(key) != report["meta"]["config"].get(key))
+        if differs:
+            print(f"Внимание: базовый прогон с другими параметрами ({', '.join(differs)}), "
+                  f"сравнение может быть некорректным", file=sys.stderr)
+        regressions = [item for item in report["comparison"] if item["regression"]]
+        for item in regressions:
+            if item.get("error"):
+                print(f"Регрессия: {item['scenario']}/{item['variant']} [{item['dataset']}] "
+                      f"упал с ошибкой: {item['error']}", file=sys.stderr)
+                continue
+            print(f"Регрессия: {item['scenario']}/{item['variant']} [{item['dataset']}] "
+                  f"{item['baseline_seconds']} → {item['seconds']} с (×{item['ratio']})", file=sys.stderr)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+DEFAULT_LOG_DIR = os.path.join(os.getcwd(), "logs")
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+# Лимиты по умолчанию для потоковых сообщений: {логгер: сообщений в секунду}
+DEFAULT_RATE_LIMITS = {"reddit.stream": 5.0}
+SUPPRESSED_REPORT_INTERVAL = 60.0
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля из extra."""
+
+    _standard = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._standard and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничивает частоту записей по логгерам (токен-бакет на логгер). Лишние записи
+    отбрасываются, а раз в минуту пишется, сколько было отброшено.
+    """
+
+    def __init__(self, limits: dict, burst_seconds: float = 2.0):
+        super().__init__()
+        self.limits = dict(limits)
+        self.burst_seconds = burst_seconds
+        self._buckets = {}
+        self._suppressed = {}
+        self._reported_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _limit_for(self, name: str):
+        while name:
+            if name in self.limits:
+                return name, self.limits[name]
+            name = name.rpartition(".")[0]
+        return None, None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key, rate = self._limit_for(record.name)
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            capacity = rate * self.burst_seconds
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if not allowed:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            report = None
+            if self._suppressed and now - self._reported_at >= SUPPRESSED_REPORT_INTERVAL:
+                report, self._suppressed = self._suppressed, {}
+                self._reported_at = now
+        if report:
+            logging.getLogger("logging").info("Отброшено записей по лимиту: %s", report)
+        return allowed
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке: только подстановка аргументов."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class PrintToLog:
+    """Замена sys.stdout/sys.stderr: строки print уходят в логгер, запись на диск — в фоне."""
+
+    def __init__(self, logger: logging.Logger, level: int):
+        self.logger = logger
+        self.level = level
+        self._buffer = ""
+
+    def write(self, message: str):
+        self._buffer += message
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    self.logger.log(self.level, line)
+        return len(message)
+
+    def flush(self):
+        if self._buffer.strip():
+            self.logger.log(self.level, self._buffer)
+        self._buffer = ""
+
+    def isatty(self):
+        return False
+
+
+def parse_rate_limits(raw: str) -> dict:
+    """LOG_RATE_LIMITS="reddit.stream=5,notion=20" -> {"reddit.stream": 5.0, "notion": 20.0}."""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            try:
+                limits[name.strip()] = float(value)
+            except ValueError:
+                pass
+    return limits
+
+
+def setup_logging(log_dir: str = DEFAULT_LOG_DIR, level: int = logging.INFO, max_bytes: int = MAX_BYTES,
+                  backup_count: int = BACKUP_COUNT, rate_limits: dict = None, redirect_prints: bool = True):
+    """
+    Логирование через очередь: в потоке вызова запись только кладётся в очередь,
+    JSON в logs/app.log (с ротацией по размеру) и вывод в консоль пишет фоновый
+    поток. print во всех модулях перенаправляется в логгеры "stdout"/"stderr".
+    """
+    global _listener
+    os.makedirs(log_dir, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "app.log"), maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(sys.__stderr__)
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_limits if rate_limits is not None else DEFAULT_RATE_LIMITS))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    if redirect_prints:
+        sys.stdout = PrintToLog(logging.getLogger("stdout"), logging.INFO)
+        sys.stderr = PrintToLog(logging.getLogger("stderr"), logging.ERROR)
+    return _listener
+
+
+def shutdown_logging():
+    """Дописывает очередь на диск; вызывается при остановке."""
+    global _listener
+    for stream in (sys.stdout, sys.stderr):
+        if isinstance(stream, PrintToLog):
+            stream.flush()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import threading
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.getcwd(), "data", "checkpoints.json")
+# Изменения за это время пишутся на диск одной записью
+FLUSH_DELAY = 1.0
+
+
+class CheckpointStore:
+    """
+    Небольшое JSON-хранилище состояния (водяные знаки сканеров и т.п.).
+    Внутри цикла событий записи копятся и через FLUSH_DELAY сохраняются одной
+    атомарной заменой файла в отдельном потоке; вне цикла — сразу.
+    При остановке вызывается flush().
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, flush_delay: float = FLUSH_DELAY):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._data = {}
+        self._dirty = False
+        self._flush_task = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Не удалось прочитать чекпоинты {path}: {e}")
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            value = self._data.get(key, default)
+            return dict(value) if isinstance(value, dict) else value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = value
+            self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_delay)
+            await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """Сохраняет накопленные изменения (если есть)."""
+        # Снимок и запись под одной блокировкой: более старый снимок не перезапишет новый
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                payload = json.dumps(self._data, ensure_ascii=False, indent=2)
+                self._dirty = False
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Не удалось сохранить чекпоинты {self.path}: {e}")
+                with self._lock:
+                    self._dirty = True
+
+
+_store = None
+
+
+def init_checkpoint_store(path: str = DEFAULT_CHECKPOINT_PATH) -> CheckpointStore:
+    global _store
+    _store = CheckpointStore(path)
+    return _store
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _store
+    if _store is None:
+        _store = CheckpointStore()
+    return _store
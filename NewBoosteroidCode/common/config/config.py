@@ -0,0 +1,249 @@
+import json
+import os
+from dataclasses import dataclass
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dotenv import load_dotenv
+
+from common.appLogging.appLogging import parse_rate_limits
+
+# Все настройки процесса: .env читается один раз, значения разбираются и
+# проверяются при старте, дальше модули получают готовый объект конфигурации.
+
+# Без этих переменных бот не может работать — старт прерывается с их списком
+REQUIRED = {
+    "telegram_bot_token": "TELEGRAM_BOT_TOKEN",
+    "telegram_chat_id": "TELEGRAM_CHAT_ID",
+    "notion_token": "NOTION_TOKEN",
+    "notion_technical_issues_db": "NOTION_TECHNICAL_ISSUES_DB",
+    "reddit_client_id": "CLIENT_ID",
+    "reddit_client_secret": "CLIENT_SECRET",
+    "reddit_user_agent": "USER_AGENT",
+}
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off", "")
+# Форматы подробного отчёта (telegramFunctions.reportExport)
+REPORT_FORMATS = ("txt", "csv", "jsonl")
+
+
+class ConfigError(ValueError):
+    """Некорректная или неполная конфигурация; в сообщении — все найденные ошибки."""
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    # Учётные данные и базы
+    reddit_client_id: str = None
+    reddit_client_secret: str = None
+    reddit_user_agent: str = None
+    subreddit_name: str = "BoosteroidCommunity"
+    notion_token: str = None
+    notion_technical_issues_db: str = None
+    notion_analytics_db: str = None
+    notion_reddit_comments_db: str = None
+    notion_youtube_db: str = None
+    telegram_bot_token: str = None
+    telegram_chat_id: str = None
+    discord_token: str = None
+    ignored_users: tuple = ()
+    # Локальные данные
+    log_dir: str = "logs"
+    notion_mirror_path: str = None
+    notion_page_index_path: str = None
+    reddit_item_cache_path: str = None
+    checkpoint_path: str = None
+    # Периодические задачи и отчёты
+    notion_mirror_sync_interval: int = 300
+    search_index_refresh_interval: int = 60
+    auto_solve_interval: int = 1800
+    auto_solve_rules: str = None
+    reddit_item_cache_flush_interval: int = 60
+    reddit_retry_interval: int = 600
+    schedule_timezone: ZoneInfo = None
+    send_reports_on_boot: bool = False
+    report_breakdowns: tuple = ()
+    report_source_timeout: float = 60.0
+    report_detail_format: str = "txt"
+    report_detail_gzip: bool = False
+    # Лимиты внешних API
+    notion_rate_limit: float = 3.0
+    telegram_chat_rate_per_minute: float = 20.0
+    bulk_concurrency: int = 5
+    # Метрики и логи
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_rate_limits: dict = None
+
+    def describe(self) -> str:
+        """Краткая сводка для лога запуска (без токенов)."""
+        databases = {
+            "issues": self.notion_technical_issues_db,
+            "comments": self.notion_reddit_comments_db,
+            "analytics": self.notion_analytics_db,
+            "youtube": self.notion_youtube_db,
+        }
+        configured = ", ".join(name for name, value in databases.items() if value)
+        return (f"r/{self.subreddit_name}, базы Notion: {configured or '—'}, "
+                f"Discord: {'да' if self.discord_token else 'нет'}, "
+                f"метрики: {self.metrics_port or 'выкл'}, отчёты при запуске: "
+                f"{'да' if self.send_reports_on_boot else 'нет'}")
+
+
+class _Reader:
+    """Разбор переменных окружения с накоплением ошибок вместо падения на первой."""
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.errors = []
+
+    def text(self, name: str, default: str = None) -> str:
+        value = self.environ.get(name, "").strip()
+        return value or default
+
+    def number(self, name: str, default, cast=int, minimum=None, maximum=None):
+        raw = self.text(name)
+        if raw is None:
+            return default
+        try:
+            value = cast(raw)
+        except ValueError:
+            self.errors.append(f"{name}: ожидается число, получено {raw!r}")
+            return default
+        if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+            bounds = f"от {minimum}" + (f" до {maximum}" if maximum is not None else "")
+            self.errors.append(f"{name}: значение {value} вне допустимого диапазона ({bounds})")
+            return default
+        return value
+
+    def flag(self, name: str, default: bool = False) -> bool:
+        raw = self.environ.get(name)
+        if raw is None:
+            return default
+        value = raw.strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        self.errors.append(f"{name}: ожидается 1/0 или true/false, получено {raw!r}")
+        return default
+
+    def items(self, name: str) -> tuple:
+        return tuple(item.strip() for item in self.environ.get(name, "").split(",") if item.strip())
+
+    def timezone(self, name: str):
+        raw = self.text(name)
+        if raw is None:
+            return None
+        try:
+            return ZoneInfo(raw)
+        except (ZoneInfoNotFoundError, ValueError):
+            self.errors.append(f"{name}: неизвестный часовой пояс {raw!r}")
+            return None
+
+
+_dotenv_loaded = False
+
+
+def _load_dotenv(env_file: str = None):
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        # Переменные окружения процесса важнее .env (как и раньше в load_dotenv)
+        load_dotenv(env_file)
+        _dotenv_loaded = True
+
+
+def load_config(environ=None, env_file: str = None, required: bool = True) -> AppConfig:
+    """
+    Собирает конфигурацию из окружения (по умолчанию — os.environ после .env).
+    required=False не требует токенов и баз — для бенчмарков и отдельных скриптов.
+    Ошибки собираются все сразу и выбрасываются одним ConfigError.
+    """
+    if environ is None:
+        _load_dotenv(env_file)
+        environ = os.environ
+    env = _Reader(environ)
+    data_dir = os.path.join(os.getcwd(), "data")
+    values = dict(
+        reddit_client_id=env.text("CLIENT_ID"),
+        reddit_client_secret=env.text("CLIENT_SECRET"),
+        reddit_user_agent=env.text("USER_AGENT"),
+        subreddit_name=env.text("SUBREDDIT_NAME", AppConfig.subreddit_name),
+        notion_token=env.text("NOTION_TOKEN"),
+        notion_technical_issues_db=env.text("NOTION_TECHNICAL_ISSUES_DB"),
+        notion_analytics_db=env.text("NOTION_ANALYTICS_DB"),
+        notion_reddit_comments_db=env.text("NOTION_REDDIT_COMMENTS_DB"),
+        notion_youtube_db=env.text("NOTION_YOUTUBE_DB"),
+        telegram_bot_token=env.text("TELEGRAM_BOT_TOKEN"),
+        telegram_chat_id=env.text("TELEGRAM_CHAT_ID"),
+        discord_token=env.text("DISCORD_TOKEN"),
+        ignored_users=env.items("IGNORED_USERS"),
+        log_dir=os.path.join(os.getcwd(), "logs"),
+        notion_mirror_path=env.text("NOTION_MIRROR_PATH", os.path.join(data_dir, "notion_mirror.sqlite3")),
+        notion_page_index_path=env.text("NOTION_PAGE_INDEX_PATH", os.path.join(data_dir, "page_index.sqlite3")),
+        reddit_item_cache_path=env.text("REDDIT_ITEM_CACHE_PATH", os.path.join(data_dir, "reddit_items.json")),
+        checkpoint_path=env.text("CHECKPOINT_PATH", os.path.join(data_dir, "checkpoints.json")),
+        notion_mirror_sync_interval=env.number("NOTION_MIRROR_SYNC_INTERVAL", AppConfig.notion_mirror_sync_interval,
+                                               minimum=1),
+        search_index_refresh_interval=env.number("SEARCH_INDEX_REFRESH_INTERVAL",
+                                                 AppConfig.search_index_refresh_interval, minimum=1),
+        auto_solve_interval=env.number("AUTO_SOLVE_INTERVAL", AppConfig.auto_solve_interval, minimum=1),
+        auto_solve_rules=env.text("AUTO_SOLVE_RULES"),
+        reddit_item_cache_flush_interval=env.number("REDDIT_ITEM_CACHE_FLUSH_INTERVAL",
+                                                    AppConfig.reddit_item_cache_flush_interval, minimum=1),
+        reddit_retry_interval=env.number("REDDIT_RETRY_INTERVAL", AppConfig.reddit_retry_interval, minimum=1),
+        schedule_timezone=env.timezone("SCHEDULE_TIMEZONE"),
+        send_reports_on_boot=env.flag("SEND_REPORTS_ON_BOOT"),
+        report_breakdowns=env.items("REPORT_BREAKDOWNS"),
+        report_source_timeout=env.number("REPORT_SOURCE_TIMEOUT", AppConfig.report_source_timeout, float,
+                                         minimum=1),
+        report_detail_format=env.text("REPORT_DETAIL_FORMAT", AppConfig.report_detail_format),
+        report_detail_gzip=env.flag("REPORT_DETAIL_GZIP"),
+        notion_rate_limit=env.number("NOTION_RATE_LIMIT", AppConfig.notion_rate_limit, float, minimum=0.1),
+        telegram_chat_rate_per_minute=env.number("TELEGRAM_CHAT_RATE_PER_MINUTE",
+                                                 AppConfig.telegram_chat_rate_per_minute, float, minimum=1),
+        bulk_concurrency=env.number("BULK_CONCURRENCY", AppConfig.bulk_concurrency, minimum=1),
+        metrics_port=env.number("METRICS_PORT", AppConfig.metrics_port, minimum=0, maximum=65535),
+        metrics_host=env.text("METRICS_HOST", AppConfig.metrics_host),
+        log_max_bytes=env.number("LOG_MAX_BYTES", AppConfig.log_max_bytes, minimum=1024),
+        log_backup_count=env.number("LOG_BACKUP_COUNT", AppConfig.log_backup_count, minimum=0),
+        log_rate_limits=parse_rate_limits(env.text("LOG_RATE_LIMITS")),
+    )
+    errors = env.errors
+    if values["report_detail_format"] not in REPORT_FORMATS:
+        errors.append(f"REPORT_DETAIL_FORMAT: ожидается одно из {', '.join(REPORT_FORMATS)}, "
+                      f"получено {values['report_detail_format']!r}")
+    if values["auto_solve_rules"]:
+        try:
+            json.loads(values["auto_solve_rules"])
+        except ValueError as e:
+            errors.append(f"AUTO_SOLVE_RULES: некорректный JSON ({e})")
+    if required:
+        missing = [name for field, name in REQUIRED.items() if not values[field]]
+        if missing:
+            errors.append(f"не заданы обязательные переменные: {', '.join(missing)}")
+    if errors:
+        raise ConfigError("Ошибки конфигурации:\n  " + "\n  ".join(errors))
+    return AppConfig(**values)
+
+
+_config = None
+
+
+def init_config(config: AppConfig = None) -> AppConfig:
+    """Задаёт общую конфигурацию процесса. Вызывается из main.py один раз при старте."""
+    global _config
+    _config = config or load_config()
+    return _config
+
+
+def get_config() -> AppConfig:
+    """
+    Общая конфигурация. Без init_config (бенчмарки, запуск отдельного модуля)
+    собирается из окружения при первом обращении, без проверки обязательных переменных.
+    """
+    global _config
+    if _config is None:
+        _config = load_config(required=False)
+    return _config
@@ -0,0 +1,218 @@
+import time
+
+# Метрики процесса в текстовом формате Prometheus. Пока init_metrics не вызван,
+# все функции записи сразу возвращаются — инструментирование ничего не стоит.
+
+PREFIX = "boosteroid_"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+REPORT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        self.values[labels] = value
+
+
+class CallbackGauge:
+    """Значения считаются в момент запроса /metrics: fn() -> {значения меток: число}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames, fn):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Ошибка сбора метрики {self.name}: {e}")
+            return
+        for labels, value in values.items():
+            if value is None:
+                continue
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+
+    def observe(self, *labels, value):
+        state = self.values.get(labels)
+        if state is None:
+            # [счётчики по корзинам..., сумма, количество]
+            state = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        for labels, state in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + "_bucket", _labels(self.labelnames, labels, f'le="{_number(bound)}"'), cumulative
+            yield self.name + "_bucket", _labels(self.labelnames, labels, 'le="+Inf"'), state[-1]
+            yield self.name + "_sum", _labels(self.labelnames, labels), state[-2]
+            yield self.name + "_count", _labels(self.labelnames, labels), state[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.calls = Histogram(PREFIX + "external_call_seconds",
+                               "Длительность запросов к внешним API", ("service", "method"))
+        self.call_errors = Counter(PREFIX + "external_call_errors_total",
+                                   "Ошибки запросов к внешним API", ("service", "method"))
+        self.rate_limited = Counter(PREFIX + "external_rate_limited_total",
+                                    "Ответы 429 / flood wait от внешних API", ("service",))
+        self.events = Counter(PREFIX + "events_processed_total",
+                              "События, обработанные подписчиками", ("subscriber", "result"))
+        self.reports = Histogram(PREFIX + "report_generation_seconds",
+                                 "Время построения отчётов", ("report",), REPORT_BUCKETS)
+        self.last_event = Gauge(PREFIX + "stream_last_event_timestamp_seconds",
+                                "Время последнего события потока (unix)", ("stream",))
+        for metric in (self.calls, self.call_errors, self.rate_limited, self.events, self.reports, self.last_event):
+            self.register(metric)
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+
+
+def init_metrics() -> MetricsRegistry:
+    """Включает сбор метрик. Вызывается из main.py, если задан METRICS_PORT."""
+    global _registry
+    _registry = MetricsRegistry()
+    return _registry
+
+
+def get_metrics():
+    return _registry
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+# --- Запись (без init_metrics — пустые вызовы) ---
+
+def observe_call(service: str, method: str, seconds: float, error: bool = False):
+    if _registry is None:
+        return
+    _registry.calls.observe(service, method, value=seconds)
+    if error:
+        _registry.call_errors.inc(service, method)
+
+
+def count_rate_limited(service: str):
+    if _registry is None:
+        return
+    _registry.rate_limited.inc(service)
+
+
+def count_event(subscriber: str, ok: bool = True):
+    if _registry is None:
+        return
+    _registry.events.inc(subscriber, "ok" if ok else "error")
+
+
+def mark_event(stream: str, timestamp: float = None):
+    if _registry is None:
+        return
+    _registry.last_event.set(stream, value=timestamp or time.time())
+
+
+def observe_report(report: str, seconds: float):
+    if _registry is None:
+        return
+    _registry.reports.observe(report, value=seconds)
+
+
+def register_gauge(name: str, help_text: str, labelnames, fn):
+    """Gauge, который вычисляется при каждом запросе /metrics (глубины очередей и т.п.)."""
+    if _registry is None:
+        return None
+    return _registry.register(CallbackGauge(PREFIX + name, help_text, labelnames, fn))
+
+
+# --- HTTP ---
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Поднимает /metrics на локальном адресе. Возвращает runner для остановки (runner.cleanup())."""
+    from aiohttp import web  # только если метрики включены
+
+    registry = _registry or init_metrics()
+
+    async def handle_metrics(request):
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
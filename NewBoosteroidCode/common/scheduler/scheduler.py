@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import inspect
+import random
+import time
+from datetime import datetime, timedelta
+
+from common.checkpointStore.checkpointStore import get_checkpoint_store
+
+# Политики для запусков, пропущенных пока процесс не работал
+CATCH_UP_SKIP = "skip"
+CATCH_UP_ONCE = "once"
+
+BASE_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+MAX_RETRIES = 5
+# Планировщик просыпается не реже раза в минуту — на случай перевода часов или сна машины
+MAX_SLEEP = 60.0
+
+
+def _parse_field(spec: str, low: int, high: int) -> set:
+    values = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part in ("*", ""):
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Некорректное поле cron: {spec}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    """
+    Cron-выражение из 5 полей: минута, час, день месяца, месяц, день недели
+    (0 или 7 — воскресенье). tz — ZoneInfo; None — локальное время машины.
+    """
+
+    def __init__(self, expression: str, tz=None):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron-выражение должно содержать 5 полей: {expression}")
+        self.expression = expression
+        self.tz = tz
+        self.minutes = sorted(_parse_field(fields[0], 0, 59))
+        self.hours = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7)}
+        # Как в cron: если заданы и день месяца, и день недели, подходит любой из них
+        self.days_restricted = fields[2] != "*"
+        self.weekdays_restricted = fields[4] != "*"
+
+    def _day_matches(self, day) -> bool:
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = (day.isoweekday() % 7) in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return in_month or in_week
+        return in_month and in_week
+
+    def next(self, after: float) -> float:
+        """Ближайшее время срабатывания строго после after (unix)."""
+        start = datetime.fromtimestamp(after, self.tz)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        fire = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz).timestamp()
+                        if fire > after:
+                            return fire
+            day += timedelta(days=1)
+        raise ValueError(f"Cron-выражение никогда не срабатывает: {self.expression}")
+
+    def describe(self) -> str:
+        return f"cron «{self.expression}»"
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("Интервал должен быть положительным")
+        self.seconds = seconds
+
+    def next(self, after: float) -> float:
+        return after + self.seconds
+
+    def describe(self) -> str:
+        return f"каждые {self.seconds:g} с"
+
+
+class Job:
+    def __init__(self, name, trigger, func, args, jitter, catch_up, run_at_start, max_retries):
+        self.name = name
+        self.trigger = trigger
+        self.func = func
+        self.args = args
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.run_at_start = run_at_start
+        self.max_retries = max_retries
+        # base — плановое время без джиттера: следующие запуски считаются от него, а не от конца работы
+        self.base = None
+        self.next_run = None
+        self.retry = False
+        self.task = None
+        self.last_started = None
+        self.last_finished = None
+        self.last_duration = None
+        self.last_error = None
+        # Неудачные попытки текущего планового запуска (сам запуск и его повторы)
+        self.failed_attempts = 0
+        self.stats = {"runs": 0, "failures": 0, "retries": 0, "skipped_overlap": 0, "caught_up": 0}
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "schedule": self.trigger.describe(),
+            "running": self.running,
+            "next_run": self.next_run,
+            "retry": self.retry,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            **self.stats,
+        }
+
+
+class Scheduler:
+    """
+    Единый планировщик периодических задач на куче таймеров. Интервальные задачи
+    идут с фиксированным шагом (без накопления дрейфа), cron-задачи — по
+    календарю. Пока задача выполняется, её следующий запуск пропускается;
+    после ошибки плановый запуск повторяется с экспоненциальной задержкой —
+    не больше max_retries раз и только до следующего планового запуска,
+    который снова получает полный запас повторов.
+    """
+
+    def __init__(self, base_backoff: float = BASE_BACKOFF, max_backoff: float = MAX_BACKOFF):
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jobs = {}
+        self._heap = []
+        self._seq = 0
+        self._wakeup = None
+        self._started = False
+
+    # --- Регистрация ---
+
+    def _add(self, job: Job) -> Job:
+        if job.name in self.jobs:
+            raise ValueError(f"Задача {job.name} уже зарегистрирована")
+        self.jobs[job.name] = job
+        if self._started:
+            self._schedule_initial(job, time.time())
+            self._wake()
+        return job
+
+    def add_interval(self, name: str, seconds: float, func, *args, jitter: float = 0.0, run_at_start: bool = True,
+                     max_retries: int = MAX_RETRIES) -> Job:
+        """func(*args) каждые seconds секунд (плюс случайные 0..jitter), первый раз — сразу при run_at_start."""
+        return self._add(Job(name, IntervalTrigger(seconds), func, args, jitter, CATCH_UP_SKIP, run_at_start,
+                             max_retries))
+
+    def add_cron(self, name: str, expression: str, func, *args, tz=None, jitter: float = 0.0,
+                 catch_up: str = CATCH_UP_SKIP, max_retries: int = MAX_RETRIES) -> Job:
+        """
+        func(*args) по cron-выражению. catch_up=CATCH_UP_ONCE — если плановый запуск
+        пропущен (процесс не работал), выполнить его один раз сразу после старта.
+        """
+        return self._add(Job(name, CronTrigger(expression, tz), func, args, jitter, catch_up, False, max_retries))
+
+    # --- Планирование ---
+
+    def _push(self, job: Job, when: float, retry: bool = False):
+        job.next_run = when
+        job.retry = retry
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, job))
+
+    def _jitter(self, job: Job) -> float:
+        return random.uniform(0, job.jitter) if job.jitter else 0.0
+
+    def _schedule_next(self, job: Job, now: float):
+        """
+        Следующий плановый запуск после now. Шаг отсчитывается от планового времени,
+        а не от конца работы; пропущенные шаги не накапливаются. После повтора
+        по ошибке ещё не наступивший плановый запуск сохраняется.
+        """
+        while job.base <= now:
+            job.base = job.trigger.next(job.base)
+        self._push(job, job.base + self._jitter(job))
+
+    def _schedule_initial(self, job: Job, now: float):
+        if job.run_at_start:
+            job.base = now
+            self._push(job, now)
+            return
+        if job.catch_up == CATCH_UP_ONCE:
+            state = get_checkpoint_store().get(f"scheduler:{job.name}") or {}
+            last_run = state.get("last_run")
+            if last_run is not None and job.trigger.next(last_run) <= now:
+                print(f"Задача {job.name} пропустила запуск, пока бот не работал — выполняю сейчас")
+                job.stats["caught_up"] += 1
+                job.base = now
+                self._push(job, now)
+                return
+        job.base = now
+        self._schedule_next(job, now)
+
+    def _remember_run(self, job: Job):
+        if job.catch_up == CATCH_UP_ONCE:
+            get_checkpoint_store().set(f"scheduler:{job.name}", {"last_run": job.last_started})
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # --- Выполнение ---
+
+    async def _execute(self, job: Job, retry: bool = False):
+        if not retry:
+            job.failed_attempts = 0
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            result = job.func(*job.args)
+            if inspect.isawaitable(result):
+                await result
+            job.last_error = None
+            job.failed_attempts = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.stats["failures"] += 1
+            job.failed_attempts += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"Ошибка в задаче {job.name}: {e}")
+            if job.failed_attempts <= job.max_retries:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (job.failed_attempts - 1))
+                retry_at = time.time() + delay
+                if retry_at < job.next_run:
+                    job.stats["retries"] += 1
+                    print(f"Повтор задачи {job.name} через {delay:.0f} с")
+                    self._push(job, retry_at, retry=True)
+                    self._wake()
+        finally:
+            job.stats["runs"] += 1
+            job.last_finished = time.time()
+            job.last_duration = time.perf_counter() - started
+            self._remember_run(job)
+
+    def _fire(self, job: Job, now: float):
+        retry = job.retry  # _schedule_next сбрасывает признак повтора
+        self._schedule_next(job, now)
+        if job.running:
+            job.stats["skipped_overlap"] += 1
+            print(f"Задача {job.name} ещё выполняется, запуск пропущен")
+            return
+        job.task = asyncio.create_task(self._execute(job, retry))
+
+    async def run(self):
+        """Основной цикл. Запускается задачей в main.py."""
+        self._wakeup = asyncio.Event()
+        self._started = True
+        now = time.time()
+        for job in self.jobs.values():
+            self._schedule_initial(job, now)
+        try:
+            while True:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    when, _, job = heapq.heappop(self._heap)
+                    if when != job.next_run:
+                        continue  # запись устарела: задача перепланирована
+                    self._fire(job, now)
+                delay = self._heap[0][0] - now if self._heap else MAX_SLEEP
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(max(delay, 0), MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for job in self.jobs.values():
+                if job.running:
+                    job.task.cancel()
+
+    # --- Состояние ---
+
+    def status(self) -> list:
+        """Задачи по времени следующего запуска."""
+        return sorted((job.status() for job in self.jobs.values()),
+                      key=lambda item: item["next_run"] or float("inf"))
+
+    def snapshot(self) -> dict:
+        return {job.name: dict(job.stats) for job in self.jobs.values()}
+
+
+_scheduler = None
+
+
+def init_scheduler() -> Scheduler:
+    """Создаёт общий планировщик. Вызывается из main.py."""
+    global _scheduler
+    _scheduler = Scheduler()
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
@@ -1,28 +1,39 @@
 import discord
 import uuid  # Добавляем для генерации уникального ID
-from telegram import Bot
 from discord.ext import commands
-import os
 import ssl
 import certifi
 import aiohttp
 import asyncio
-from dotenv import load_dotenv
-from notion_client import Client
+import time
+from notion.notionWriter.notionWriter import get_notion_writer
+from notion.notionRateLimiter.notionRateLimiter import INTERACTIVE
+from notion.notionPageIndex.notionPageIndex import get_page_index
+from telegramFunctions.telegramSender.telegramSender import get_telegram_sender
+from common.metrics import metrics
 from datetime import datetime
 
-load_dotenv(dotenv_path="../../.env")
+# Перезапуск после ошибки входа или сети: экспоненциальная задержка, сброс после стабильной работы
+RESTART_BASE_DELAY = 5.0
+RESTART_MAX_DELAY = 300.0
+STABLE_RUN = 600.0
 
 MODERATOR_TAGS = ["[Mod] Alex", "[Mod] Artorias", "[Mod] Denys", "[Mod] Andrii", "artorias_the_one", "ggdeviant.",
                   "bomboclat0109", "andrii4496"]
 
 class DiscordBot:
-    def __init__(self, TELEGRAM_CHAT_ID, TELEGRAM_BOT_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_TOKEN):
+    """
+    Discord-бот работает задачей в общем цикле событий и использует общие клиенты
+    процесса: NotionWriter (с общим лимитером) и очередь отправки в Telegram.
+    """
+
+    def __init__(self, TELEGRAM_CHAT_ID, NOTION_TECHNICAL_ISSUES_DB, notion_writer=None, sender=None):
         self.ssl_context = ssl.create_default_context(cafile=certifi.where())
         self.bot = commands.Bot(command_prefix="/", intents=discord.Intents.all())
-        self.tg_bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        self.TELEGRAM_CHAT_ID = TELEGRAM_CHAT_ID
         self.NOTION_TECHNICAL_ISSUES_DB = NOTION_TECHNICAL_ISSUES_DB
-        self.NOTION_TOKEN = NOTION_TOKEN
+        self.notion_writer = notion_writer or get_notion_writer()
+        self.sender = sender or get_telegram_sender()
 
         @self.bot.command(description="Sends your report to the support team.")
         async def communityhelper(ctx, *, text: str):
@@ -31,7 +42,7 @@ class DiscordBot:
             message = f"📢 {ctx.author.name} ({chat_name}) отправил сообщение:\n{text}\n\n🆔 Request ID: {request_id}"
 
             # Отправка в Telegram
-            await self.tg_bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+            await self.sender.send(self.TELEGRAM_CHAT_ID, message)
 
             # **Отправка в Notion**
             await self.send_to_notion(ctx.author.name, text, request_id)
@@ -43,21 +54,27 @@ class DiscordBot:
         async def on_message(message):
             if message.author == self.bot.user:
                 return
+            metrics.mark_event("discord")
+            try:
+                chat_name = message.channel.name if message.guild else f"ЛС с {message.author.name}"
 
-            chat_name = message.channel.name if message.guild else f"ЛС с {message.author.name}"
-
-            mentioned_mods = [
-                user for user in message.mentions
-                if user.name in MODERATOR_TAGS or user.display_name in MODERATOR_TAGS
-            ]
+                mentioned_mods = [
+                    user for user in message.mentions
+                    if user.name in MODERATOR_TAGS or user.display_name in MODERATOR_TAGS
+                ]
 
-            if mentioned_mods:
-                mods_names = ", ".join([mod.display_name for mod in mentioned_mods])
-                alert_msg = f"⚠️ {message.author.name} упомянул {mods_names} в {chat_name}:\n{message.content}"
+                if mentioned_mods:
+                    mods_names = ", ".join([mod.display_name for mod in mentioned_mods])
+                    alert_msg = f"⚠️ {message.author.name} упомянул {mods_names} в {chat_name}:\n{message.content}"
 
-                await self.tg_bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=alert_msg)
+                    # Упоминания не ждут доставки: очередь сама соблюдает лимиты чата
+                    self.sender.enqueue(self.TELEGRAM_CHAT_ID, alert_msg)
 
-            await self.bot.process_commands(message)
+                await self.bot.process_commands(message)
+            except Exception:
+                metrics.count_event("on_message", ok=False)
+                raise
+            metrics.count_event("on_message")
 
     async def send_report(self, ctx, message_text, request_id):
         try:
@@ -73,11 +90,9 @@ class DiscordBot:
             print(f"Ошибка при отправке личного сообщения: {e}")
 
     async def send_to_notion(self, username, description, request_id):
-
-        notion = Client(auth=self.NOTION_TOKEN)
-
         try:
-            notion.pages.create(
+            page = await self.notion_writer.create_page(
+                priority=INTERACTIVE,
                 parent={"database_id": self.NOTION_TECHNICAL_ISSUES_DB},
                 properties={
                     "ID": {"rich_text": [{"text": {"content": str(request_id)}}]},
@@ -90,6 +105,9 @@ class DiscordBot:
                     "Status": {"status": {"name": "In queue"}},
                 }
             )
+            page_index = get_page_index()
+            if page_index is not None:
+                await page_index.remember(request_id, page["id"], "discord")
             print(f"✅ Данные отправлены в Notion: {username} - {description} (ID: {request_id})")
         except Exception as e:
             print(f"❌ Ошибка при отправке в Notion: {e}")
@@ -99,12 +117,35 @@ class DiscordBot:
     async def run(self, DISCORD_TOKEN):
         async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=self.ssl_context)) as session:
             self.bot.session = session
-            await self.bot.start(DISCORD_TOKEN)
-
-def start_discord_bot(TELEGRAM_CHAT_ID, TELEGRAM_BOT_TOKEN, DISCORD_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_TOKEN):
-    bot_instance = DiscordBot(TELEGRAM_CHAT_ID, TELEGRAM_BOT_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_TOKEN)
-
-    async def run_bot():
-        await bot_instance.run(DISCORD_TOKEN)
-
-    asyncio.run(run_bot())  # Запускаем бота
+            try:
+                await self.bot.start(DISCORD_TOKEN)
+            finally:
+                if not self.bot.is_closed():
+                    await self.bot.close()
+
+async def run_discord_bot(TELEGRAM_CHAT_ID, DISCORD_TOKEN, NOTION_TECHNICAL_ISSUES_DB):
+    """
+    Запускает бота в текущем цикле событий; вызывается из main.py как задача.
+    Ошибки Discord не выходят наружу (иначе остановились бы Telegram, шина Reddit
+    и планировщик): бот пересоздаётся с экспоненциальной задержкой.
+    """
+    delay = RESTART_BASE_DELAY
+    while True:
+        started = time.monotonic()
+        try:
+            # После close() commands.Bot не запускается повторно — каждый раз новый экземпляр
+            bot_instance = DiscordBot(TELEGRAM_CHAT_ID, NOTION_TECHNICAL_ISSUES_DB)
+            await bot_instance.run(DISCORD_TOKEN)
+            print("Discord-бот остановился")
+        except asyncio.CancelledError:
+            raise
+        except discord.LoginFailure as e:
+            print(f"Discord отклонил токен, бот не будет перезапущен: {e}")
+            return
+        except Exception as e:
+            print(f"Ошибка Discord-бота: {e}")
+        if time.monotonic() - started >= STABLE_RUN:
+            delay = RESTART_BASE_DELAY
+        print(f"Перезапуск Discord-бота через {delay:.0f} с")
+        await asyncio.sleep(delay)
+        delay = min(RESTART_MAX_DELAY, delay * 2)
@@ -1,11 +1,12 @@
 import asyncio
-import os
-from dotenv import load_dotenv
-import asyncpraw
-from notion.redditToNotion.redditToNotion import run_reddit_to_notion
-from notion.redditCommentsToNotion.redditCommentsToNotion import scan_comments_and_add_to_notion
+from redditFunctions.redditClient.redditClient import init_reddit_client, close_reddit, pool_stats
+from notion.redditToNotion.redditToNotion import schedule_update_old_posts, subscribe_reddit_to_notion, retry_failed_posts
+from notion.redditCommentsToNotion.redditCommentsToNotion import subscribe_comments_to_notion, retry_failed_comments
+from redditFunctions.redditEventBus.redditEventBus import RedditEventBus
+from telegramFunctions.telegramSender.telegramSender import init_telegram_sender
 from telegramFunctions.redditToTelegram.redditToTelegram import start_tracking, handle_message
 from telegramFunctions.telegramReport.telegramReport import init_report_vars, run_reports
+from telegramFunctions.bulkModeration.bulkModeration import handle_bulk, bulk_button_handler, handle_bulk_email_input
 from telegramFunctions.сhangeStatus.changeStatus import (
     handle_change_status,
     handle_change_email,
@@ -18,107 +19,113 @@ from telegramFunctions.сhangeStatus.changeStatus import (
     ADD_YC_CHANNEL, ADD_YC_LINK, ADD_YC_COMMENT, ADD_YC_PROFILE, ADD_YC_AUTHOR
 )
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ConversationHandler
-from notion_client import Client
-import threading
-import sys
-import logging
-
-load_dotenv()
-
-print("NOTION_TECHNICAL_ISSUES_DB =", os.getenv("NOTION_TECHNICAL_ISSUES_DB"))
-
-# Инициализация переменных
-REDDIT_CLIENT_ID = os.getenv("CLIENT_ID")
-REDDIT_CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-REDDIT_USER_AGENT = os.getenv("USER_AGENT")
-NOTION_TOKEN = os.getenv("NOTION_TOKEN")
-SUBREDDIT_NAME = os.getenv("SUBREDDIT_NAME")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-NOTION_TECHNICAL_ISSUES_DB = os.getenv("NOTION_TECHNICAL_ISSUES_DB")
-IGNORED_USERS = os.getenv("IGNORED_USERS", "").split(",")
-DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-NOTION_ANALYTICS_DB = os.getenv("NOTION_ANALYTICS_DB")
-
-# Инициализация переменных для отчётов
-init_report_vars(NOTION_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_ANALYTICS_DB, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
-
-notion = Client(auth=NOTION_TOKEN)
-reddit = asyncpraw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent=REDDIT_USER_AGENT
+from notion_client import AsyncClient
+from notion.notionWriter.notionWriter import init_notion_writer
+from notion.notionRateLimiter.notionRateLimiter import init_rate_limiter, rate_limited, BACKGROUND
+from notion.notionMirror.notionMirror import NotionMirror
+from notion.notionRollups.notionRollups import NotionRollups, ISSUES, REDDIT_COMMENTS, ANALYTICS, YOUTUBE
+from notion.notionPageIndex.notionPageIndex import init_page_index
+from notion.notionSearchIndex.notionSearchIndex import IssueSearchIndex
+from common.checkpointStore.checkpointStore import init_checkpoint_store, get_checkpoint_store
+from common.config.config import init_config, ConfigError
+from common.appLogging.appLogging import setup_logging, shutdown_logging
+from common.metrics import metrics
+from common.scheduler.scheduler import init_scheduler
+from telegramFunctions.jobsStatus.jobsStatus import handle_jobs
+from telegramFunctions.telegramRequest.telegramRequest import MeteredRequest
+from redditFunctions.redditItemCache.redditItemCache import init_reddit_item_cache
+
+# .env читается, разбирается и проверяется один раз; модули получают значения из config
+try:
+    config = init_config()
+except ConfigError as e:
+    raise SystemExit(str(e))
+
+if config.metrics_port:
+    metrics.init_metrics()
+
+# Общая очередь запросов к Notion — создаётся до всех клиентов Notion
+notion_limiter = init_rate_limiter(rate=config.notion_rate_limit)
+
+# Локальное зеркало баз Notion для отчётов и поиска
+notion_mirror = NotionMirror(
+    rate_limited(AsyncClient(auth=config.notion_token), BACKGROUND),
+    [config.notion_technical_issues_db, config.notion_reddit_comments_db, config.notion_analytics_db,
+     config.notion_youtube_db],
+    path=config.notion_mirror_path,
+    rollups=NotionRollups({
+        config.notion_technical_issues_db: ISSUES,
+        config.notion_reddit_comments_db: REDDIT_COMMENTS,
+        config.notion_analytics_db: ANALYTICS,
+        config.notion_youtube_db: YOUTUBE,
+    }),
 )
 
-# Функция для запуска Discord-бота
-def run_discord_bot():
-    from discordFunctions.communityHelperToTelegram.communityHelperToTelegram import start_discord_bot
-    start_discord_bot(TELEGRAM_CHAT_ID, TELEGRAM_BOT_TOKEN, DISCORD_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_TOKEN)
+# Инициализация переменных для отчётов
+init_report_vars(config.notion_token, config.notion_technical_issues_db, config.notion_analytics_db,
+                 config.telegram_bot_token, config.telegram_chat_id, notion_mirror)
+
+# Общий асинхронный писатель Notion для модулей загрузки данных
+notion = init_notion_writer(config.notion_token)
+# Индекс «ID поста Reddit / Request ID Discord → страница Notion»
+page_index = init_page_index(config.notion_page_index_path)
+# Водяные знаки сканеров Reddit, переживают перезапуск
+init_checkpoint_store(config.checkpoint_path)
+# Кеш элементов Reddit из уведомлений: реакции 👍/👎 разрешаются без запросов к Reddit
+reddit_item_cache = init_reddit_item_cache(config.reddit_item_cache_path)
+# Общий клиент Reddit для всех модулей (создаётся при первом обращении)
+init_reddit_client(config.reddit_client_id, config.reddit_client_secret, config.reddit_user_agent)
 
 async def unified_message_handler(update, context):
     if "pending_email_page" in context.user_data:
         await handle_new_email_input(update, context)
+    elif "pending_bulk_email" in context.user_data:
+        await handle_bulk_email_input(update, context)
     else:
         await handle_message(update, context)
 
+async def retry_failed_ingest():
+    """Повтор постов и комментариев, которые не удалось записать в Notion."""
+    await retry_failed_posts(notion, config.notion_technical_issues_db)
+    await retry_failed_comments(notion, config.ignored_users)
+
+def queue_depths(bus, sender) -> dict:
+    depths = {f"reddit_bus:{s.name}": s.queue.qsize() for s in bus.subscribers}
+    depths.update({f"notion:{name}": depth for name, depth in notion_limiter.queue_depth().items()})
+    depths.update({f"telegram:{chat_id}": depth for chat_id, depth in sender.queue_depth().items()})
+    return depths
+
 async def start_unified_telegram_bot(app: Application):
     print("Объединённый Telegram бот запущен.")
     await app.run_polling()
 
-async def periodic_task(interval, task, *args):
-    while True:
-        try:
-            print(f"Запуск задачи {task.__name__}...")
-            await task(*args)
-            print(f"Задача {task.__name__} выполнена. Ожидание {interval} секунд...")
-        except Exception as e:
-            print(f"Ошибка в задаче {task.__name__}: {e}")
-        await asyncio.sleep(interval)
-
-log_dir = os.path.join(os.getcwd(), "logs")
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "app.log")),
-        logging.StreamHandler()
-    ]
+# Логи пишет фоновый поток (JSON с ротацией), print перенаправлен в логгеры
+setup_logging(
+    config.log_dir,
+    max_bytes=config.log_max_bytes,
+    backup_count=config.log_backup_count,
+    rate_limits=config.log_rate_limits,
 )
 
-class LoggerWriter:
-    def __init__(self, level):
-        self.level = level
-        self._buffer = ""
-    def write(self, message):
-        if message.strip():
-            self._buffer += message
-            if "\n" in self._buffer:
-                for line in self._buffer.splitlines():
-                    self.level(line)
-                self._buffer = ""
-    def flush(self):
-        if self._buffer:
-            self.level(self._buffer)
-            self._buffer = ""
-sys.stdout = LoggerWriter(logging.info)
-sys.stderr = LoggerWriter(logging.error)
-
 async def main():
-    print("Запуск задач...")
-
-    # Запуск Discord-бота
-    discord_thread = threading.Thread(target=run_discord_bot)
-    discord_thread.start()
-
-    # Создаём единый экземпляр Telegram-бота
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    app.bot_data["notion"] = create_notion_client(NOTION_TOKEN)
-    app.bot_data["NOTION_TECHNICAL_ISSUES_DB"] = NOTION_TECHNICAL_ISSUES_DB
+    print(f"Запуск задач... ({config.describe()})")
+
+    # Создаём единый экземпляр Telegram-бота; все вызовы Bot API попадают в метрики
+    app = Application.builder().token(config.telegram_bot_token).request(MeteredRequest()).build()
+    app.bot_data["notion"] = create_notion_client(config.notion_token)
+    app.bot_data["NOTION_TECHNICAL_ISSUES_DB"] = config.notion_technical_issues_db
+    app.bot_data["mirror"] = notion_mirror
+    # Поиск для /changestatus, /changeemail, /changeflair отвечает из памяти
+    search_index = IssueSearchIndex(notion_mirror, config.notion_technical_issues_db)
+    app.bot_data["search_index"] = search_index
+    scheduler = init_scheduler()
+    app.bot_data["scheduler"] = scheduler
 
     app.add_handler(CommandHandler("changestatus", handle_change_status))
     app.add_handler(CommandHandler("changeemail", handle_change_email))
     app.add_handler(CommandHandler("changeflair", handle_change_flair))
+    app.add_handler(CommandHandler("bulk", handle_bulk))
+    app.add_handler(CommandHandler("jobs", handle_jobs))
     add_yc_conv = ConversationHandler(
         entry_points=[CommandHandler("addyc", add_yc_start)],
         states={
@@ -131,23 +138,62 @@ async def main():
         fallbacks=[CommandHandler("cancel", add_yc_cancel)]
     )
     app.add_handler(add_yc_conv)
+    app.add_handler(CallbackQueryHandler(bulk_button_handler, pattern="^b[a-z]{1,2}\\|"))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, unified_message_handler))
 
     telegram_task = asyncio.create_task(start_unified_telegram_bot(app))
 
-    # Передаём единый экземпляр бота для отслеживания Reddit
-    bot = app.bot
-    tracking_task = asyncio.create_task(start_tracking(bot, SUBREDDIT_NAME, IGNORED_USERS))
-
-    reddit_notion_task = asyncio.create_task(run_reddit_to_notion())
-
-    comments_task = asyncio.create_task(
-        periodic_task(3600, scan_comments_and_add_to_notion, reddit, notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, IGNORED_USERS)
-    )
-
-    report_task = asyncio.create_task(run_reports())
-
-    await asyncio.gather(telegram_task, tracking_task, reddit_notion_task, comments_task, report_task)
+    # Уведомления идут через очередь с лимитами Telegram
+    sender = init_telegram_sender(app.bot, config.telegram_chat_rate_per_minute)
+
+    # Один опрос сабреддита на всех: уведомления, модераторы, загрузка в Notion
+    bus = RedditEventBus(config.subreddit_name)
+    start_tracking(bus, app.bot, config.ignored_users)
+    subscribe_reddit_to_notion(bus, notion, config.notion_technical_issues_db)
+    subscribe_comments_to_notion(bus, notion, config.ignored_users)
+    bus_task = asyncio.create_task(bus.run())
+
+    metrics_runner = None
+    if config.metrics_port:
+        metrics.register_gauge("queue_depth", "Глубина внутренних очередей", ("queue",),
+                               lambda: queue_depths(bus, sender))
+        metrics_runner = await metrics.start_metrics_server(config.metrics_port, config.metrics_host)
+
+    # Все периодические задачи — в одном планировщике (состояние: /jobs)
+    scheduler.add_interval("notion_mirror_sync", config.notion_mirror_sync_interval, notion_mirror.sync_all, jitter=30)
+    scheduler.add_interval("search_index_refresh", config.search_index_refresh_interval, search_index.refresh, jitter=5)
+    schedule_update_old_posts(scheduler, notion, config.auto_solve_interval, config.notion_technical_issues_db)
+    scheduler.add_interval("reddit_item_cache_flush", config.reddit_item_cache_flush_interval,
+                           lambda: asyncio.to_thread(reddit_item_cache.flush), run_at_start=False)
+    scheduler.add_interval("reddit_ingest_retry", config.reddit_retry_interval, retry_failed_ingest,
+                           jitter=30, run_at_start=False)
+    scheduler_task = asyncio.create_task(scheduler.run())
+
+    # Отчёты по расписанию; разовая отправка при запуске — SEND_REPORTS_ON_BOOT=1
+    report_task = asyncio.create_task(run_reports(scheduler, config.schedule_timezone, config.send_reports_on_boot))
+
+    # Discord-бот в том же цикле, с общими писателем Notion и очередью Telegram
+    tasks = [telegram_task, bus_task, scheduler_task, report_task]
+    if config.discord_token:
+        from discordFunctions.communityHelperToTelegram.communityHelperToTelegram import run_discord_bot
+        tasks.append(asyncio.create_task(run_discord_bot(config.telegram_chat_id, config.discord_token,
+                                                           config.notion_technical_issues_db)))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        print(f"Статистика шины Reddit: {bus.snapshot()}")
+        print(f"Статистика отправки в Telegram: {sender.snapshot()}")
+        print(f"Статистика клиента Reddit: {pool_stats()}")
+        print(f"Статистика очереди Notion: {notion_limiter.snapshot()}")
+        print(f"Статистика кеша элементов Reddit: {reddit_item_cache.snapshot()}")
+        print(f"Статистика планировщика: {scheduler.snapshot()}")
+        reddit_item_cache.flush()
+        get_checkpoint_store().flush()
+        await close_reddit()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        shutdown_logging()
 
 asyncio.run(main())
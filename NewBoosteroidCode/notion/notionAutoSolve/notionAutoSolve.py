@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone, timedelta
+
+from common.checkpointStore.checkpointStore import get_checkpoint_store
+from common.config.config import get_config
+from notion.notionQuery.notionQuery import iter_database, QueryStats
+from notion.notionRateLimiter.notionRateLimiter import BACKGROUND, rate_limited
+
+# Обновления отправляются пачками, параллельность внутри пачки ограничивает NotionWriter
+UPDATE_BATCH = 100
+# Раз в сутки проверяем все страницы, а не только перешедшие порог с прошлого запуска
+FULL_SWEEP_INTERVAL = 24 * 3600
+MAX_RETRY_PAGES = 1000
+
+
+class AutoSolveRule:
+    """
+    Правило перевода старых обращений: страницы старше age_days, чей статус не равен
+    target_status (и, если заданы, входит в statuses / флер входит в flairs),
+    получают статус target_status.
+    """
+
+    def __init__(self, name: str = "stale", age_days: float = 7, target_status: str = "Solved",
+                 statuses=None, flairs=None, date_property: str = "Date",
+                 status_property: str = "Status", flair_property: str = "Post Flair"):
+        self.name = name
+        self.age_days = float(age_days)
+        self.target_status = target_status
+        self.statuses = list(statuses) if statuses else None
+        self.flairs = list(flairs) if flairs else None
+        self.date_property = date_property
+        self.status_property = status_property
+        self.flair_property = flair_property
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AutoSolveRule":
+        return cls(**data)
+
+    def cutoff(self, now: datetime) -> datetime:
+        return now - timedelta(days=self.age_days)
+
+    def build_filter(self, cutoff_iso: str, since_iso: str = None) -> dict:
+        conditions = [
+            {"property": self.date_property, "date": {"before": cutoff_iso}},
+            {"property": self.status_property, "status": {"does_not_equal": self.target_status}},
+        ]
+        if since_iso:
+            # Только страницы, перешедшие порог возраста после прошлого запуска
+            conditions.append({"property": self.date_property, "date": {"on_or_after": since_iso}})
+        if self.statuses:
+            conditions.append({"or": [
+                {"property": self.status_property, "status": {"equals": status}} for status in self.statuses
+            ]})
+        if self.flairs:
+            conditions.append({"or": [
+                {"property": self.flair_property, "select": {"equals": flair}} for flair in self.flairs
+            ]})
+        return {"and": conditions}
+
+    def properties(self) -> dict:
+        return {self.status_property: {"status": {"name": self.target_status}}}
+
+
+def load_rules(raw: str = None) -> list:
+    """
+    Правила из AUTO_SOLVE_RULES (конфигурация процесса) (JSON-список объектов с полями AutoSolveRule),
+    по умолчанию — прежнее поведение: всё старше недели переводится в Solved.
+    """
+    raw = raw if raw is not None else get_config().auto_solve_rules
+    if not raw:
+        return [AutoSolveRule()]
+    try:
+        return [AutoSolveRule.from_dict(item) for item in json.loads(raw)]
+    except (ValueError, TypeError) as e:
+        print(f"Некорректные AUTO_SOLVE_RULES, используется правило по умолчанию: {e}")
+        return [AutoSolveRule()]
+
+
+class AutoSolveEngine:
+    """
+    Массовый перевод статусов по правилам. Читает все подходящие страницы
+    постранично, обновляет их параллельно через NotionWriter (лимитер задаёт
+    бюджет запросов) и хранит в чекпоинтах порог прошлого запуска и список
+    страниц, которые не удалось обновить.
+    """
+
+    def __init__(self, writer, database_id: str, rules: list = None, full_sweep_interval: float = FULL_SWEEP_INTERVAL):
+        self.writer = writer
+        self.reader = rate_limited(writer.client, BACKGROUND)
+        self.database_id = database_id
+        self.rules = rules if rules is not None else load_rules()
+        self.full_sweep_interval = full_sweep_interval
+
+    def _key(self, rule: AutoSolveRule) -> str:
+        return f"autosolve:{self.database_id}:{rule.name}"
+
+    async def _apply(self, rule: AutoSolveRule, page_ids: list, result: dict, failed: list):
+        outcomes = await asyncio.gather(
+            *(self.writer.update_page(page_id, rule.properties()) for page_id in page_ids),
+            return_exceptions=True
+        )
+        for page_id, outcome in zip(page_ids, outcomes):
+            if isinstance(outcome, Exception):
+                result["failed"] += 1
+                failed.append(page_id)
+                if result["failed"] == 1:
+                    print(f"Не удалось обновить страницу {page_id}: {outcome}")
+            else:
+                result["processed"] += 1
+
+    async def run_rule(self, rule: AutoSolveRule, now: datetime = None) -> dict:
+        now = now or datetime.now(timezone.utc)
+        store = get_checkpoint_store()
+        key = self._key(rule)
+        state = store.get(key) or {}
+        cutoff_iso = rule.cutoff(now).isoformat()
+        full = time.time() - state.get("full_at", 0) >= self.full_sweep_interval
+        since_iso = None if full else state.get("cutoff")
+        result = {"rule": rule.name, "full": full, "matched": 0, "retried": 0, "processed": 0, "failed": 0}
+        failed = []
+        stats = QueryStats()
+
+        # Сначала страницы, которые не удалось обновить в прошлый раз
+        retry = state.get("retry", [])
+        if retry:
+            result["retried"] = len(retry)
+            await self._apply(rule, retry, result, failed)
+
+        # Сначала собираем ID, потом обновляем: обновлённые страницы выпадают
+        # из фильтра, и курсор выборки по изменяющемуся набору мог бы их пропустить
+        completed = True
+        seen = set(retry)
+        page_ids = []
+        try:
+            async for page in iter_database(self.reader, self.database_id,
+                                            filter=rule.build_filter(cutoff_iso, since_iso), stats=stats):
+                if page["id"] not in seen:
+                    seen.add(page["id"])
+                    page_ids.append(page["id"])
+        except Exception as e:
+            # Порог не сдвигаем: в следующий раз выборка повторится с того же места
+            completed = False
+            print(f"Ошибка выборки правила {rule.name}: {e}")
+        result["matched"] = len(page_ids)
+        for i in range(0, len(page_ids), UPDATE_BATCH):
+            await self._apply(rule, page_ids[i:i + UPDATE_BATCH], result, failed)
+
+        new_state = {
+            "cutoff": cutoff_iso if completed else state.get("cutoff"),
+            "full_at": time.time() if full and completed else state.get("full_at", 0),
+            "retry": failed[-MAX_RETRY_PAGES:],
+        }
+        store.set(key, new_state)
+        stats.finish()
+        result["query"] = stats.as_dict()
+        return result
+
+    async def run(self) -> list:
+        results = []
+        for rule in self.rules:
+            result = await self.run_rule(rule)
+            print(f"Автозакрытие [{result['rule']}]: найдено {result['matched']}, повторно {result['retried']}, "
+                  f"обновлено {result['processed']}, ошибок {result['failed']}"
+                  f"{' (полная проверка)' if result['full'] else ''}")
+            results.append(result)
+        return results
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from notion.notionQuery.notionQuery import iter_database, parse_iso, QueryStats
+
+DEFAULT_MIRROR_PATH = os.path.join(os.getcwd(), "data", "notion_mirror.sqlite3")
+# Раз в сутки делаем полную выгрузку, чтобы убрать удалённые/архивированные записи
+FULL_RESYNC_INTERVAL = 24 * 3600
+UPSERT_BATCH = 100
+# Читатели (отчёты, поиск, команды) не догружают базу, синхронизированную недавно
+READ_MAX_AGE = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    database_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    date_ts REAL,
+    last_edited TEXT,
+    properties TEXT NOT NULL,
+    PRIMARY KEY (database_id, page_id)
+);
+CREATE INDEX IF NOT EXISTS pages_by_date ON pages (database_id, date_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+
+def page_date_ts(page: dict, date_property: str = "Date"):
+    prop = page.get("properties", {}).get(date_property) or {}
+    start = (prop.get("date") or {}).get("start")
+    if not start:
+        return None
+    return parse_iso(start).timestamp()
+
+
+class NotionMirror:
+    """
+    Локальная копия баз Notion в SQLite. Синхронизируется инкрементально по
+    last_edited_time, отчёты и поиск читают записи отсюда без запросов к API.
+    Полная выгрузка — только в периодической задаче (sync_all), читатели
+    вызывают refresh().
+    """
+
+    def __init__(self, notion, database_ids, path: str = DEFAULT_MIRROR_PATH, date_property: str = "Date",
+                 full_resync_interval: float = FULL_RESYNC_INTERVAL, rollups=None):
+        self.notion = notion
+        self.database_ids = [db for db in database_ids if db]
+        self.path = path
+        self.date_property = date_property
+        self.full_resync_interval = full_resync_interval
+        # Файл SQLite и схема создаются при первом обращении (в потоке), а не при импорте main.py
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._sync_locks = {}
+        self._refresh_tasks = {}
+        # Почасовые счётчики (NotionRollups) обновляются в той же транзакции, что и записи.
+        # Схема и возможный пересчёт — при первом обращении, в потоке синхронизации
+        self.rollups = rollups
+        self._rollups_ready = False
+
+    def __contains__(self, database_id):
+        return database_id in self.database_ids
+
+    # --- Работа с SQLite (выполняется в отдельном потоке) ---
+
+    def _connection(self):
+        # Вызывается под self._db_lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql, params=(), many=False, fetch=False):
+        with self._db_lock:
+            conn = self._connection()
+            if many:
+                cursor = conn.executemany(sql, params)
+            else:
+                cursor = conn.execute(sql, params)
+            rows = cursor.fetchall() if fetch else None
+            conn.commit()
+            return rows
+
+    def _ensure_rollups(self):
+        # Вызывается под self._db_lock; возвращает соединение
+        conn = self._connection()
+        if self.rollups is not None and not self._rollups_ready:
+            self.rollups.setup(conn)
+            self._rollups_ready = True
+        return conn
+
+    async def _run(self, sql, params=(), many=False, fetch=False):
+        return await asyncio.to_thread(self._execute, sql, params, many, fetch)
+
+    async def _get_state(self, database_id):
+        rows = await self._run("SELECT cursor, full_synced_at FROM sync_state WHERE database_id = ?",
+                               (database_id,), fetch=True)
+        return rows[0] if rows else (None, None)
+
+    async def synced_at(self, database_id):
+        rows = await self._run("SELECT synced_at FROM sync_state WHERE database_id = ?", (database_id,), fetch=True)
+        return rows[0][0] if rows else None
+
+    def _upsert_rows(self, database_id, pages):
+        rows = [
+            (database_id, page["id"], page_date_ts(page, self.date_property), page.get("last_edited_time"),
+             json.dumps(page.get("properties", {}), ensure_ascii=False))
+            for page in pages
+        ]
+        with self._db_lock:
+            conn = self._ensure_rollups()
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (database_id, page_id, date_ts, last_edited, properties) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            if self.rollups is not None:
+                self.rollups.apply(conn, database_id,
+                                   [(row[1], row[2], page.get("properties", {})) for row, page in zip(rows, pages)])
+            conn.commit()
+
+    async def _upsert(self, database_id, pages):
+        await asyncio.to_thread(self._upsert_rows, database_id, pages)
+
+    # --- Синхронизация ---
+
+    async def sync(self, database_id: str, full: bool = False, incremental: bool = False) -> QueryStats:
+        """
+        Догружает записи, изменённые с прошлой синхронизации. Notion округляет
+        last_edited_time до минуты, поэтому курсор берётся включительно.
+        Раз в full_resync_interval (и для пустого зеркала) выгрузка полная,
+        если не задано incremental=True.
+        """
+        lock = self._sync_locks.setdefault(database_id, asyncio.Lock())
+        async with lock:
+            cursor, full_synced_at = await self._get_state(database_id)
+            if not incremental and (full_synced_at is None
+                                    or time.time() - full_synced_at >= self.full_resync_interval):
+                full = True
+            filter_body = None
+            if cursor and not full:
+                filter_body = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+            stats = QueryStats()
+            seen = set()
+            batch = []
+            newest = cursor
+            async for page in iter_database(self.notion, database_id, filter=filter_body,
+                                            sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}],
+                                            stats=stats):
+                batch.append(page)
+                if full:
+                    seen.add(page["id"])
+                edited = page.get("last_edited_time")
+                if edited and (newest is None or edited > newest):
+                    newest = edited
+                if len(batch) >= UPSERT_BATCH:
+                    await self._upsert(database_id, batch)
+                    batch = []
+            if batch:
+                await self._upsert(database_id, batch)
+            if full:
+                await asyncio.to_thread(self._drop_missing, database_id, seen)
+            now = time.time()
+            await self._run(
+                "INSERT INTO sync_state (database_id, cursor, synced_at, full_synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(database_id) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at, "
+                "full_synced_at = COALESCE(?, sync_state.full_synced_at)",
+                (database_id, newest, now, now if full else None, now if full else None))
+            stats.finish()
+            print(f"Синхронизация зеркала {database_id} ({'полная' if full else 'инкрементальная'}): {stats}")
+            return stats
+
+    def _drop_missing(self, database_id, seen):
+        with self._db_lock:
+            conn = self._ensure_rollups()
+            stored = [row[0] for row in conn.execute(
+                "SELECT page_id FROM pages WHERE database_id = ?", (database_id,))]
+            missing = [(database_id, page_id) for page_id in stored if page_id not in seen]
+            if missing:
+                conn.executemany("DELETE FROM pages WHERE database_id = ? AND page_id = ?", missing)
+                if self.rollups is not None:
+                    self.rollups.remove(conn, database_id, [page_id for _, page_id in missing])
+            conn.commit()
+
+    async def refresh(self, database_id: str, timeout: float = None, max_age: float = READ_MAX_AGE) -> bool:
+        """
+        Подготовка базы к чтению: только инкрементальная догрузка и не чаще раза
+        в max_age секунд. По timeout догрузка не отменяется — читатель перестаёт
+        её ждать и читает то, что уже есть в зеркале. False — база ещё ни разу
+        не синхронизирована, читать нужно из Notion.
+        """
+        synced_at = await self.synced_at(database_id)
+        if synced_at is None:
+            return False
+        if time.time() - synced_at < max_age:
+            return True
+        task = self._refresh_tasks.get(database_id)
+        if task is None or task.done():
+            task = self._refresh_tasks[database_id] = asyncio.create_task(self.sync(database_id, incremental=True))
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            print(f"Догрузка зеркала {database_id} не успела за {timeout:g} с, читаю сохранённые записи")
+        except Exception as e:
+            print(f"Ошибка догрузки зеркала {database_id}, читаю сохранённые записи: {e}")
+        return True
+
+    async def sync_all(self, full: bool = False) -> dict:
+        results = {}
+        for database_id in self.database_ids:
+            try:
+                results[database_id] = await self.sync(database_id, full=full)
+            except Exception as e:
+                print(f"Ошибка синхронизации зеркала {database_id}: {e}")
+        return results
+
+    # --- Чтение ---
+
+    async def query(self, database_id: str, start_iso: str, end_iso: str) -> list:
+        """Записи базы за период (включительно) в формате ответа Notion: id + properties."""
+        rows = await self._run(
+            "SELECT page_id, last_edited, properties FROM pages "
+            "WHERE database_id = ? AND date_ts >= ? AND date_ts <= ? ORDER BY date_ts",
+            (database_id, parse_iso(start_iso).timestamp(), parse_iso(end_iso).timestamp()), fetch=True)
+        return [
+            {"id": page_id, "last_edited_time": last_edited, "properties": json.loads(properties)}
+            for page_id, last_edited, properties in rows
+        ]
+
+    async def iter_query(self, database_id: str, start_iso: str, end_iso: str, batch_size: int = 500):
+        """Потоковый вариант query: записи читаются из SQLite порциями по batch_size."""
+        start_ts, end_ts = parse_iso(start_iso).timestamp(), parse_iso(end_iso).timestamp()
+        last_ts, last_id = start_ts, ""
+        while True:
+            rows = await self._run(
+                "SELECT page_id, last_edited, properties, date_ts FROM pages "
+                "WHERE database_id = ? AND date_ts <= ? AND (date_ts > ? OR (date_ts = ? AND page_id > ?)) "
+                "ORDER BY date_ts, page_id LIMIT ?",
+                (database_id, end_ts, last_ts, last_ts, last_id, batch_size), fetch=True)
+            for page_id, last_edited, properties, _ in rows:
+                yield {"id": page_id, "last_edited_time": last_edited, "properties": json.loads(properties)}
+            if len(rows) < batch_size:
+                break
+            last_id, last_ts = rows[-1][0], rows[-1][3]
+
+    def _rollup_totals(self, database_id, start_ts, end_ts):
+        with self._db_lock:
+            conn = self._ensure_rollups()
+            return self.rollups.totals(conn, database_id, start_ts, end_ts)
+
+    async def rollup_totals(self, database_id: str, start_iso: str, end_iso: str):
+        """Сумма почасовых счётчиков базы за период (включительно) или None без счётчиков."""
+        if self.rollups is None or database_id not in self.rollups:
+            return None
+        return await asyncio.to_thread(self._rollup_totals, database_id,
+                                       parse_iso(start_iso).timestamp(), parse_iso(end_iso).timestamp())
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
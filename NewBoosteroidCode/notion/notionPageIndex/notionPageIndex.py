@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_INDEX_PATH = os.path.join(os.getcwd(), "data", "page_index.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_index (
+    external_id TEXT PRIMARY KEY,
+    page_id TEXT NOT NULL,
+    source TEXT,
+    created_at REAL
+);
+"""
+
+
+class NotionPageIndex:
+    """
+    Постоянный индекс «внешний ID → ID страницы Notion» (ID поста Reddit,
+    Request ID из Discord). Заполняется при создании страницы и лениво из Notion.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        # Файл и схема создаются при первом обращении, в потоке asyncio.to_thread
+        self._conn = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "backfilled": 0, "not_found": 0}
+
+    def _connection(self):
+        # Вызывается под self._lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, external_id):
+        with self._lock:
+            row = self._connection().execute("SELECT page_id FROM page_index WHERE external_id = ?",
+                                     (external_id,)).fetchone()
+        return row[0] if row else None
+
+    def _put(self, external_id, page_id, source):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO page_index (external_id, page_id, source, created_at) VALUES (?, ?, ?, ?)",
+                (external_id, page_id, source, time.time()))
+            conn.commit()
+
+    async def remember(self, external_id: str, page_id: str, source: str = None):
+        await asyncio.to_thread(self._put, str(external_id), page_id, source)
+
+    async def lookup(self, external_id: str):
+        return await asyncio.to_thread(self._get, str(external_id))
+
+    async def resolve(self, notion, database_id: str, external_id: str, source: str = None):
+        """
+        ID страницы по внешнему ID: сначала из индекса (страницы, созданные нами,
+        находятся сразу, даже если Notion их ещё не проиндексировал), иначе
+        поиском в Notion по свойству ID с сохранением результата.
+        """
+        page_id = await self.lookup(external_id)
+        if page_id:
+            self.stats["hits"] += 1
+            return page_id
+        self.stats["misses"] += 1
+        query = await notion.query(
+            database_id=database_id,
+            filter={"property": "ID", "rich_text": {"equals": str(external_id)}}
+        )
+        if query.get("results"):
+            page_id = query["results"][0]["id"]
+            await self.remember(external_id, page_id, source)
+            self.stats["backfilled"] += 1
+            return page_id
+        self.stats["not_found"] += 1
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_index = None
+
+
+def init_page_index(path: str = DEFAULT_INDEX_PATH) -> NotionPageIndex:
+    """Создаёт общий индекс страниц. Вызывается из main.py."""
+    global _index
+    _index = NotionPageIndex(path)
+    return _index
+
+
+def get_page_index():
+    return _index
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+# Notion отдаёт не больше 100 записей за один запрос
+NOTION_PAGE_SIZE = 100
+# Длинные периоды режем на окна и запрашиваем их параллельно
+DEFAULT_WINDOW = timedelta(days=1)
+DEFAULT_CONCURRENCY = 4
+
+
+class QueryStats:
+    """Счётчики для запросов к базе Notion: строки, HTTP-запросы, окна и время."""
+
+    def __init__(self):
+        self.rows = 0
+        self.requests = 0
+        self.windows = 0
+        self.request_time = 0.0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "requests": self.requests,
+            "windows": self.windows,
+            "request_time": round(self.request_time, 3),
+            "elapsed": round(self.elapsed, 3),
+        }
+
+    def __str__(self):
+        return (f"{self.rows} строк, {self.requests} запросов, {self.windows} окон, "
+                f"{self.elapsed:.2f} с (в запросах {self.request_time:.2f} с)")
+
+
+def parse_iso(value: str) -> datetime:
+    """Разбирает ISO-дату Notion/отчётов ('...Z', '+00:00' или без зоны) в aware-datetime UTC."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def date_range_filter(start_iso: str, end_iso: str, date_property: str = "Date",
+                      inclusive_end: bool = True, extra_filter: dict = None) -> dict:
+    conditions = [
+        {"property": date_property, "date": {"on_or_after": start_iso}},
+        {"property": date_property, "date": {"on_or_before" if inclusive_end else "before": end_iso}},
+    ]
+    if extra_filter:
+        conditions.append(extra_filter)
+    return {"and": conditions}
+
+
+def split_date_range(start_iso: str, end_iso: str, window: timedelta = DEFAULT_WINDOW) -> list:
+    """
+    Делит период на окна [start, end). Последнее окно включает конец периода,
+    чтобы граничные записи не терялись и не дублировались.
+    Возвращает список кортежей (start_iso, end_iso, inclusive_end).
+    """
+    start_dt = parse_iso(start_iso)
+    end_dt = parse_iso(end_iso)
+    if window <= timedelta(0) or end_dt - start_dt <= window:
+        return [(start_iso, end_iso, True)]
+    windows = []
+    current = start_dt
+    while current + window < end_dt:
+        windows.append((current.isoformat(), (current + window).isoformat(), False))
+        current += window
+    windows.append((current.isoformat(), end_iso, True))
+    return windows
+
+
+async def iter_database(notion, database_id: str, filter: dict = None, sorts: list = None,
+                        page_size: int = NOTION_PAGE_SIZE, stats: QueryStats = None):
+    """Асинхронный итератор по всем записям запроса, с переходом по next_cursor."""
+    cursor = None
+    while True:
+        kwargs = {"database_id": database_id, "page_size": page_size}
+        if filter:
+            kwargs["filter"] = filter
+        if sorts:
+            kwargs["sorts"] = sorts
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        started = time.perf_counter()
+        response = await notion.databases.query(**kwargs)
+        if stats is not None:
+            stats.requests += 1
+            stats.request_time += time.perf_counter() - started
+        for page in response.get("results", []):
+            if stats is not None:
+                stats.rows += 1
+            yield page
+        cursor = response.get("next_cursor")
+        if not response.get("has_more") or not cursor:
+            break
+
+
+async def _fetch_window(notion, database_id, filter_body, semaphore, stats):
+    async with semaphore:
+        return [page async for page in iter_database(notion, database_id, filter=filter_body, stats=stats)]
+
+
+async def query_date_range(notion, database_id: str, start_iso: str, end_iso: str,
+                           date_property: str = "Date", extra_filter: dict = None,
+                           window: timedelta = DEFAULT_WINDOW, concurrency: int = DEFAULT_CONCURRENCY,
+                           stats: QueryStats = None) -> list:
+    """
+    Возвращает все записи базы за период. Период делится на окна, которые
+    выгружаются параллельно (не более concurrency одновременно); каждое окно
+    проходит все страницы Notion. Порядок результатов — по окнам.
+    """
+    windows = split_date_range(start_iso, end_iso, window)
+    if stats is not None:
+        stats.windows += len(windows)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    chunks = await asyncio.gather(*(
+        _fetch_window(notion, database_id,
+                      date_range_filter(w_start, w_end, date_property, inclusive, extra_filter),
+                      semaphore, stats)
+        for w_start, w_end, inclusive in windows
+    ))
+    seen = set()
+    results = []
+    for chunk in chunks:
+        for page in chunk:
+            if page.get("id") in seen:
+                continue
+            seen.add(page.get("id"))
+            results.append(page)
+    if stats is not None:
+        stats.finish()
+    return results
+
+
+async def iter_date_range(notion, database_id: str, start_iso: str, end_iso: str,
+                          date_property: str = "Date", extra_filter: dict = None,
+                          window: timedelta = DEFAULT_WINDOW, concurrency: int = DEFAULT_CONCURRENCY,
+                          stats: QueryStats = None, buffer_size: int = NOTION_PAGE_SIZE * 2):
+    """
+    Потоковый вариант query_date_range: записи отдаются по мере загрузки,
+    без накопления всего периода в памяти. Порядок между окнами не гарантирован.
+    """
+    windows = split_date_range(start_iso, end_iso, window)
+    if stats is not None:
+        stats.windows += len(windows)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    queue = asyncio.Queue(maxsize=buffer_size)
+    done = object()
+
+    async def worker(w_start, w_end, inclusive):
+        try:
+            async with semaphore:
+                filter_body = date_range_filter(w_start, w_end, date_property, inclusive, extra_filter)
+                async for page in iter_database(notion, database_id, filter=filter_body, stats=stats):
+                    await queue.put(page)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(done)
+
+    tasks = [asyncio.create_task(worker(*w)) for w in windows]
+    remaining = len(tasks)
+    seen = set()
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            if item.get("id") in seen:
+                continue
+            seen.add(item.get("id"))
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        if stats is not None:
+            stats.finish()
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import heapq
+import random
+import time
+
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from common.metrics import metrics
+
+# Приоритеты: меньше — раньше. Команды Telegram не ждут фоновую загрузку.
+INTERACTIVE = 0
+REPORT = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REPORT: "report", BACKGROUND: "background"}
+
+# Notion допускает в среднем около 3 запросов в секунду на интеграцию
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 3
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Методы, повтор которых после таймаута или 5xx может создать дубликат:
+# запрос мог уже выполниться на стороне Notion. Их повторяем только на 429
+NON_IDEMPOTENT_METHODS = {"create"}
+
+
+class NotionRateLimiter:
+    """
+    Общий планировщик запросов к Notion: token bucket с очередью по приоритетам.
+    На 429 соблюдает Retry-After (пауза для всех вызывающих), на прочие временные
+    ошибки (5xx, в том числе не-JSON страницы, и таймауты) — экспоненциальная
+    задержка с джиттером. Неидемпотентные запросы (pages.create) после 5xx
+    и таймаута не повторяются.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, max_retries: int = MAX_RETRIES,
+                 base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._seq = 0
+        self._dispatcher = None
+        self.stats = {
+            "requests": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "failed": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    # --- Token bucket ---
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def queue_depth(self) -> dict:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+        return depth
+
+    async def _dispatch(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._refill()
+            if self._tokens >= 1:
+                heapq.heappop(self._waiters)
+                self._tokens -= 1
+                future.set_result(None)
+            else:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def acquire(self, priority: int = BACKGROUND):
+        """Ждёт разрешения на один запрос."""
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, future))
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+        waited = time.monotonic() - started
+        self.stats["wait_time_total"] += waited
+        self.stats["wait_time_max"] = max(self.stats["wait_time_max"], waited)
+
+    # --- Повторы ---
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = None
+        headers = getattr(error, "headers", None)
+        if headers is not None:
+            retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 0.5)
+            except ValueError:
+                pass
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    async def call(self, method, *args, priority: int = BACKGROUND, idempotent: bool = None, **kwargs):
+        """
+        Выполняет запрос к Notion через общий лимит, с повторами на 429, 5xx и таймауты.
+        idempotent=None — определяется по методу (create неидемпотентен).
+        """
+        if idempotent is None:
+            idempotent = getattr(method, "__name__", None) not in NON_IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            self.stats["requests"] += 1
+            started = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+                _observe(method, started)
+                return result
+            except (HTTPResponseError, RequestTimeoutError) as e:
+                # HTTPResponseError — в том числе APIResponseError; у таймаута статуса нет
+                _observe(method, started, error=True)
+                status = getattr(e, "status", None)
+                if status == 429:
+                    metrics.count_rate_limited("notion")
+                # 429 означает, что запрос не выполнен; после 5xx и таймаута это неизвестно
+                retryable = status == 429 or (idempotent and (status is None or status in RETRY_STATUSES))
+                if not retryable or attempt >= self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if status == 429:
+                    self.stats["rate_limited"] += 1
+                    # Лимит общий для интеграции — притормаживаем всех
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                self.stats["retries"] += 1
+                attempt += 1
+                reason = f"ответил {status}" if status is not None else "не ответил вовремя"
+                print(f"Notion {reason}, повтор {attempt}/{self.max_retries} через {delay:.1f} с")
+                await asyncio.sleep(delay)
+            except Exception:
+                _observe(method, started, error=True)
+                raise
+
+    def snapshot(self) -> dict:
+        stats = dict(self.stats)
+        stats["queue_depth"] = self.queue_depth()
+        stats["tokens"] = round(self._tokens, 2)
+        return stats
+
+    def wrap(self, client, priority: int = BACKGROUND):
+        """Клиент с интерфейсом AsyncClient, все запросы которого идут через лимитер."""
+        return RateLimitedNotion(client, self, priority)
+
+
+def _observe(method, started: float, error: bool = False):
+    if not metrics.enabled():
+        return
+    # DatabasesEndpoint.query -> databases.query
+    name = getattr(method, "__qualname__", None) or getattr(method, "__name__", "call")
+    metrics.observe_call("notion", name.replace("Endpoint", "").lower(), time.perf_counter() - started, error)
+
+
+class _Endpoint:
+    def __init__(self, endpoint, limiter, priority):
+        self._endpoint = endpoint
+        self._limiter = limiter
+        self._priority = priority
+
+    def __getattr__(self, name):
+        method = getattr(self._endpoint, name)
+        return functools.partial(self._limiter.call, method, priority=self._priority)
+
+
+class RateLimitedNotion:
+    """Обёртка над AsyncClient: notion.databases.query(...), notion.pages.create/update(...)."""
+
+    def __init__(self, client, limiter: NotionRateLimiter, priority: int = BACKGROUND):
+        self.client = client
+        self.limiter = limiter
+        self.priority = priority
+        self.databases = _Endpoint(client.databases, limiter, priority)
+        self.pages = _Endpoint(client.pages, limiter, priority)
+
+
+_limiter = None
+
+
+def init_rate_limiter(rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> NotionRateLimiter:
+    """Создаёт общий для процесса лимитер Notion. Вызывается из main.py до создания клиентов."""
+    global _limiter
+    _limiter = NotionRateLimiter(rate=rate, burst=burst)
+    return _limiter
+
+
+def get_rate_limiter():
+    return _limiter
+
+
+def rate_limited(client, priority: int = BACKGROUND):
+    """Оборачивает клиента общим лимитером, если он инициализирован."""
+    if _limiter is None:
+        return client
+    return _limiter.wrap(client, priority)
@@ -0,0 +1,174 @@
+import json
+import math
+from collections import Counter
+
+from telegramFunctions.reportAggregation.reportAggregation import (
+    select_name, status_name, plain_text, ISSUE_DIMENSIONS
+)
+
+HOUR = 3600
+# Меняется при изменении набора метрик: счётчики баз со старой версией пересчитываются
+ROLLUP_VERSION = 2
+
+# Типы баз, для которых ведутся почасовые счётчики
+ISSUES = "issues"
+REDDIT_COMMENTS = "reddit_comments"
+YOUTUBE = "youtube"
+ANALYTICS = "analytics"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    database_id TEXT NOT NULL,
+    hour_ts INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (database_id, hour_ts, metric)
+);
+CREATE TABLE IF NOT EXISTS rollup_contrib (
+    database_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    hour_ts INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    PRIMARY KEY (database_id, page_id)
+);
+CREATE TABLE IF NOT EXISTS rollup_meta (
+    database_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+def issue_metrics(props: dict) -> list:
+    # По метрике на каждое измерение разбивок (REPORT_BREAKDOWNS), как в ColumnarTable
+    metrics = ["total"] + [f"{dim}={extract(props)}" for dim, extract in ISSUE_DIMENSIONS.items()]
+    flair = select_name(props.get("Post Flair"))
+    status = status_name(props.get("Status"))
+    if flair == "Help":
+        metrics.append(f"help_status={status}")
+        if plain_text(props.get("Response from moderator")):
+            metrics.append("help_response")
+    return metrics
+
+
+def youtube_metrics(props: dict) -> list:
+    return ["total", f"author={select_name(props.get('Author ( Community Manager )'))}"]
+
+
+def analytics_metrics(props: dict) -> list:
+    return ["total", f"reaction={select_name(props.get('Reaction'))}"]
+
+
+METRICS = {
+    ISSUES: issue_metrics,
+    REDDIT_COMMENTS: lambda props: ["total"],
+    YOUTUBE: youtube_metrics,
+    ANALYTICS: analytics_metrics,
+}
+
+
+def hour_floor(ts: float) -> int:
+    return int(ts // HOUR * HOUR)
+
+
+def hour_ceil(ts: float) -> int:
+    return int(math.ceil(ts / HOUR) * HOUR)
+
+
+class NotionRollups:
+    """
+    Почасовые счётчики по базам зеркала. Для каждой страницы запоминается её
+    вклад (час + список метрик); при изменении страницы старый вклад вычитается,
+    новый прибавляется, поэтому поздние правки (смена статуса) исправляют только
+    свой час. Работает на соединении SQLite зеркала, под его блокировкой.
+    """
+
+    def __init__(self, kinds: dict):
+        # {database_id: ISSUES | REDDIT_COMMENTS | YOUTUBE | ANALYTICS}
+        self.kinds = {db: kind for db, kind in kinds.items() if db}
+
+    def __contains__(self, database_id):
+        return database_id in self.kinds
+
+    def setup(self, conn):
+        conn.executescript(SCHEMA)
+        # Зеркало, заполненное до появления счётчиков или с прежним набором метрик, пересчитываем один раз
+        for database_id in self.kinds:
+            row = conn.execute("SELECT version FROM rollup_meta WHERE database_id = ?", (database_id,)).fetchone()
+            if row is None or row[0] != ROLLUP_VERSION:
+                self.rebuild(conn, database_id)
+                conn.execute("INSERT OR REPLACE INTO rollup_meta (database_id, version) VALUES (?, ?)",
+                             (database_id, ROLLUP_VERSION))
+        conn.commit()
+
+    def contribution(self, database_id: str, date_ts, properties: dict):
+        if date_ts is None:
+            return None, []
+        return hour_floor(date_ts), METRICS[self.kinds[database_id]](properties)
+
+    def _bump(self, conn, database_id, hour_ts, metrics, sign):
+        conn.executemany(
+            "INSERT INTO rollups (database_id, hour_ts, metric, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(database_id, hour_ts, metric) DO UPDATE SET count = count + excluded.count",
+            [(database_id, hour_ts, metric, sign) for metric in metrics])
+
+    def apply(self, conn, database_id: str, rows):
+        """rows: [(page_id, date_ts, properties)]. Вызывается внутри транзакции зеркала."""
+        if database_id not in self.kinds:
+            return
+        for page_id, date_ts, properties in rows:
+            old = conn.execute("SELECT hour_ts, metrics FROM rollup_contrib WHERE database_id = ? AND page_id = ?",
+                               (database_id, page_id)).fetchone()
+            hour_ts, metrics = self.contribution(database_id, date_ts, properties)
+            if old is not None:
+                old_metrics = json.loads(old[1])
+                if old[0] == hour_ts and old_metrics == metrics:
+                    continue
+                self._bump(conn, database_id, old[0], old_metrics, -1)
+            if hour_ts is None:
+                conn.execute("DELETE FROM rollup_contrib WHERE database_id = ? AND page_id = ?",
+                             (database_id, page_id))
+                continue
+            self._bump(conn, database_id, hour_ts, metrics, 1)
+            conn.execute("INSERT OR REPLACE INTO rollup_contrib (database_id, page_id, hour_ts, metrics) "
+                         "VALUES (?, ?, ?, ?)", (database_id, page_id, hour_ts, json.dumps(metrics, ensure_ascii=False)))
+
+    def remove(self, conn, database_id: str, page_ids):
+        if database_id not in self.kinds:
+            return
+        for page_id in page_ids:
+            old = conn.execute("SELECT hour_ts, metrics FROM rollup_contrib WHERE database_id = ? AND page_id = ?",
+                               (database_id, page_id)).fetchone()
+            if old is None:
+                continue
+            self._bump(conn, database_id, old[0], json.loads(old[1]), -1)
+            conn.execute("DELETE FROM rollup_contrib WHERE database_id = ? AND page_id = ?", (database_id, page_id))
+
+    def rebuild(self, conn, database_id: str):
+        conn.execute("DELETE FROM rollups WHERE database_id = ?", (database_id,))
+        conn.execute("DELETE FROM rollup_contrib WHERE database_id = ?", (database_id,))
+        rows = conn.execute("SELECT page_id, date_ts, properties FROM pages WHERE database_id = ?",
+                            (database_id,)).fetchall()
+        self.apply(conn, database_id, [(page_id, date_ts, json.loads(props)) for page_id, date_ts, props in rows])
+
+    def totals(self, conn, database_id: str, start_ts: float, end_ts: float) -> Counter:
+        """
+        Сумма метрик за [start_ts, end_ts]: полные часы берутся из счётчиков,
+        неполные часы на краях окна досчитываются по записям зеркала.
+        """
+        totals = Counter()
+        first_hour, last_hour = hour_ceil(start_ts), hour_floor(end_ts)
+        if first_hour >= last_hour:
+            edges = [(start_ts, end_ts, True)]
+        else:
+            for metric, count in conn.execute(
+                    "SELECT metric, SUM(count) FROM rollups WHERE database_id = ? AND hour_ts >= ? AND hour_ts < ? "
+                    "GROUP BY metric", (database_id, first_hour, last_hour)):
+                totals[metric] += count
+            edges = [(start_ts, first_hour, False), (last_hour, end_ts, True)]
+        for edge_start, edge_end, inclusive in edges:
+            op = "<=" if inclusive else "<"
+            for date_ts, properties in conn.execute(
+                    f"SELECT date_ts, properties FROM pages WHERE database_id = ? AND date_ts >= ? AND date_ts {op} ?",
+                    (database_id, edge_start, edge_end)):
+                totals.update(self.contribution(database_id, date_ts, json.loads(properties))[1])
+        return +totals
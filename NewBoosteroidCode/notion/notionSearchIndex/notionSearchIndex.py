@@ -0,0 +1,165 @@
+import datetime
+import time
+import unicodedata
+from collections import Counter
+
+SEARCH_DAYS = 7
+REFRESH_INTERVAL = 60
+# Доля совпавших триграмм запроса, с которой запись считается нечётким совпадением
+FUZZY_THRESHOLD = 0.5
+# Вес полей при ранжировании
+FIELD_WEIGHTS = {"Title": 3.0, "Username": 3.0, "Description": 1.0}
+FIELD_KINDS = {"Title": "rich_text", "Username": "title", "Description": "rich_text"}
+
+
+def normalize(text: str) -> str:
+    """Регистр и диакритика не учитываются: «Café» и «cafe» совпадают."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str) -> list:
+    return "".join(ch if ch.isalnum() else " " for ch in text).split()
+
+
+def trigrams(text: str) -> set:
+    grams = set()
+    for token in tokenize(text):
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def field_text(page: dict, field: str) -> str:
+    prop = page.get("properties", {}).get(field) or {}
+    return "".join(
+        item.get("plain_text") or item.get("text", {}).get("content", "")
+        for item in prop.get(FIELD_KINDS.get(field, "rich_text"), [])
+    )
+
+
+class _Doc:
+    __slots__ = ("page", "last_edited", "date_ts", "fields", "grams")
+
+    def __init__(self, page, date_ts):
+        self.page = page
+        self.last_edited = page.get("last_edited_time")
+        self.date_ts = date_ts or 0
+        self.fields = {field: normalize(field_text(page, field)) for field in FIELD_WEIGHTS}
+        self.grams = set()
+        for text in self.fields.values():
+            self.grams |= trigrams(text)
+
+
+class IssueSearchIndex:
+    """
+    Индекс записей TechnicalIssues за последние days дней в памяти: триграммы
+    по Title, Username и Description. Обновляется из локального зеркала — заново
+    индексируются только изменившиеся записи. Команды модераторов ищут здесь
+    без запросов к Notion.
+    """
+
+    def __init__(self, mirror, database_id: str, days: int = SEARCH_DAYS):
+        self.mirror = mirror
+        self.database_id = database_id
+        self.days = days
+        self._docs = {}
+        self._postings = {}
+        self.refreshed_at = None
+        self.stats = {"refreshes": 0, "indexed": 0, "removed": 0, "searches": 0}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, page_id, doc):
+        self._docs[page_id] = doc
+        for gram in doc.grams:
+            self._postings.setdefault(gram, set()).add(page_id)
+
+    def _remove(self, page_id):
+        doc = self._docs.pop(page_id, None)
+        if doc is None:
+            return
+        for gram in doc.grams:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(page_id)
+                if not postings:
+                    del self._postings[gram]
+
+    async def refresh(self, sync: bool = True):
+        """Догружает изменения из зеркала (после его догрузки) и убирает устаревшие записи."""
+        if sync and not await self.mirror.refresh(self.database_id):
+            # Зеркало ещё не загружено периодической задачей — команды пока ищут в Notion
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        since = now - datetime.timedelta(days=self.days)
+        seen = set()
+        async for page in self.mirror.iter_query(self.database_id, since.isoformat(), now.isoformat()):
+            page_id = page["id"]
+            seen.add(page_id)
+            current = self._docs.get(page_id)
+            if current is not None and current.last_edited == page.get("last_edited_time"):
+                continue
+            self._remove(page_id)
+            self._add(page_id, _Doc(page, self._date_ts(page)))
+            self.stats["indexed"] += 1
+        for page_id in [page_id for page_id in self._docs if page_id not in seen]:
+            self._remove(page_id)
+            self.stats["removed"] += 1
+        self.refreshed_at = time.time()
+        self.stats["refreshes"] += 1
+
+    @staticmethod
+    def _date_ts(page):
+        start = ((page.get("properties", {}).get("Date") or {}).get("date") or {}).get("start")
+        if not start:
+            return 0
+        try:
+            return datetime.datetime.fromisoformat(start.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0
+
+    def _substring_candidates(self, needle: str):
+        """
+        Записи, которые могут содержать needle как подстроку: пересечение списков
+        по триграммам внутри слов запроса (они есть и в середине слова записи).
+        Если таких триграмм нет (запрос короче трёх символов) — все записи.
+        """
+        inner = {token[i:i + 3] for token in tokenize(needle) for i in range(len(token) - 2)}
+        if not inner:
+            return self._docs.keys()
+        postings = sorted((self._postings.get(gram, set()) for gram in inner), key=len)
+        return set.intersection(*postings)
+
+    def search(self, query: str, limit: int = None, fuzzy: bool = True) -> list:
+        """
+        Записи, подходящие под запрос, от лучших к худшим (при равенстве — новые выше).
+        Точное вхождение подстроки весит больше нечёткого совпадения по триграммам.
+        limit=None — все совпадения.
+        """
+        self.stats["searches"] += 1
+        needle = normalize(query).strip()
+        if not needle:
+            docs = sorted(self._docs.values(), key=lambda doc: doc.date_ts, reverse=True)
+            return [doc.page for doc in docs[:limit]]
+        query_grams = trigrams(needle)
+        hits = Counter()
+        for gram in query_grams:
+            for page_id in self._postings.get(gram, ()):
+                hits[page_id] += 1
+        scored = []
+        for page_id in set(hits) | set(self._substring_candidates(needle)):
+            doc = self._docs[page_id]
+            score = sum(weight for field, weight in FIELD_WEIGHTS.items() if needle in doc.fields[field])
+            # Запрос без букв и цифр («#», «-», эмодзи) не даёт триграмм — только точное вхождение
+            similarity = hits.get(page_id, 0) / len(query_grams) if query_grams else 0.0
+            if score == 0 and (not fuzzy or similarity < FUZZY_THRESHOLD):
+                continue
+            scored.append((score + similarity, doc.date_ts, doc.page))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [page for _, _, page in scored[:limit]]
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, documents=len(self._docs), trigrams=len(self._postings),
+                    refreshed_at=self.refreshed_at)
@@ -0,0 +1,46 @@
+import unittest
+
+from notion.notionSearchIndex.notionSearchIndex import IssueSearchIndex, _Doc
+
+
+def make_page(page_id, title, username="user"):
+    return {
+        "id": page_id,
+        "last_edited_time": "2024-01-01T00:00:00.000Z",
+        "properties": {
+            "Title": {"rich_text": [{"plain_text": title}]},
+            "Username": {"title": [{"plain_text": username}]},
+        },
+    }
+
+
+class IssueSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = IssueSearchIndex(None, "db")
+        titles = {"a": "Boosteroid lag #42", "b": "Black screen", "c": "Controller disconnects", "d": "Audio - crackling"}
+        for ts, (page_id, title) in enumerate(titles.items()):
+            self.index._add(page_id, _Doc(make_page(page_id, title), ts))
+
+    def ids(self, query, **kwargs):
+        return sorted(page["id"] for page in self.index.search(query, **kwargs))
+
+    def test_query_without_alphanumerics(self):
+        self.assertEqual(self.ids("#"), ["a"])
+        self.assertEqual(self.ids("-"), ["d"])
+        self.assertEqual(self.ids("🎮"), [])
+
+    def test_short_query(self):
+        self.assertEqual(self.ids("ck"), ["b", "d"])
+        self.assertEqual(self.ids("42"), ["a"])
+
+    def test_mid_word_substring(self):
+        self.assertEqual(self.ids("oste"), ["a"])
+        self.assertEqual(self.ids("ontrol", fuzzy=False), ["c"])
+
+    def test_limit_is_opt_in(self):
+        self.assertEqual(len(self.index.search("")), 4)
+        self.assertEqual(len(self.index.search("", limit=2)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+
+from notion_client import AsyncClient
+
+from notion.notionRateLimiter.notionRateLimiter import BACKGROUND, get_rate_limiter
+
+# Сколько запросов к Notion одновременно может выполнять один писатель
+DEFAULT_CONCURRENCY = 3
+
+
+class NotionWriter:
+    """
+    Асинхронная запись в Notion для модулей загрузки данных.
+    Запросы не блокируют цикл событий, а их число одновременно ограничено.
+    Если задан лимитер, каждый запрос проходит через его очередь с приоритетом.
+    """
+
+    def __init__(self, notion_token: str = None, client=None, concurrency: int = DEFAULT_CONCURRENCY,
+                 limiter=None, priority: int = BACKGROUND):
+        self.client = client if client is not None else AsyncClient(auth=notion_token)
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter
+        self.priority = priority
+        self._semaphore = None
+        self.stats = {"created": 0, "updated": 0, "queried": 0, "failed": 0, "in_flight": 0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _call(self, kind: str, method, priority: int = None, **kwargs):
+        async with self._get_semaphore():
+            self.stats["in_flight"] += 1
+            try:
+                if self.limiter is not None:
+                    priority = self.priority if priority is None else priority
+                    result = await self.limiter.call(method, priority=priority, **kwargs)
+                else:
+                    result = await method(**kwargs)
+            except Exception:
+                self.stats["failed"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+        self.stats[kind] += 1
+        return result
+
+    async def create_page(self, priority: int = None, **page) -> dict:
+        return await self._call("created", self.client.pages.create, priority, **page)
+
+    async def update_page(self, page_id: str, properties: dict, priority: int = None) -> dict:
+        return await self._call("updated", self.client.pages.update, priority, page_id=page_id, properties=properties)
+
+    async def query(self, priority: int = None, **kwargs) -> dict:
+        return await self._call("queried", self.client.databases.query, priority, **kwargs)
+
+
+_writer = None
+
+
+def init_notion_writer(notion_token: str, concurrency: int = DEFAULT_CONCURRENCY) -> NotionWriter:
+    """Создаёт общий для процесса писатель Notion. Вызывается из main.py."""
+    global _writer
+    _writer = NotionWriter(notion_token, concurrency=concurrency, limiter=get_rate_limiter())
+    return _writer
+
+
+def get_notion_writer() -> NotionWriter:
+    if _writer is None:
+        raise RuntimeError("NotionWriter не инициализирован: вызовите init_notion_writer()")
+    return _writer
@@ -1,18 +1,20 @@
-import os
-from dotenv import load_dotenv
+import logging
 from datetime import datetime
 import time
-import asyncpraw
-import aiohttp
-import ssl
-import certifi
+from redditFunctions.redditClient.redditClient import get_reddit
+from redditFunctions.redditWatermarks.redditWatermarks import (
+    fetch_new_items, advance_watermark, is_new, load_watermark, record_failure, clear_failure,
+    retry_failed_items, INITIAL_LOOKBACK
+)
+from redditFunctions.redditEventBus.redditEventBus import COMMENT
+from common.config.config import get_config
 
-load_dotenv(dotenv_path="../../.env")
+stream_log = logging.getLogger("reddit.stream.comments")
 
 ##one_hour_ago = int(time.time()) - 3600
 
-def add_comments_to_notion(comment, notion):
-    database_id = os.getenv("NOTION_REDDIT_COMMENTS_DB")
+async def add_comments_to_notion(comment, notion):
+    database_id = get_config().notion_reddit_comments_db
 
     if not database_id:
         raise ValueError("COMMENTS DATABASE NOT FOUND")
@@ -39,29 +41,50 @@ def add_comments_to_notion(comment, notion):
         }
     }
 
-    notion.pages.create(**new_page)
+    await notion.create_page(**new_page)
 
-async def scan_comments_and_add_to_notion(reddit, notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, IGNORED_USERS):
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        reddit = asyncpraw.Reddit(
-            client_id=REDDIT_CLIENT_ID,
-            client_secret=REDDIT_CLIENT_SECRET,
-            user_agent=REDDIT_USER_AGENT,
-            requestor_kwargs={"session": session}
-        )
+async def process_comment(comment, notion, IGNORED_USERS) -> bool:
+    """Как process_post: знак сдвигается всегда, неудачная запись запоминается для повтора."""
+    if comment.author and comment.author.name in IGNORED_USERS:
+        stream_log.info("Комментарий от %s игнорируется", comment.author)
+    else:
+        stream_log.info("Найден новый комментарий в сабреддите: %.200s", comment.body)
+        try:
+            await add_comments_to_notion(comment, notion)
+        except Exception as e:
+            print(f"Ошибка при добавлении комментария {comment.id}: {e}")
+            record_failure("comments", comment)
+            advance_watermark("comments", comment)
+            return False
+        clear_failure("comments", comment)
+    advance_watermark("comments", comment)
+    return True
 
-        subreddit = await reddit.subreddit("BoosteroidCommunity")
-        # Каждый раз вычисляем порог времени
-        one_hour_ago = int(time.time()) - 3600
+async def retry_failed_comments(notion, IGNORED_USERS):
+    """Повтор записи комментариев, на которых Notion ответил ошибкой."""
+    reddit = await get_reddit()
+    await retry_failed_items(reddit, "comments", lambda comment: process_comment(comment, notion, IGNORED_USERS))
 
-        async for comment in subreddit.comments(limit=100):
-            if comment.author and comment.author.name in IGNORED_USERS:
-                print(f"Комментарий от {comment.author} игнорируется")
-                continue
+async def scan_comments_and_add_to_notion(notion, IGNORED_USERS):
+    """Догрузка комментариев с последнего водяного знака (при старте и после пропусков в шине)."""
+    reddit = await get_reddit()
+    subreddit = await reddit.subreddit(get_config().subreddit_name)
+    # Все комментарии после водяного знака, от старых к новым
+    comments = await fetch_new_items(subreddit.comments(limit=None), "comments")
 
-            if comment.created_utc >= one_hour_ago:
-                print(f"Найден новый комментарий в сабреддите: {comment.body}")
-                add_comments_to_notion(comment, notion)
-            else:
-                break
+    for comment in comments:
+        await process_comment(comment, notion, IGNORED_USERS)
+
+async def ingest_comment(event, notion, IGNORED_USERS):
+    if is_new(event.item, load_watermark("comments"), time.time() - INITIAL_LOOKBACK):
+        await process_comment(event.item, notion, IGNORED_USERS)
+
+def subscribe_comments_to_notion(bus, notion, IGNORED_USERS):
+    """Подписывает загрузку комментариев в Notion на общую шину Reddit."""
+    bus.subscribe(
+        "comment_ingester",
+        lambda event: ingest_comment(event, notion, IGNORED_USERS),
+        kinds=(COMMENT,),
+        include_backlog=True,
+        catch_up=lambda: scan_comments_and_add_to_notion(notion, IGNORED_USERS),
+    )
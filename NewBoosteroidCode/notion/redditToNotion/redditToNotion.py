@@ -1,30 +1,25 @@
-import os
+import logging
 import uuid
-from dotenv import load_dotenv
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 import time
-import asyncpraw
-import aiohttp
-import ssl
-import certifi
-import asyncio
-import notion_client
 import re
-
-load_dotenv()  # Файл .env должен быть в корне проекта
-
-print("NOTION_TECHNICAL_ISSUES_DB =", os.getenv("NOTION_TECHNICAL_ISSUES_DB"))
-
-# Инициализируем клиент Notion (синхронно)
-notion = notion_client.Client(auth=os.getenv("NOTION_TOKEN"))
-
-REDDIT_CLIENT_ID = os.getenv("CLIENT_ID")
-REDDIT_CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-REDDIT_USER_AGENT = os.getenv("USER_AGENT")
-NOTION_TECHNICAL_ISSUES_DB = os.getenv("NOTION_TECHNICAL_ISSUES_DB")
+from redditFunctions.redditClient.redditClient import get_reddit
+from redditFunctions.redditWatermarks.redditWatermarks import (
+    fetch_new_items, advance_watermark, is_new, load_watermark, record_failure, clear_failure,
+    retry_failed_items, INITIAL_LOOKBACK
+)
+from redditFunctions.redditEventBus.redditEventBus import SUBMISSION, COMMENT
+from notion.notionWriter.notionWriter import get_notion_writer
+from notion.notionPageIndex.notionPageIndex import get_page_index
+from notion.notionAutoSolve.notionAutoSolve import AutoSolveEngine
+from common.config.config import get_config
+
+# Сообщения по каждому элементу потока Reddit ограничены по частоте (см. LOG_RATE_LIMITS)
+stream_log = logging.getLogger("reddit.stream.notion")
 
 MODERATORS = {"Alex_Boosteroid", "Andrew__Boosteroid", "Arthur_Boosteroid", "Mark_Boosteroid"}
 VALID_FLAIRS = {"help", "discussion", "suggestion", "misc", "gameplay", "feedback"}
+AUTO_SOLVE_INTERVAL = 1800
 
 def remove_emojis(text):
     return re.sub(r':\w+:', '', text)
@@ -41,7 +36,7 @@ def clean_flair(flair):
     cleaned_flair = remove_emojis(flair.strip().lower())
     return flair_mapping.get(cleaned_flair, "No Flair")
 
-def add_post_to_notion(post, notion, NOTION_TECHNICAL_ISSUES_DB):
+async def add_post_to_notion(post, notion, NOTION_TECHNICAL_ISSUES_DB):
     database_id = NOTION_TECHNICAL_ISSUES_DB
     if not database_id:
         raise ValueError("DATABASE NOT FOUND")
@@ -63,58 +58,88 @@ def add_post_to_notion(post, notion, NOTION_TECHNICAL_ISSUES_DB):
             "Response from moderator": {"rich_text": []},
         }
     }
-    notion.pages.create(**new_page)
-
-def update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post_id, mod_name, comment):
-    query = notion.databases.query(
+    page = await notion.create_page(**new_page)
+    page_index = get_page_index()
+    if page_index is not None:
+        try:
+            await page_index.remember(post.id, page["id"], "reddit")
+        except Exception as e:
+            # Страница уже создана: ошибка индекса не должна приводить к повтору и дублю,
+            # ID страницы потом найдётся поиском в Notion (page_index.resolve)
+            print(f"Не удалось сохранить пост {post.id} в индексе страниц: {e}")
+    return page
+
+async def find_page_id(notion, NOTION_TECHNICAL_ISSUES_DB, external_id):
+    page_index = get_page_index()
+    if page_index is not None:
+        return await page_index.resolve(notion, NOTION_TECHNICAL_ISSUES_DB, external_id, "reddit")
+    query = await notion.query(
         database_id=NOTION_TECHNICAL_ISSUES_DB,
-        filter={"property": "ID", "rich_text": {"equals": post_id}}
+        filter={"property": "ID", "rich_text": {"equals": external_id}}
     )
-    if query["results"]:
-        page_id = query["results"][0]["id"]
-        notion.pages.update(page_id, properties={
+    return query["results"][0]["id"] if query["results"] else None
+
+async def update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post_id, mod_name, comment):
+    page_id = await find_page_id(notion, NOTION_TECHNICAL_ISSUES_DB, post_id)
+    if page_id:
+        await notion.update_page(page_id, properties={
             "Responsible moderator": {"rich_text": [{"text": {"content": mod_name}}]},
             "Response from moderator": {"rich_text": [{"text": {"content": comment}}]},
         })
 
-async def scan_posts_and_add_to_notion(notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, NOTION_TECHNICAL_ISSUES_DB):
-    print(f"Запуск scan_posts_and_add_to_notion с {REDDIT_CLIENT_ID}")
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        reddit = asyncpraw.Reddit(
-            client_id=REDDIT_CLIENT_ID,
-            client_secret=REDDIT_CLIENT_SECRET,
-            user_agent=REDDIT_USER_AGENT,
-            requestor_kwargs={"session": session}
-        )
-        subreddit = await reddit.subreddit("BoosteroidCommunity")
-        print(f"Поиск постов с флаерами: {VALID_FLAIRS} за последние 60 минут")
+async def process_post(post, notion, NOTION_TECHNICAL_ISSUES_DB) -> bool:
+    """
+    Загружает пост в Notion. Водяной знак сдвигается в любом случае, а пост,
+    который не удалось записать, запоминается для повтора (retry_failed_posts).
+    """
+    added = False
+    try:
+        stream_log.info("Пост найден: %s", post.title)
+        flair_text = remove_emojis(post.link_flair_text.strip().lower()) if post.link_flair_text else ""
+        if flair_text in {remove_emojis(f.lower()) for f in VALID_FLAIRS}:
+            stream_log.info("Добавляю пост: %s с флаером '%s'", post.title, flair_text)
+            await add_post_to_notion(post, notion, NOTION_TECHNICAL_ISSUES_DB)
+            added = True
+        else:
+            stream_log.info("Пост не соответствует флаеру: %s", post.title)
+    except Exception as e:
+        print(f"Ошибка при обработке поста {post.id}: {e}")
+        record_failure("posts", post)
+        advance_watermark("posts", post)
+        return False
+    clear_failure("posts", post)
+    advance_watermark("posts", post)
+    if added:
         try:
-            one_hour_ago = int(time.time()) - 3600  # актуальное время для каждого вызова
-            async for post in subreddit.new(limit=100):
-                try:
-                    if post.created_utc >= one_hour_ago:
-                        print(f"Пост найден: {post.title}")
-                        flair_text = remove_emojis(post.link_flair_text.strip().lower()) if post.link_flair_text else ""
-                        if flair_text in {remove_emojis(f.lower()) for f in VALID_FLAIRS}:
-                            print(f"Добавляю пост: {post.title} с флаером '{flair_text}'")
-                            add_post_to_notion(post, notion, NOTION_TECHNICAL_ISSUES_DB)
-                            await check_moderator_comments(post, notion, NOTION_TECHNICAL_ISSUES_DB)
-                        else:
-                            print(f"Пост не соответствует флаеру: {post.title}")
-                except Exception as e:
-                    print(f"Ошибка при обработке поста {post.id}: {e}")
+            await check_moderator_comments(post, notion, NOTION_TECHNICAL_ISSUES_DB)
         except Exception as e:
-            print(f"Ошибка при получении постов: {e}")
-            await asyncio.sleep(30)
-
-async def periodic_scan_posts():
-    while True:
-        try:
-            await scan_posts_and_add_to_notion(notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, NOTION_TECHNICAL_ISSUES_DB)
-        except Exception as e:
-            print(f"Ошибка в periodic_scan_posts: {e}")
-        await asyncio.sleep(3600)
+            # Страница уже создана: повтор дал бы дубль, ответы модераторов придут и из потока комментариев
+            print(f"Ошибка при проверке ответов модераторов для поста {post.id}: {e}")
+    return True
+
+async def retry_failed_posts(notion, NOTION_TECHNICAL_ISSUES_DB):
+    """Повтор записи постов, на которых Notion ответил ошибкой."""
+    reddit = await get_reddit()
+    await retry_failed_items(reddit, "posts", lambda post: process_post(post, notion, NOTION_TECHNICAL_ISSUES_DB))
+
+async def scan_posts_and_add_to_notion(notion, NOTION_TECHNICAL_ISSUES_DB):
+    """Догрузка постов с последнего водяного знака (при старте и после пропусков в шине)."""
+    print("Запуск scan_posts_and_add_to_notion")
+    reddit = await get_reddit()
+    subreddit = await reddit.subreddit(get_config().subreddit_name)
+    print(f"Поиск постов с флаерами: {VALID_FLAIRS} с последнего сохранённого поста")
+    try:
+        # Все посты после водяного знака, с переходом по страницам листинга
+        posts = await fetch_new_items(subreddit.new(limit=None), "posts")
+        for post in posts:
+            await process_post(post, notion, NOTION_TECHNICAL_ISSUES_DB)
+    except Exception as e:
+        print(f"Ошибка при получении постов: {e}")
+
+async def ingest_post(event, notion, NOTION_TECHNICAL_ISSUES_DB):
+    # Посты, уже обработанные догрузкой, повторно не добавляем
+    if is_new(event.item, load_watermark("posts"), time.time() - INITIAL_LOOKBACK):
+        await process_post(event.item, notion, NOTION_TECHNICAL_ISSUES_DB)
 
 
 async def check_moderator_comments(post, notion, NOTION_TECHNICAL_ISSUES_DB):
@@ -122,52 +147,44 @@ async def check_moderator_comments(post, notion, NOTION_TECHNICAL_ISSUES_DB):
     await post.comments.replace_more(limit=0)
     async for comment in post.comments:
         if comment.author and comment.author.name in MODERATORS:
-            print(f"Модератор {comment.author.name} оставил комментарий: {comment.body}")
-            update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post.id, comment.author.name, comment.body)
-
-async def scan_moderator_comments(notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, NOTION_TECHNICAL_ISSUES_DB):
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        reddit = asyncpraw.Reddit(
-            client_id=REDDIT_CLIENT_ID,
-            client_secret=REDDIT_CLIENT_SECRET,
-            user_agent=REDDIT_USER_AGENT,
-            requestor_kwargs={"session": session}
-        )
-        subreddit = await reddit.subreddit("BoosteroidCommunity")
-        print("Начинаю стрим комментариев для модераторов...")
-        async for comment in subreddit.stream.comments(skip_existing=True):
-            if comment.author and comment.author.name in MODERATORS:
-                print(f"Новый комментарий модератора {comment.author.name}: {comment.body}")
-                post_id = comment.link_id.split('_')[-1]
-                update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post_id, comment.author.name, comment.body)
-
-async def update_old_posts_to_solved(notion, NOTION_TECHNICAL_ISSUES_DB):
-    one_week_ago_iso = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"before": one_week_ago_iso}},
-            {"property": "Status", "status": {"does_not_equal": "Solved"}}
-        ]
-    }
-    query = notion.databases.query(database_id=NOTION_TECHNICAL_ISSUES_DB, filter=filter_body)
-    results = query.get("results", [])
-    print(f"Найдено постов старше недели для обновления: {len(results)}")
-    for page in results:
-        page_id = page["id"]
-        print(f"Обновление статуса поста {page_id} на Solved")
-        notion.pages.update(page_id, properties={
-            "Status": {"status": {"name": "Solved"}}
-        })
-
-async def periodic_update_old_posts():
-    while True:
-        await update_old_posts_to_solved(notion, NOTION_TECHNICAL_ISSUES_DB)
-        await asyncio.sleep(1800)
+            stream_log.info("Модератор %s оставил комментарий: %.200s", comment.author.name, comment.body)
+            await update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post.id, comment.author.name, comment.body)
+
+async def scan_moderator_comments(event, notion, NOTION_TECHNICAL_ISSUES_DB):
+    comment = event.item
+    if comment.author and comment.author.name in MODERATORS:
+        stream_log.info("Новый комментарий модератора %s: %.200s", comment.author.name, comment.body)
+        post_id = comment.link_id.split('_')[-1]
+        await update_notion_with_moderator_comment(notion, NOTION_TECHNICAL_ISSUES_DB, post_id, comment.author.name, comment.body)
+
+def subscribe_reddit_to_notion(bus, notion=None, NOTION_TECHNICAL_ISSUES_DB=None):
+    """Подписывает загрузку постов и отслеживание ответов модераторов на общую шину Reddit."""
+    notion = notion or get_notion_writer()
+    NOTION_TECHNICAL_ISSUES_DB = NOTION_TECHNICAL_ISSUES_DB or get_config().notion_technical_issues_db
+    bus.subscribe(
+        "post_ingester",
+        lambda event: ingest_post(event, notion, NOTION_TECHNICAL_ISSUES_DB),
+        kinds=(SUBMISSION,),
+        include_backlog=True,
+        catch_up=lambda: scan_posts_and_add_to_notion(notion, NOTION_TECHNICAL_ISSUES_DB),
+    )
+    bus.subscribe(
+        "scan_moderator_comments",
+        lambda event: scan_moderator_comments(event, notion, NOTION_TECHNICAL_ISSUES_DB),
+        kinds=(COMMENT,),
+    )
 
-async def run_reddit_to_notion():
-    task1 = asyncio.create_task(periodic_scan_posts())
-    task2 = asyncio.create_task(scan_moderator_comments(notion, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT, NOTION_TECHNICAL_ISSUES_DB))
-    task3 = asyncio.create_task(periodic_update_old_posts())
-    await asyncio.gather(task1, task2, task3)
+async def update_old_posts_to_solved(notion, NOTION_TECHNICAL_ISSUES_DB, rules=None):
+    # Правила задаются через AUTO_SOLVE_RULES; по умолчанию всё старше недели -> Solved
+    engine = AutoSolveEngine(notion, NOTION_TECHNICAL_ISSUES_DB, rules)
+    return await engine.run()
+
+def schedule_update_old_posts(scheduler, notion=None, interval=AUTO_SOLVE_INTERVAL, NOTION_TECHNICAL_ISSUES_DB=None):
+    """
+    Автозакрытие старых постов как задача общего планировщика. Посты и комментарии
+    модераторов приходят через шину (subscribe_reddit_to_notion).
+    """
+    engine = AutoSolveEngine(notion or get_notion_writer(),
+                             NOTION_TECHNICAL_ISSUES_DB or get_config().notion_technical_issues_db)
+    return scheduler.add_interval("autosolve", interval, engine.run, jitter=60)
 
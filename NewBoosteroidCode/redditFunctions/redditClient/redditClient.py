@@ -0,0 +1,165 @@
+import asyncio
+import importlib
+import ssl
+import time
+from typing import TYPE_CHECKING
+
+import certifi
+
+from common.config.config import get_config
+from common.metrics import metrics
+
+if TYPE_CHECKING:
+    import aiohttp
+    import asyncpraw
+
+# Общий для всего процесса клиент Reddit и HTTP-сессия.
+# SSL-контекст, пул соединений и OAuth-токен создаются один раз и переиспользуются.
+# asyncpraw и aiohttp импортируются при первом обращении, в отдельном потоке:
+# это ~0.3 с, которые не должны задерживать запуск ботов и блокировать цикл событий.
+
+POOL_LIMIT = 20
+KEEPALIVE_TIMEOUT = 60
+
+_credentials = {}
+_config = {}
+_pool_limit = POOL_LIMIT
+_ssl_context = None
+_session = None
+_reddit = None
+_lock = None
+_stats = {
+    "sessions_created": 0,
+    "clients_created": 0,
+    "client_requests": 0,
+    "http_requests": 0,
+    "connections_created": 0,
+    "connections_reused": 0,
+}
+_started = time.monotonic()
+
+
+def init_reddit_client(client_id, client_secret, user_agent, pool_limit: int = POOL_LIMIT, **config):
+    """
+    Задаёт учётные данные Reddit. Без вызова берутся CLIENT_ID/CLIENT_SECRET/USER_AGENT из конфигурации.
+    config передаётся в asyncpraw.Reddit (например, oauth_url/reddit_url для локального стенда).
+    """
+    global _pool_limit
+    _credentials.update(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
+    _config.clear()
+    _config.update(config)
+    _pool_limit = pool_limit
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+async def _import(name: str):
+    return await asyncio.to_thread(importlib.import_module, name)
+
+
+def _trace_config(aiohttp) -> "aiohttp.TraceConfig":
+    async def on_request_start(session, ctx, params):
+        _stats["http_requests"] += 1
+
+    async def on_connection_create_end(session, ctx, params):
+        _stats["connections_created"] += 1
+
+    async def on_connection_reuseconn(session, ctx, params):
+        _stats["connections_reused"] += 1
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_connection_reuseconn.append(on_connection_reuseconn)
+    if metrics.enabled():
+        _add_metrics_trace(trace)
+    return trace
+
+
+def _add_metrics_trace(trace: "aiohttp.TraceConfig"):
+    # Время запроса до получения заголовков ответа; метка — HTTP-метод, без пути с ID
+    async def on_request_begin(session, ctx, params):
+        ctx.metrics_started = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        status = params.response.status
+        metrics.observe_call("reddit", params.method, time.perf_counter() - ctx.metrics_started, status >= 400)
+        if status == 429:
+            metrics.count_rate_limited("reddit")
+
+    async def on_request_exception(session, ctx, params):
+        metrics.observe_call("reddit", params.method, time.perf_counter() - ctx.metrics_started, True)
+
+    trace.on_request_start.append(on_request_begin)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+async def get_http_session() -> "aiohttp.ClientSession":
+    """Общая aiohttp-сессия с пулом keep-alive соединений."""
+    global _session
+    if _session is None or _session.closed:
+        aiohttp = await _import("aiohttp")
+        connector = aiohttp.TCPConnector(ssl=get_ssl_context(), limit=_pool_limit,
+                                         keepalive_timeout=KEEPALIVE_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config(aiohttp)])
+        _stats["sessions_created"] += 1
+    return _session
+
+
+async def get_reddit() -> "asyncpraw.Reddit":
+    """Возвращает общий экземпляр asyncpraw.Reddit (создаётся при первом обращении)."""
+    global _reddit
+    _stats["client_requests"] += 1
+    if _reddit is not None:
+        return _reddit
+    async with _get_lock():
+        if _reddit is None:
+            asyncpraw = await _import("asyncpraw")
+            session = await get_http_session()
+            config = get_config()
+            _reddit = asyncpraw.Reddit(
+                client_id=_credentials.get("client_id") or config.reddit_client_id,
+                client_secret=_credentials.get("client_secret") or config.reddit_client_secret,
+                user_agent=_credentials.get("user_agent") or config.reddit_user_agent,
+                requestor_kwargs={"session": session},
+                **_config,
+            )
+            _stats["clients_created"] += 1
+            print("Создан общий клиент Reddit.")
+    return _reddit
+
+
+async def close_reddit():
+    """Закрывает общий клиент Reddit и HTTP-сессию (при остановке приложения)."""
+    global _reddit, _session
+    if _reddit is not None:
+        try:
+            await _reddit.close()
+        except Exception as e:
+            print(f"Ошибка при закрытии клиента Reddit: {e}")
+        _reddit = None
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def pool_stats() -> dict:
+    """Статистика использования общего клиента и пула соединений."""
+    stats = dict(_stats)
+    stats["pool_limit"] = _pool_limit
+    stats["session_open"] = _session is not None and not _session.closed
+    stats["uptime"] = round(time.monotonic() - _started, 1)
+    return stats
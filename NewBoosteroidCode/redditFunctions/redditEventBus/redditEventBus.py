@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from common.metrics import metrics
+from redditFunctions.redditClient.redditClient import get_reddit
+
+SUBMISSION = "submission"
+COMMENT = "comment"
+POLL_INTERVAL = 5.0
+QUEUE_SIZE = 1000
+
+
+class RedditEvent:
+    """Новый пост или комментарий. backlog=True — элемент из первой выборки после (пере)подключения."""
+
+    __slots__ = ("kind", "item", "backlog", "received_at")
+
+    def __init__(self, kind: str, item, backlog: bool = False):
+        self.kind = kind
+        self.item = item
+        self.backlog = backlog
+        self.received_at = time.time()
+
+
+class Subscriber:
+    def __init__(self, name, handler, kinds, maxsize, include_backlog, catch_up):
+        self.name = name
+        self.handler = handler
+        self.kinds = set(kinds)
+        self.include_backlog = include_backlog
+        self.catch_up = catch_up
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.needs_catch_up = catch_up is not None
+        self.task = None
+        self.stats = {"received": 0, "processed": 0, "failed": 0, "dropped": 0}
+
+    def offer(self, event: RedditEvent):
+        if event.kind not in self.kinds or (event.backlog and not self.include_backlog):
+            return
+        self.stats["received"] += 1
+        if self.queue.full():
+            # Очередь переполнена: выбрасываем самое старое событие, а подписчик
+            # с догрузкой (catch_up) восстановит пропуск по своему водяному знаку
+            self.queue.get_nowait()
+            self.stats["dropped"] += 1
+            self.needs_catch_up = self.catch_up is not None
+        self.queue.put_nowait(event)
+
+    async def run(self):
+        while True:
+            if self.needs_catch_up:
+                self.needs_catch_up = False
+                try:
+                    await self.catch_up()
+                except Exception as e:
+                    print(f"Ошибка догрузки подписчика {self.name}: {e}")
+            event = await self.queue.get()
+            try:
+                await self.handler(event)
+                self.stats["processed"] += 1
+                metrics.count_event(self.name)
+            except Exception as e:
+                self.stats["failed"] += 1
+                metrics.count_event(self.name, ok=False)
+                print(f"Ошибка подписчика {self.name}: {e}")
+
+
+class RedditEventBus:
+    """
+    Единственный опрос сабреддита: посты и комментарии читаются одним циклом
+    и раздаются подписчикам, у каждого из которых своя ограниченная очередь.
+    """
+
+    def __init__(self, subreddit_name: str, poll_interval: float = POLL_INTERVAL, queue_size: int = QUEUE_SIZE):
+        self.subreddit_name = subreddit_name
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers = []
+        self.stats = {"polls": 0, "errors": 0, SUBMISSION: 0, COMMENT: 0}
+        self.last_event_at = {SUBMISSION: None, COMMENT: None}
+
+    def subscribe(self, name: str, handler, kinds=(SUBMISSION, COMMENT), maxsize: int = None,
+                  include_backlog: bool = False, catch_up=None) -> Subscriber:
+        """
+        handler(event) вызывается для каждого события нужного типа.
+        include_backlog — получать элементы, уже существовавшие при подключении.
+        catch_up() — догрузка пропущенного (при старте и после переполнения очереди).
+        """
+        subscriber = Subscriber(name, handler, kinds, maxsize or self.queue_size, include_backlog, catch_up)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def publish(self, event: RedditEvent):
+        self.stats[event.kind] += 1
+        self.last_event_at[event.kind] = event.received_at
+        metrics.mark_event(f"reddit_{event.kind}", event.received_at)
+        for subscriber in self.subscribers:
+            subscriber.offer(event)
+
+    def _open_streams(self, subreddit):
+        # pause_after=-1: поток отдаёт None после каждого ответа, что позволяет
+        # опрашивать оба листинга по очереди в одном цикле
+        return {
+            SUBMISSION: subreddit.stream.submissions(pause_after=-1),
+            COMMENT: subreddit.stream.comments(pause_after=-1),
+        }
+
+    async def run(self):
+        for subscriber in self.subscribers:
+            subscriber.task = asyncio.create_task(subscriber.run())
+        reddit = await get_reddit()
+        subreddit = await reddit.subreddit(self.subreddit_name)
+        streams = self._open_streams(subreddit)
+        backlog = {kind: True for kind in streams}
+        print(f"Шина событий Reddit подключена к r/{self.subreddit_name}, подписчиков: {len(self.subscribers)}")
+        try:
+            while True:
+                self.stats["polls"] += 1
+                for kind in list(streams):
+                    try:
+                        async for item in streams[kind]:
+                            if item is None:
+                                break
+                            self.publish(RedditEvent(kind, item, backlog[kind]))
+                        backlog[kind] = False
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"Ошибка потока {kind} в шине Reddit: {e}")
+                        # Генератор потока после ошибки не продолжить — открываем заново
+                        streams[kind] = self._open_streams(subreddit)[kind]
+                        backlog[kind] = True
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            for subscriber in self.subscribers:
+                if subscriber.task:
+                    subscriber.task.cancel()
+
+    def snapshot(self) -> dict:
+        return {
+            "stats": dict(self.stats),
+            "last_event_at": dict(self.last_event_at),
+            "subscribers": {
+                s.name: dict(s.stats, queue_depth=s.queue.qsize()) for s in self.subscribers
+            },
+        }
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_ITEM_CACHE_PATH = os.path.join(os.getcwd(), "data", "reddit_items.json")
+MAX_ITEMS = 5000
+
+
+def normalize_url(url: str) -> str:
+    return (url or "").strip().split("?", 1)[0].split("#", 1)[0].rstrip("/").lower()
+
+
+class RedditItemCache:
+    """
+    Посты и комментарии, о которых бот уведомил чат: ссылка -> {reddit_id, kind,
+    title, body, url}, плюс ID сообщения Telegram -> ссылки. Ограничен по размеру
+    (LRU) и сохраняется на диск, чтобы реакции 👍/👎 после перезапуска тоже
+    разрешались без запросов к Reddit. На диск пишет flush() — его вызывает
+    периодическая задача планировщика в отдельном потоке.
+    """
+
+    def __init__(self, path: str = DEFAULT_ITEM_CACHE_PATH, max_items: int = MAX_ITEMS):
+        self.path = path
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._messages = OrderedDict()
+        self._dirty = False
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._items = OrderedDict(data.get("items", []))
+                self._messages = OrderedDict(data.get("messages", []))
+            except (OSError, ValueError) as e:
+                print(f"Не удалось прочитать кеш Reddit {path}: {e}")
+
+    def remember(self, record: dict, message_id=None):
+        """Запоминает элемент по всем его ссылкам; message_id связывает его с уведомлением."""
+        urls = [normalize_url(url) for url in record.get("urls", [record.get("url")]) if url]
+        if not urls:
+            return
+        with self._lock:
+            for url in urls:
+                self._items[url] = record
+                self._items.move_to_end(url)
+            if message_id is not None:
+                linked = self._messages.setdefault(str(message_id), [])
+                linked.extend(url for url in urls if url not in linked)
+                self._messages.move_to_end(str(message_id))
+            self.stats["stored"] += 1
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.stats["evicted"] += 1
+            while len(self._messages) > self.max_items:
+                self._messages.popitem(last=False)
+            self._dirty = True
+
+    def lookup(self, url: str = None, message_id=None):
+        """Элемент по ссылке или, если в сообщении был ровно один элемент, по ID сообщения."""
+        with self._lock:
+            key = normalize_url(url) if url else None
+            record = self._items.get(key) if key else None
+            if record is None and message_id is not None:
+                linked = self._messages.get(str(message_id)) or []
+                if len(linked) == 1:
+                    key = linked[0]
+                    record = self._items.get(key)
+                    self._messages.move_to_end(str(message_id))
+            if record is None:
+                self.stats["misses"] += 1
+                return None
+            # Вытесняются давно не использованные записи, а не просто самые старые
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return record
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"items": list(self._items.items()), "messages": list(self._messages.items())}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кеш Reddit {self.path}: {e}")
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, items=len(self._items), messages=len(self._messages))
+
+
+_cache = None
+
+
+def init_reddit_item_cache(path: str = DEFAULT_ITEM_CACHE_PATH, max_items: int = MAX_ITEMS) -> RedditItemCache:
+    global _cache
+    _cache = RedditItemCache(path, max_items)
+    return _cache
+
+
+def get_reddit_item_cache() -> RedditItemCache:
+    global _cache
+    if _cache is None:
+        _cache = RedditItemCache()
+    return _cache
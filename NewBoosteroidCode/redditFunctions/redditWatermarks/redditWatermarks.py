@@ -0,0 +1,111 @@
+import time
+
+from common.checkpointStore.checkpointStore import get_checkpoint_store
+
+# Без сохранённого водяного знака (первый запуск) берём последний час, как раньше
+INITIAL_LOOKBACK = 3600
+# Элементы, которые не удалось записать в Notion, повторяются до этого числа попыток
+MAX_ITEM_ATTEMPTS = 5
+MAX_PENDING_ITEMS = 500
+
+
+def load_watermark(source: str) -> dict:
+    """Водяной знак источника: {"created_utc": ..., "fullnames": [...]} или None."""
+    return get_checkpoint_store().get(f"reddit:{source}")
+
+
+def advance_watermark(source: str, item):
+    """
+    Сдвигает водяной знак на обработанный элемент. Для элементов с одинаковым
+    created_utc запоминаем все их fullname, чтобы не обработать их повторно.
+    """
+    store = get_checkpoint_store()
+    key = f"reddit:{source}"
+    current = store.get(key) or {}
+    created = float(item.created_utc)
+    if created > current.get("created_utc", 0):
+        fullnames = [item.fullname]
+    elif created == current.get("created_utc"):
+        fullnames = current.get("fullnames", []) + [item.fullname]
+    else:
+        return
+    store.set(key, {"created_utc": created, "fullname": item.fullname, "fullnames": fullnames})
+
+
+def record_failure(source: str, item):
+    """
+    Запоминает элемент, который не удалось записать. Водяной знак всё равно
+    сдвигается (иначе одна ошибка останавливала бы поток), а элемент
+    повторяется через retry_failed_items.
+    """
+    store = get_checkpoint_store()
+    key = f"reddit:{source}:failed"
+    failed = store.get(key) or {}
+    attempts = failed.get(item.fullname, 0) + 1
+    if attempts > MAX_ITEM_ATTEMPTS:
+        print(f"Элемент {item.fullname} ({source}) не записан после {MAX_ITEM_ATTEMPTS} попыток, пропускаю")
+        failed.pop(item.fullname, None)
+    else:
+        failed[item.fullname] = attempts
+        # При долгом простое Notion храним только последние элементы
+        while len(failed) > MAX_PENDING_ITEMS:
+            failed.pop(next(iter(failed)))
+    store.set(key, failed)
+
+
+def clear_failure(source: str, item):
+    store = get_checkpoint_store()
+    key = f"reddit:{source}:failed"
+    failed = store.get(key) or {}
+    if failed.pop(item.fullname, None) is not None:
+        store.set(key, failed)
+
+
+async def retry_failed_items(reddit, source: str, process):
+    """Повторяет process(item) для элементов, запись которых раньше не удалась."""
+    store = get_checkpoint_store()
+    key = f"reddit:{source}:failed"
+    failed = store.get(key)
+    if not failed:
+        return
+    print(f"Повторяю запись {len(failed)} элементов ({source})")
+    seen = set()
+    async for item in reddit.info(fullnames=list(failed)):
+        seen.add(item.fullname)
+        await process(item)
+    # Удалённые на Reddit элементы info не возвращает — повторять их незачем
+    missing = set(failed) - seen
+    if missing:
+        current = store.get(key) or {}
+        for fullname in missing:
+            current.pop(fullname, None)
+        store.set(key, current)
+
+
+def is_new(item, watermark: dict, floor: float) -> bool:
+    created = float(item.created_utc)
+    if watermark is None:
+        return created >= floor
+    if created == watermark["created_utc"]:
+        return item.fullname not in watermark.get("fullnames", [])
+    return created > watermark["created_utc"]
+
+
+async def fetch_new_items(listing, source: str, lookback: float = INITIAL_LOOKBACK) -> list:
+    """
+    Собирает элементы листинга (от новых к старым, например subreddit.new(limit=None))
+    до водяного знака и возвращает их от старых к новым. Листинг идёт по страницам,
+    так что больше 100 элементов за интервал не теряются.
+    """
+    watermark = load_watermark(source)
+    floor = time.time() - lookback
+    items = []
+    async for item in listing:
+        if is_new(item, watermark, floor):
+            items.append(item)
+            continue
+        # Листинг отсортирован по времени: дальше только старые элементы
+        if watermark is None or float(item.created_utc) < watermark["created_utc"]:
+            break
+    items.reverse()
+    return items
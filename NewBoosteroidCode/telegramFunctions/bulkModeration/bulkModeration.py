@@ -0,0 +1,238 @@
+import asyncio
+import shlex
+import time
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from common.config.config import get_config
+from telegramFunctions.сhangeStatus.changeStatus import (
+    fetch_recent_posts, get_result_cache, post_title, STATUS_CODES, CODES_STATUS, FLAIRS
+)
+
+BULK_PAGE_SIZE = 8
+PROGRESS_EDIT_INTERVAL = 1.5
+# Фильтры вида status="In queue" flair=Help в тексте команды
+FILTER_PROPERTIES = {
+    "status": ("Status", "status"),
+    "flair": ("Post Flair", "select"),
+    "platform": ("Platform", "select"),
+}
+
+
+def parse_bulk_query(text: str) -> tuple:
+    """Разделяет текст /bulk на поисковый запрос и фильтры {свойство: значение}."""
+    try:
+        parts = shlex.split(text)
+    except ValueError:
+        parts = text.split()
+    words, filters = [], {}
+    for part in parts:
+        key, sep, value = part.partition("=")
+        if sep and key.casefold() in FILTER_PROPERTIES:
+            filters[key.casefold()] = value
+        else:
+            words.append(part)
+    return " ".join(words), filters
+
+
+def matches_filters(post: dict, filters: dict) -> bool:
+    props = post.get("properties", {})
+    for key, value in filters.items():
+        name, kind = FILTER_PROPERTIES[key]
+        actual = ((props.get(name) or {}).get(kind) or {}).get("name") or ""
+        if actual.casefold() != value.casefold():
+            return False
+    return True
+
+
+def build_bulk_keyboard(cursor, page: int) -> InlineKeyboardMarkup:
+    """Строки с отметками (bs|токен|индекс), листание (bp|...) и действия над выбранными."""
+    pages = max(1, -(-len(cursor.rows) // BULK_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * BULK_PAGE_SIZE
+    keyboard = [
+        [InlineKeyboardButton(f"{'✅' if index in cursor.selected else '▫️'} {title}",
+                              callback_data=f"bs|{cursor.token}|{index}|{page}")]
+        for index, (_, title) in enumerate(cursor.rows[start:start + BULK_PAGE_SIZE], start)
+    ]
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"bp|{cursor.token}|{page - 1}"))
+        nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"bp|{cursor.token}|-"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"bp|{cursor.token}|{page + 1}"))
+        keyboard.append(nav)
+    keyboard.append([
+        InlineKeyboardButton("Выбрать все", callback_data=f"ba|{cursor.token}|{page}"),
+        InlineKeyboardButton("Снять все", callback_data=f"bc|{cursor.token}|{page}"),
+    ])
+    keyboard.append([
+        InlineKeyboardButton("Статус", callback_data=f"bo|{cursor.token}|status"),
+        InlineKeyboardButton("Флажок", callback_data=f"bo|{cursor.token}|flair"),
+        InlineKeyboardButton("Email", callback_data=f"bo|{cursor.token}|email"),
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def bulk_text(cursor) -> str:
+    return f"Массовое изменение: найдено {len(cursor.rows)}, выбрано {len(cursor.selected)}."
+
+
+async def handle_bulk(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /bulk <запрос> [status=...] [flair=...] [platform=...] — выбор нескольких записей
+    за последние 7 дней и одно изменение статуса, флажка или email для всех выбранных.
+    """
+    query, filters = parse_bulk_query(" ".join(context.args))
+    cache = get_result_cache(context)
+    chat_id = update.effective_chat.id
+    cache_query = " ".join([query] + [f"{key}={value}" for key, value in sorted(filters.items())])
+    cursor = cache.get(chat_id, "blk", cache_query)
+    if cursor is None:
+        # Фильтры применяются ко всем кандидатам за 7 дней: с ограничением выдачи
+        # /bulk status="In queue" без запроса видел бы только первые записи.
+        # Нечёткие совпадения не берутся: «Выбрать все» не должно задеть похожие записи
+        posts = await fetch_recent_posts(query, context.bot_data["notion"], context.bot_data["NOTION_TECHNICAL_ISSUES_DB"],
+                                         context.bot_data.get("mirror"), context.bot_data.get("search_index"),
+                                         limit=None, fuzzy=False)
+        rows = [(post["id"], post_title(post)) for post in posts if matches_filters(post, filters)]
+        cursor = cache.put(chat_id, "blk", cache_query, rows)
+    cursor.selected.clear()
+    if not cursor.rows:
+        await update.message.reply_text("Записи не найдены.")
+        return
+    await update.message.reply_text(bulk_text(cursor), reply_markup=build_bulk_keyboard(cursor, 0))
+
+
+async def apply_bulk_update(notion, page_ids: list, properties: dict, on_progress=None) -> tuple:
+    """
+    Параллельно обновляет страницы (не больше BULK_CONCURRENCY одновременно,
+    темп задаёт общий лимитер Notion). Возвращает (успешно, [(page_id, ошибка)]).
+    """
+    # Сколько обновлений одновременно; общий темп всё равно задаёт лимитер Notion
+    semaphore = asyncio.Semaphore(max(1, get_config().bulk_concurrency))
+    done, failed = 0, []
+
+    async def update_one(page_id):
+        nonlocal done
+        async with semaphore:
+            try:
+                await notion.pages.update(page_id=page_id, properties=properties)
+                done += 1
+            except Exception as e:
+                failed.append((page_id, e))
+        if on_progress is not None:
+            await on_progress(done, len(failed), len(page_ids))
+
+    await asyncio.gather(*(update_one(page_id) for page_id in page_ids))
+    return done, failed
+
+
+async def run_bulk_update(query, context: ContextTypes.DEFAULT_TYPE, cursor, properties: dict, label: str):
+    """Запускает массовое обновление с одним сообщением о ходе, которое правится на месте."""
+    page_ids = [cursor.rows[index][0] for index in sorted(cursor.selected)]
+    if not page_ids:
+        await query.edit_message_text("Не выбрано ни одной записи.")
+        return
+    await query.edit_message_text(f"{label}: 0/{len(page_ids)}…")
+    last_edit = time.monotonic()
+
+    async def on_progress(done, failed, total):
+        nonlocal last_edit
+        if time.monotonic() - last_edit < PROGRESS_EDIT_INTERVAL or done + failed == total:
+            return
+        last_edit = time.monotonic()
+        try:
+            await query.edit_message_text(f"{label}: {done + failed}/{total}, ошибок {failed}…")
+        except Exception as e:
+            print(f"Не удалось обновить сообщение о ходе массового изменения: {e}")
+
+    done, failed = await apply_bulk_update(context.bot_data["notion"], page_ids, properties, on_progress)
+    summary = f"{label}: обновлено {done} из {len(page_ids)}."
+    if failed:
+        titles = dict(cursor.rows)
+        summary += f"\nОшибки ({len(failed)}):\n" + "\n".join(
+            f"• {titles.get(page_id, page_id)}: {error}" for page_id, error in failed[:10])
+    cursor.selected.clear()
+    await query.edit_message_text(summary)
+
+
+async def bulk_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    parts = query.data.split("|")
+    kind = parts[0]
+    cursor = get_result_cache(context).by_token(parts[1]) if len(parts) >= 3 else None
+    if cursor is not None and kind == "bo" and not cursor.selected:
+        await query.answer("Сначала выберите записи.")
+        return
+    await query.answer()
+    if cursor is None:
+        await query.edit_message_text("Результаты поиска устарели, повторите команду.")
+        return
+
+    if kind == "bp":
+        if parts[2].isdigit():
+            await query.edit_message_reply_markup(reply_markup=build_bulk_keyboard(cursor, int(parts[2])))
+    elif kind in ("bs", "ba", "bc"):
+        if kind == "bs":
+            cursor.selected ^= {int(parts[2])}
+            page = int(parts[3])
+        else:
+            cursor.selected = set(range(len(cursor.rows))) if kind == "ba" else set()
+            page = int(parts[2])
+        try:
+            await query.edit_message_text(bulk_text(cursor), reply_markup=build_bulk_keyboard(cursor, page))
+        except Exception as e:
+            # «Выбрать все» при уже выбранных: Telegram отвечает, что сообщение не изменилось
+            if "not modified" not in str(e):
+                raise
+    elif kind == "bo":
+        if parts[2] == "status":
+            keyboard = [[InlineKeyboardButton(status, callback_data=f"bss|{cursor.token}|{code}")]
+                        for status, code in STATUS_CODES.items()]
+            await query.edit_message_text(f"Новый статус для {len(cursor.selected)} записей:",
+                                          reply_markup=InlineKeyboardMarkup(keyboard))
+        elif parts[2] == "flair":
+            keyboard = [[InlineKeyboardButton(flair, callback_data=f"bsf|{cursor.token}|{flair}")] for flair in FLAIRS]
+            await query.edit_message_text(f"Новый флажок для {len(cursor.selected)} записей:",
+                                          reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            context.user_data["pending_bulk_email"] = cursor.token
+            await query.edit_message_text(f"Введите новый email для {len(cursor.selected)} записей:")
+    elif kind == "bss":
+        status = CODES_STATUS.get(parts[2])
+        if not status:
+            await query.edit_message_text("Неизвестный статус.")
+            return
+        await run_bulk_update(query, context, cursor, {"Status": {"status": {"name": status}}},
+                              f"Статус → {status}")
+    elif kind == "bsf":
+        await run_bulk_update(query, context, cursor, {"Post Flair": {"select": {"name": parts[2]}}},
+                              f"Флажок → {parts[2]}")
+
+
+class _MessageProgress:
+    """Обёртка над отправленным сообщением с тем же интерфейсом, что у callback_query."""
+
+    def __init__(self, update):
+        self.update = update
+        self.message = None
+
+    async def edit_message_text(self, text, reply_markup=None):
+        if self.message is None:
+            self.message = await self.update.message.reply_text(text, reply_markup=reply_markup)
+        else:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+
+
+async def handle_bulk_email_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    token = context.user_data.pop("pending_bulk_email", None)
+    cursor = get_result_cache(context).by_token(token) if token else None
+    if cursor is None:
+        await update.message.reply_text("Результаты поиска устарели, повторите команду.")
+        return
+    new_email = update.message.text.strip()
+    await run_bulk_update(_MessageProgress(update), context, cursor, {"Email": {"email": new_email}},
+                          f"Email → {new_email}")
@@ -0,0 +1,58 @@
+import time
+from datetime import datetime
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+
+def _when(ts, now: float) -> str:
+    if ts is None:
+        return "—"
+    moment = datetime.fromtimestamp(ts).strftime("%d.%m %H:%M:%S")
+    delta = ts - now
+    if abs(delta) >= 86400:
+        return moment
+    if delta >= 0:
+        return f"{moment} (через {_duration(delta)})"
+    return f"{moment} ({_duration(-delta)} назад)"
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f} с"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} мин"
+    return f"{seconds / 3600:.1f} ч"
+
+
+def format_jobs(status: list, now: float = None) -> str:
+    """Список задач планировщика для /jobs: расписание, следующий и последний запуск, ошибки."""
+    now = now or time.time()
+    if not status:
+        return "Задачи планировщика не зарегистрированы."
+    lines = ["🗓 Задачи планировщика:"]
+    for job in status:
+        state = "▶️ выполняется" if job["running"] else "⏳"
+        lines.append(f"\n{state} {job['name']} — {job['schedule']}")
+        next_label = "повтор" if job["retry"] else "следующий"
+        lines.append(f"  {next_label}: {_when(job['next_run'], now)}")
+        if job["last_started"] is not None:
+            result = f"ошибка: {job['last_error']}" if job["last_error"] else "ок"
+            duration = f", {job['last_duration']:.1f} с" if job["last_duration"] is not None else ""
+            lines.append(f"  последний: {_when(job['last_started'], now)}{duration}, {result}")
+        counters = f"  запусков {job['runs']}, ошибок {job['failures']}"
+        if job["skipped_overlap"]:
+            counters += f", пропущено из-за наложения {job['skipped_overlap']}"
+        if job["caught_up"]:
+            counters += f", догнано после простоя {job['caught_up']}"
+        lines.append(counters)
+    return "\n".join(lines)
+
+
+async def handle_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /jobs: состояние периодических задач."""
+    scheduler = context.bot_data.get("scheduler")
+    if scheduler is None:
+        await update.message.reply_text("Планировщик не запущен.")
+        return
+    await update.message.reply_text(format_jobs(scheduler.status()))
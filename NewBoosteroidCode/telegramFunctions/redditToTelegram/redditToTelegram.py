@@ -1,109 +1,127 @@
-import aiohttp
-import asyncpraw
-import asyncio
-import ssl
-import certifi
-import os
+import logging
 from telegram import Bot, Update
 from telegram.ext import MessageHandler, filters
 import re
-from dotenv import load_dotenv
 from datetime import datetime
 import nest_asyncio
+from redditFunctions.redditClient.redditClient import get_reddit
+from redditFunctions.redditEventBus.redditEventBus import SUBMISSION, COMMENT
+from notion.notionWriter.notionWriter import get_notion_writer
+from notion.notionRateLimiter.notionRateLimiter import INTERACTIVE
+from telegramFunctions.telegramSender.telegramSender import get_telegram_sender
+from redditFunctions.redditItemCache.redditItemCache import get_reddit_item_cache
+from common.config.config import get_config
 
-load_dotenv(dotenv_path="../../.env")
+# Сообщения потока Reddit ограничены по частоте (см. LOG_RATE_LIMITS)
+stream_log = logging.getLogger("reddit.stream")
 
-async def send_notification(bot: Bot, message: str):
-    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+async def send_notification(bot: Bot, message: str, record: dict = None):
+    """
+    Отправляет уведомление. record — данные элемента Reddit (title, body, url);
+    они запоминаются в кеше, чтобы реакции на уведомление не ходили в Reddit.
+    """
+    TELEGRAM_CHAT_ID = get_config().telegram_chat_id
+    cache = get_reddit_item_cache() if record else None
+    if cache is not None:
+        cache.remember(record)
+    sender = get_telegram_sender()
+    if sender is not None:
+        # Очередь с лимитами чата; при всплеске сообщения склеиваются в дайджест
+        on_sent = (lambda sent: cache.remember(record, sent.message_id)) if cache is not None else None
+        sender.enqueue(TELEGRAM_CHAT_ID, message, on_sent=on_sent)
+        return
     try:
-        await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+        sent = await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+        if cache is not None:
+            cache.remember(record, sent.message_id)
     except Exception as e:
         print(f"Ошибка при отправке уведомления в Telegram: {e}")
 
-async def track_posts(subreddit, bot: Bot, IGNORED_USERS):
-    async for post in subreddit.stream.submissions(skip_existing=True):
-        author = post.author
-        if author and author.name in IGNORED_USERS:
-            print(f"Пост от {author.name} игнорируется.")
-            continue
-        print("Новый пост:", post.title)
-        await send_notification(
-            bot=bot,
-            message=f"📌 Новый пост: {post.title}\n🔗 Ссылка: {post.url}"
-        )
+def post_record(post) -> dict:
+    permalink = f"https://www.reddit.com{post.permalink}"
+    return {"reddit_id": post.id, "kind": "post", "title": post.title,
+            "body": post.selftext or "[Без текста]", "url": permalink, "urls": [permalink, post.url]}
 
-async def track_comments(subreddit, bot: Bot, IGNORED_USERS):
-    async for comment in subreddit.stream.comments(skip_existing=True):
-        author = comment.author
-        if author and author.name in IGNORED_USERS:
-            print(f"Комментарий от {author.name} игнорируется.")
-            continue
-        print("Новый комментарий:", comment.body)
-        await send_notification(
-            bot=bot,
-            message=f"💬 Новый комментарий:\n\n{comment.body}\n🔗 Ссылка: https://www.reddit.com{comment.permalink}",
-        )
+def comment_record(comment) -> dict:
+    permalink = f"https://www.reddit.com{comment.permalink}"
+    return {"reddit_id": comment.id, "kind": "comment", "title": f"Комментарий: {comment.body}",
+            "body": comment.body, "url": permalink, "urls": [permalink]}
 
-async def start_tracking(bot: Bot, subreddit_name, IGNORED_USERS):
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        reddit = asyncpraw.Reddit(
-            client_id=os.getenv("CLIENT_ID"),
-            client_secret=os.getenv("CLIENT_SECRET"),
-            user_agent=os.getenv("USER_AGENT"),
-            requestor_kwargs={"session": session},
-        )
-        subreddit = await reddit.subreddit(subreddit_name)
-        print(f"Успешно подключено к сабреддиту: {subreddit_name}")
-        post_task = asyncio.create_task(track_posts(subreddit, bot, IGNORED_USERS))
-        comment_task = asyncio.create_task(track_comments(subreddit, bot, IGNORED_USERS))
-        await asyncio.gather(post_task, comment_task)
+async def track_posts(event, bot: Bot, IGNORED_USERS):
+    post = event.item
+    author = post.author
+    if author and author.name in IGNORED_USERS:
+        stream_log.info("Пост от %s игнорируется", author.name)
+        return
+    stream_log.info("Новый пост: %s", post.title, extra={"reddit_id": post.id})
+    await send_notification(
+        bot=bot,
+        message=f"📌 Новый пост: {post.title}\n🔗 Ссылка: {post.url}",
+        record=post_record(post)
+    )
 
-async def get_reddit_data(reddit_url):
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        reddit = asyncpraw.Reddit(
-            client_id=os.getenv("CLIENT_ID"),
-            client_secret=os.getenv("CLIENT_SECRET"),
-            user_agent=os.getenv("USER_AGENT"),
-            requestor_kwargs={"session": session},
-        )
-        try:
-            url_parts = reddit_url.rstrip("/").split("/")
-            if "comments" in url_parts and len(url_parts) > 7:
-                submission_id = url_parts[url_parts.index("comments") + 1]
-                comment_id = url_parts[-1]
-                if comment_id.isalnum():
-                    print(f"Extracted submission ID: {submission_id}")
-                    print(f"Extracted comment ID: {comment_id}")
-                    comment = await reddit.comment(comment_id)
-                    await comment.load()
-                    print(f"Комментарий: {comment.body}")
-                    return f"Комментарий: {comment.body}", comment.body, reddit_url
-            if "comments" in url_parts and len(url_parts) > 6:
-                submission_id = url_parts[url_parts.index("comments") + 1]
+async def track_comments(event, bot: Bot, IGNORED_USERS):
+    comment = event.item
+    author = comment.author
+    if author and author.name in IGNORED_USERS:
+        stream_log.info("Комментарий от %s игнорируется", author.name)
+        return
+    # Полный текст есть в уведомлении, в лог идёт только начало
+    stream_log.info("Новый комментарий: %.200s", comment.body, extra={"reddit_id": comment.id})
+    await send_notification(
+        bot=bot,
+        message=f"💬 Новый комментарий:\n\n{comment.body}\n🔗 Ссылка: https://www.reddit.com{comment.permalink}",
+        record=comment_record(comment)
+    )
+
+def start_tracking(bus, bot: Bot, IGNORED_USERS):
+    """Подписывает уведомления Telegram о новых постах и комментариях на общую шину Reddit."""
+    bus.subscribe("track_posts", lambda event: track_posts(event, bot, IGNORED_USERS), kinds=(SUBMISSION,))
+    bus.subscribe("track_comments", lambda event: track_comments(event, bot, IGNORED_USERS), kinds=(COMMENT,))
+
+async def get_reddit_data(reddit_url, message_id=None):
+    """
+    (заголовок, текст, ссылка) элемента Reddit. Сначала ищет в кеше отправленных
+    уведомлений, к API Reddit обращается только при промахе.
+    """
+    cache = get_reddit_item_cache()
+    record = cache.lookup(reddit_url, message_id)
+    if record is not None:
+        return record["title"], record["body"], reddit_url
+    reddit = await get_reddit()
+    try:
+        url_parts = reddit_url.rstrip("/").split("/")
+        if "comments" in url_parts and len(url_parts) > 7:
+            submission_id = url_parts[url_parts.index("comments") + 1]
+            comment_id = url_parts[-1]
+            if comment_id.isalnum():
                 print(f"Extracted submission ID: {submission_id}")
-                submission = await reddit.submission(submission_id)
-                await submission.load()
-                print(f"Пост: {submission.title} | {submission.selftext}")
-                return submission.title, submission.selftext or "[Без текста]", reddit_url
-            print("Invalid Reddit URL format")
-            return None, None, None
-        except Exception as e:
-            print(f"Ошибка при получении данных с Reddit: {e}")
-            return None, None, None
+                print(f"Extracted comment ID: {comment_id}")
+                comment = await reddit.comment(comment_id)
+                await comment.load()
+                print(f"Комментарий: {comment.body}")
+                cache.remember(dict(comment_record(comment), urls=[reddit_url]))
+                return f"Комментарий: {comment.body}", comment.body, reddit_url
+        if "comments" in url_parts and len(url_parts) > 6:
+            submission_id = url_parts[url_parts.index("comments") + 1]
+            print(f"Extracted submission ID: {submission_id}")
+            submission = await reddit.submission(submission_id)
+            await submission.load()
+            print(f"Пост: {submission.title} | {submission.selftext}")
+            cache.remember(dict(post_record(submission), urls=[reddit_url]))
+            return submission.title, submission.selftext or "[Без текста]", reddit_url
+        print("Invalid Reddit URL format")
+        return None, None, None
+    except Exception as e:
+        print(f"Ошибка при получении данных с Reddit: {e}")
+        return None, None, None
 
 async def add_reaction_to_notion(post_title, post_content, post_url, reaction_type):
     current_date = datetime.utcnow().isoformat()
     if len(post_content) > 2000:
         post_content = post_content[:1997] + "..."
-    headers = {
-        "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
     data = {
-        "parent": {"database_id": os.getenv("NOTION_ANALYTICS_DB")},
+        "parent": {"database_id": get_config().notion_analytics_db},
         "properties": {
             "Title": {"title": [{"text": {"content": post_title}}]},
             "Content": {"rich_text": [{"text": {"content": post_content}}]},
@@ -112,13 +130,12 @@ async def add_reaction_to_notion(post_title, post_content, post_url, reaction_ty
             "Date": {"date": {"start": current_date}},
         }
     }
-    ssl_context = ssl.create_default_context(cafile=certifi.where())
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        async with session.post('https://api.notion.com/v1/pages', headers=headers, json=data) as response:
-            if response.status == 200:
-                print(f"Reaction '{reaction_type}' added successfully!")
-            else:
-                print(f"Failed to add reaction to Notion: {response.status} - {await response.text()}")
+    # Через общий лимитер Notion, с приоритетом интерактивных действий
+    try:
+        await get_notion_writer().create_page(priority=INTERACTIVE, **data)
+        print(f"Reaction '{reaction_type}' added successfully!")
+    except Exception as e:
+        print(f"Failed to add reaction to Notion: {e}")
 
 async def handle_message(update: Update, context):
     message = update.message.text
@@ -127,11 +144,13 @@ async def handle_message(update: Update, context):
     reddit_url = None
     if update.message.reply_to_message:
         reply_message = update.message.reply_to_message.text
-        match = re.search(r'https?://www\.reddit\.com/r/BoosteroidCommunity/comments/\S+', reply_message)
+        match = re.search(rf'https?://www\.reddit\.com/r/{re.escape(get_config().subreddit_name)}/comments/\S+',
+                          reply_message)
         if match:
             reddit_url = match.group(0)
             print(f"Found Reddit URL: {reddit_url}")
-            post_title, post_content, post_url = await get_reddit_data(reddit_url)
+            post_title, post_content, post_url = await get_reddit_data(
+                reddit_url, update.message.reply_to_message.message_id)
             if post_title:
                 if "👍" in message:
                     reaction_type = "👍"
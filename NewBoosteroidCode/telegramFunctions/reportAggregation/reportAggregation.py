@@ -0,0 +1,117 @@
+from array import array
+from collections import Counter
+from itertools import compress
+
+
+def select_name(prop) -> str:
+    return ((prop or {}).get("select") or {}).get("name") or ""
+
+
+def status_name(prop) -> str:
+    return ((prop or {}).get("status") or {}).get("name") or ""
+
+
+def plain_text(prop) -> str:
+    """Текст свойства rich_text/title (или имя select) одной строкой."""
+    prop = prop or {}
+    if prop.get("select"):
+        return select_name(prop)
+    parts = prop.get("rich_text") or prop.get("title") or []
+    return "".join(item.get("plain_text") or item.get("text", {}).get("content", "") for item in parts).strip()
+
+
+def date_day(prop) -> str:
+    start = ((prop or {}).get("date") or {}).get("start") or ""
+    return start[:10]
+
+
+# Измерения для технических проблем: имя -> извлечение значения из свойств страницы
+ISSUE_DIMENSIONS = {
+    "status": lambda props: status_name(props.get("Status")),
+    "flair": lambda props: select_name(props.get("Post Flair")),
+    "platform": lambda props: plain_text(props.get("Platform")),
+    "moderator": lambda props: plain_text(props.get("Responsible moderator")),
+    "day": lambda props: date_day(props.get("Date")),
+    "has_response": lambda props: bool(plain_text(props.get("Response from moderator"))),
+}
+
+REACTION_DIMENSIONS = {
+    "reaction": lambda props: select_name(props.get("Reaction")),
+    "day": lambda props: date_day(props.get("Date")),
+}
+
+YOUTUBE_DIMENSIONS = {
+    "author": lambda props: select_name(props.get("Author ( Community Manager )")),
+    "profile": lambda props: select_name(props.get("Profile")),
+    "day": lambda props: date_day(props.get("Date")),
+}
+
+
+class ColumnarTable:
+    """
+    Записи отчёта в виде колонок: каждое измерение хранится словарным кодированием
+    (array целых кодов + список значений). Группировки по любому набору измерений
+    считаются одним проходом Counter по zip колонок, без разбора словарей Notion.
+    """
+
+    def __init__(self, dimensions: dict):
+        self.dimensions = dimensions
+        self.columns = {name: array("I") for name in dimensions}
+        self.values = {name: [] for name in dimensions}
+        self._codes = {name: {} for name in dimensions}
+        self.rows = 0
+
+    @classmethod
+    def from_pages(cls, pages, dimensions: dict) -> "ColumnarTable":
+        table = cls(dimensions)
+        for page in pages:
+            table.add(page)
+        return table
+
+    def add(self, page: dict):
+        props = page.get("properties", {})
+        for name, extract in self.dimensions.items():
+            value = extract(props)
+            codes = self._codes[name]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values[name])
+                self.values[name].append(value)
+            self.columns[name].append(code)
+        self.rows += 1
+
+    def _mask(self, where: dict):
+        if not where:
+            return None
+        codes = []
+        for name, value in where.items():
+            code = self._codes[name].get(value)
+            if code is None:
+                return []
+            codes.append(code)
+        wanted = tuple(codes)
+        return map(wanted.__eq__, zip(*(self.columns[name] for name in where)))
+
+    def group_counts(self, *dims: str, where: dict = None) -> Counter:
+        """Counter {(значение измерения, ...): число строк}; where — фильтр {измерение: значение}."""
+        mask = self._mask(where)
+        if mask == []:
+            return Counter()
+        keys = zip(*(self.columns[name] for name in dims))
+        if mask is not None:
+            keys = compress(keys, mask)
+        coded = Counter(keys)
+        vocab = [self.values[name] for name in dims]
+        return Counter({
+            tuple(values[code] for values, code in zip(vocab, key)): count for key, count in coded.items()
+        })
+
+    def counts(self, dim: str, where: dict = None) -> Counter:
+        """Группировка по одному измерению: Counter {значение: число строк}."""
+        return Counter({key[0]: count for key, count in self.group_counts(dim, where=where).items()})
+
+    def count(self, where: dict = None) -> int:
+        if not where:
+            return self.rows
+        mask = self._mask(where)
+        return sum(mask) if mask else 0
@@ -0,0 +1,93 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+
+from common.config.config import REPORT_FORMATS
+
+# До этого размера отчёт держится в памяти, больше — уходит в анонимный временный
+# файл, который ОС удаляет сама при закрытии
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class DetailedReportWriter:
+    """
+    Потоковая запись подробного отчёта: записи кодируются по одной по мере
+    чтения и сразу пишутся в буфер (при compress=True — через gzip).
+    Результат передаётся в bot.send_document без файлов на диске.
+    """
+
+    def __init__(self, fmt: str = "txt", compress: bool = False, spool_max_size: int = SPOOL_MAX_SIZE):
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат отчёта: {fmt}")
+        self.fmt = fmt
+        self.compress = compress
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=spool_max_size, mode="w+b")
+        self._raw = gzip.GzipFile(fileobj=self.buffer, mode="wb") if compress else self.buffer
+        self._text = io.TextIOWrapper(self._raw, encoding="utf-8", newline="", write_through=True)
+        self._csv = csv.writer(self._text) if fmt == "csv" else None
+        self._section = None
+        self._section_rows = 0
+        self._sections = 0
+        self._csv_header = None
+        self.rows = 0
+
+    def begin(self, start_iso: str, end_iso: str):
+        if self.fmt == "txt":
+            self._text.write("ПОДРОБНЫЙ ОТЧЁТ\n")
+            self._text.write(f"Период: {start_iso} - {end_iso}\n\n")
+
+    def start_section(self, title: str):
+        self._section = title
+        self._section_rows = 0
+        self._csv_header = None
+        if self.fmt == "txt":
+            if self._sections:
+                self._text.write("\n")
+            self._text.write(f"=== {title} ===\n")
+        self._sections += 1
+
+    def write_record(self, record: dict):
+        self._section_rows += 1
+        self.rows += 1
+        if self.fmt == "txt":
+            for key, value in record.items():
+                self._text.write(f"{key}: {value}\n")
+            self._text.write("-" * 40 + "\n")
+        elif self.fmt == "csv":
+            # У разделов разные колонки: перед первой строкой раздела пишем его заголовок
+            if self._csv_header is None:
+                self._csv_header = list(record)
+                self._csv.writerow(["Section"] + self._csv_header)
+            self._csv.writerow([self._section] + [record.get(key, "") for key in self._csv_header])
+        else:
+            self._text.write(json.dumps({"section": self._section, **record}, ensure_ascii=False) + "\n")
+
+    def end_section(self, unavailable: bool = False):
+        """unavailable — источник раздела не ответил: данные отсутствуют или неполные."""
+        if self.fmt == "txt":
+            if unavailable:
+                self._text.write("Данные недоступны (источник не ответил вовремя).\n")
+            elif not self._section_rows:
+                self._text.write("Нет данных.\n")
+        elif unavailable and self.fmt == "csv":
+            self._csv.writerow([self._section, "unavailable"])
+        elif unavailable:
+            self._text.write(json.dumps({"section": self._section, "unavailable": True}) + "\n")
+
+    def filename(self, stamp: str) -> str:
+        name = f"detailed_report_{stamp}.{self.fmt}"
+        return name + ".gz" if self.compress else name
+
+    def finish(self):
+        """Завершает запись и возвращает буфер, перемотанный в начало."""
+        self._text.flush()
+        self._text.detach()
+        if self.compress:
+            self._raw.close()
+        self.buffer.seek(0)
+        return self.buffer
+
+    def close(self):
+        self.buffer.close()
@@ -0,0 +1,96 @@
+import itertools
+import time
+from collections import OrderedDict
+
+RESULT_TTL = 600
+MAX_ENTRIES = 200
+
+
+class ResultCursor:
+    """Сохранённый результат поиска: компактные строки (page_id, заголовок) и короткий токен."""
+
+    __slots__ = ("token", "key", "rows", "created_at", "selected")
+
+    def __init__(self, token, key, rows):
+        self.token = token
+        self.key = key
+        self.rows = rows
+        self.created_at = time.monotonic()
+        # Индексы строк, отмеченных в массовом режиме
+        self.selected = set()
+
+
+class ResultCursorCache:
+    """
+    Результаты команд модераторов по ключу (чат, действие, запрос) с TTL и
+    вытеснением давно не использованных (LRU). Кнопки листания ссылаются на
+    запись коротким токеном, так что листание не обращается к Notion.
+    """
+
+    def __init__(self, ttl: float = RESULT_TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tokens = {}
+        self._counter = itertools.count(1)
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def make_key(chat_id, action: str, query: str) -> tuple:
+        return chat_id, action, " ".join(query.casefold().split())
+
+    def _expired(self, cursor: ResultCursor) -> bool:
+        return time.monotonic() - cursor.created_at > self.ttl
+
+    def _drop(self, key):
+        cursor = self._entries.pop(key, None)
+        if cursor is not None:
+            self._tokens.pop(cursor.token, None)
+
+    def get(self, chat_id, action: str, query: str):
+        key = self.make_key(chat_id, action, query)
+        cursor = self._entries.get(key)
+        if cursor is None:
+            self.stats["misses"] += 1
+            return None
+        if self._expired(cursor):
+            self._drop(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return cursor
+
+    def put(self, chat_id, action: str, query: str, rows: list) -> ResultCursor:
+        key = self.make_key(chat_id, action, query)
+        self._drop(key)
+        # Токен в base36: callback_data Telegram ограничен 64 байтами
+        token = _base36(next(self._counter))
+        cursor = ResultCursor(token, key, rows)
+        self._entries[key] = cursor
+        self._tokens[token] = key
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._tokens.pop(evicted.token, None)
+            self.stats["evicted"] += 1
+        return cursor
+
+    def by_token(self, token: str):
+        key = self._tokens.get(token)
+        if key is None:
+            return None
+        return self.get(*key)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, entries=len(self._entries))
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        number, rem = divmod(number, 36)
+        result = digits[rem] + result
+        if not number:
+            return result
@@ -1,8 +1,19 @@
 import asyncio
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 from notion_client import AsyncClient
 from telegram import Bot, InputFile
-import os
+from notion.notionQuery.notionQuery import query_date_range, iter_date_range, QueryStats
+from notion.notionRateLimiter.notionRateLimiter import rate_limited, REPORT
+from common.config.config import get_config
+from common.metrics import metrics
+from common.scheduler.scheduler import Scheduler, CATCH_UP_SKIP, CATCH_UP_ONCE
+from telegramFunctions.reportExport.reportExport import DetailedReportWriter
+from telegramFunctions.telegramRequest.telegramRequest import MeteredRequest
+from telegramFunctions.reportAggregation.reportAggregation import (
+    ColumnarTable, ISSUE_DIMENSIONS, REACTION_DIMENSIONS, YOUTUBE_DIMENSIONS
+)
 
 # Глобальные переменные, которые будут инициализированы из main.py
 NOTION_TOKEN = None
@@ -12,19 +23,24 @@ TELEGRAM_BOT_TOKEN = None
 TELEGRAM_CHAT_ID = None
 notion = None
 bot = None
+mirror = None
 
-def init_report_vars(notion_token, notion_technical_issues_db, notion_analytics_db, telegram_bot_token, telegram_chat_id):
+def init_report_vars(notion_token, notion_technical_issues_db, notion_analytics_db, telegram_bot_token, telegram_chat_id,
+                     notion_mirror=None, notion_client=None, telegram_bot=None):
     """
     Инициализирует переменные модуля. Вызывается из main.py с передачей значений (в верхнем регистре).
+    Если передано локальное зеркало Notion, отчёты читают данные из него.
+    notion_client/telegram_bot заменяют создаваемые по токенам клиенты (бенчмарки, стенды).
     """
-    global NOTION_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_ANALYTICS_DB, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, notion, bot
+    global NOTION_TOKEN, NOTION_TECHNICAL_ISSUES_DB, NOTION_ANALYTICS_DB, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, notion, bot, mirror
     NOTION_TOKEN = notion_token
     NOTION_TECHNICAL_ISSUES_DB = notion_technical_issues_db
     NOTION_ANALYTICS_DB = notion_analytics_db
     TELEGRAM_BOT_TOKEN = telegram_bot_token
     TELEGRAM_CHAT_ID = telegram_chat_id
-    notion = AsyncClient(auth=NOTION_TOKEN)
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+    notion = rate_limited(notion_client or AsyncClient(auth=NOTION_TOKEN), REPORT)
+    bot = telegram_bot or Bot(token=TELEGRAM_BOT_TOKEN, request=MeteredRequest())
+    mirror = notion_mirror
 
 # --- Функции получения данных из Notion ---
 
@@ -43,237 +59,336 @@ def extract_rich_text(prop):
         return prop["rich_text"][0].get("text", {}).get("content", "")
     return ""
 
-async def get_technical_issues_report(start_iso: str, end_iso: str):
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
-    }
-    response = await notion.databases.query(
-        database_id=NOTION_TECHNICAL_ISSUES_DB, filter=filter_body
-    )
-    results = response.get("results", [])
-    count_help = 0
-    moderator_response_count = 0
-    status_counts = {
-        "In queue": 0,
-        "Asked for the email": 0,
-        "Made recommendations": 0,
-        "Made a ticket": 0,
-        "Solved": 0,
-    }
-    for page in results:
-        props = page.get("properties", {})
-        post_flair = props.get("Post Flair", {}).get("select", {})
-        if post_flair.get("name") == "Help":
-            count_help += 1
-            response_rt = props.get("Response from moderator", {}).get("rich_text", [])
-            if response_rt and any(item.get("plain_text", "").strip() for item in response_rt):
-                moderator_response_count += 1
-            status = props.get("Status", {}).get("status", {})
-            st_name = status.get("name")
-            if st_name in status_counts:
-                status_counts[st_name] += 1
-    total = len(results)
-    other_count = total - count_help
+async def fetch_pages(database_id: str, start_iso: str, end_iso: str, force_refresh: bool = False,
+                      timeout: float = None) -> list:
+    """
+    Все записи базы за период. По умолчанию берутся из локального зеркала
+    (после инкрементальной догрузки), force_refresh и ещё не загруженное
+    зеркало — из Notion напрямую. timeout ограничивает только сетевую часть:
+    ожидание догрузки или запрос к Notion.
+    """
+    if mirror is not None and database_id in mirror and not force_refresh:
+        if await mirror.refresh(database_id, timeout):
+            return await mirror.query(database_id, start_iso, end_iso)
+    stats = QueryStats()
+    results = await asyncio.wait_for(query_date_range(notion, database_id, start_iso, end_iso, stats=stats), timeout)
+    print(f"Notion {database_id}: {stats}")
+    return results
+
+def youtube_db_id():
+    return get_config().notion_youtube_db
+
+def reddit_comments_db_id():
+    return get_config().notion_reddit_comments_db or NOTION_TECHNICAL_ISSUES_DB.replace("TechnicalIssues", "RedditComments")
+
+# --- Подсчёты по уже загруженным записям ---
+
+TRACKED_STATUSES = ["In queue", "Asked for the email", "Made recommendations", "Made a ticket", "Solved"]
+YOUTUBE_AUTHORS = ["Ivan", "Arthur", "Denys", "Roman"]
+UNAVAILABLE_TEXT = "данные недоступны (источник не ответил вовремя)"
+BREAKDOWN_TITLES = {"status": "статусам", "flair": "флажкам", "platform": "платформам",
+                    "moderator": "модераторам", "day": "дням"}
+
+def report_breakdowns(snapshot) -> dict:
+    """Разбивки из REPORT_BREAKDOWNS (через запятую, например "platform,moderator")."""
+    return {dim: snapshot.counts(dim) for dim in get_config().report_breakdowns if dim in ISSUE_DIMENSIONS}
+
+def issue_table(results) -> ColumnarTable:
+    return results if isinstance(results, ColumnarTable) else ColumnarTable.from_pages(results, ISSUE_DIMENSIONS)
+
+def summarize_technical_issues(results) -> dict:
+    table = issue_table(results)
+    help_only = {"flair": "Help"}
+    statuses = table.counts("status", where=help_only)
+    count_help = table.count(help_only)
     return {
         "count_help": count_help,
-        "status_counts": status_counts,
-        "moderator_response_count": moderator_response_count,
-        "total": total,
-        "other_count": other_count
+        "status_counts": {status: statuses.get(status, 0) for status in TRACKED_STATUSES},
+        "moderator_response_count": table.count({"flair": "Help", "has_response": True}),
+        "total": table.rows,
+        "other_count": table.rows - count_help
     }
 
-async def get_reddit_comments_report(start_iso: str, end_iso: str):
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
-    }
-    response = await notion.databases.query(
-        database_id=NOTION_TECHNICAL_ISSUES_DB.replace("TechnicalIssues", "RedditComments"),
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    return len(results)
-
-async def get_positive_negative_report(start_iso: str, end_iso: str):
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
-    }
-    response = await notion.databases.query(
-        database_id=NOTION_ANALYTICS_DB, filter=filter_body
-    )
-    results = response.get("results", [])
-    count_plus = 0
-    count_minus = 0
-    for page in results:
-        reaction = page.get("properties", {}).get("Reaction", {}).get("select", {})
-        if reaction.get("name") == "👍":
-            count_plus += 1
-        elif reaction.get("name") == "👎":
-            count_minus += 1
-    return count_plus, count_minus
-
-async def get_work_count(start_iso: str, end_iso: str) -> int:
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
-    }
-    response = await notion.databases.query(
-        database_id=NOTION_TECHNICAL_ISSUES_DB, filter=filter_body
-    )
-    results = response.get("results", [])
-    return len(results)
-
-async def get_youtube_comments_report(start_iso: str, end_iso: str):
-    NOTION_YOUTUBE_DB = os.getenv("NOTION_YOUTUBE_DB")
-    if not NOTION_YOUTUBE_DB:
-        return {"total": 0, "authors": {"Ivan": 0, "Arthur": 0, "Denys": 0, "Roman": 0}}
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
+def summarize_reactions(results) -> tuple:
+    table = results if isinstance(results, ColumnarTable) else ColumnarTable.from_pages(results, REACTION_DIMENSIONS)
+    reactions = table.counts("reaction")
+    return reactions.get("👍", 0), reactions.get("👎", 0)
+
+def summarize_youtube_comments(results) -> dict:
+    table = results if isinstance(results, ColumnarTable) else ColumnarTable.from_pages(results, YOUTUBE_DIMENSIONS)
+    authors = table.counts("author")
+    return {"total": table.rows, "authors": {author: authors.get(author, 0) for author in YOUTUBE_AUTHORS}}
+
+def technical_issue_detail(page: dict) -> dict:
+    props = page.get("properties", {})
+    return {
+        "Date": extract_date(props.get("Date")),
+        "Username": extract_title(props.get("Username")),
+        "Title": extract_rich_text(props.get("Title")),
+        "Platform": extract_rich_text(props.get("Platform")),
+        "URL": props.get("URL", {}).get("url", ""),
+        "Description": extract_rich_text(props.get("Description")),
+        "Status": props.get("Status", {}).get("status", {}).get("name", ""),
+        "Email": props.get("Email", {}).get("email", ""),
+        "Responsible moderator": extract_rich_text(props.get("Responsible moderator")),
+        "Response from moderator": extract_rich_text(props.get("Response from moderator"))
     }
-    response = await notion.databases.query(
-        database_id=NOTION_YOUTUBE_DB,
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    total = len(results)
-    authors = {"Ivan": 0, "Arthur": 0, "Denys": 0, "Roman": 0}
-    for page in results:
-        props = page.get("properties", {})
-        author_sel = props.get("Author ( Community Manager )", {}).get("select", {})
-        author_name = author_sel.get("name")
-        if author_name in authors:
-            authors[author_name] += 1
-    return {"total": total, "authors": authors}
-
-async def get_detailed_technical_issues(start_iso: str, end_iso: str) -> list:
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
+
+def youtube_comment_detail(page: dict) -> dict:
+    props = page.get("properties", {})
+    return {
+        "Date": extract_date(props.get("Date")),
+        "Youtube Channel": extract_rich_text(props.get("Youtube Channel")),
+        "Link to the video": props.get("Link to the video", {}).get("url", ""),
+        "Text of the comment": extract_rich_text(props.get("Text of the comment")),
+        "Profile": props.get("Profile", {}).get("select", {}).get("name", ""),
+        "Author ( Community Manager )": props.get("Author ( Community Manager )", {}).get("select", {}).get("name", "")
     }
-    response = await notion.databases.query(
-        database_id=NOTION_TECHNICAL_ISSUES_DB,
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    details = []
-    for page in results:
-        props = page.get("properties", {})
-        details.append({
-            "Date": extract_date(props.get("Date")),
-            "Username": extract_title(props.get("Username")),
-            "Title": extract_rich_text(props.get("Title")),
-            "Platform": extract_rich_text(props.get("Platform")),
-            "URL": props.get("URL", {}).get("url", ""),
-            "Description": extract_rich_text(props.get("Description")),
-            "Status": props.get("Status", {}).get("status", {}).get("name", ""),
-            "Email": props.get("Email", {}).get("email", ""),
-            "Responsible moderator": extract_rich_text(props.get("Responsible moderator")),
-            "Response from moderator": extract_rich_text(props.get("Response from moderator"))
-        })
-    return details
-
-async def get_detailed_youtube_comments(start_iso: str, end_iso: str) -> list:
-    NOTION_YOUTUBE_DB = os.getenv("NOTION_YOUTUBE_DB")
-    if not NOTION_YOUTUBE_DB:
-        return []
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
+
+def reddit_comment_detail(page: dict) -> dict:
+    props = page.get("properties", {})
+    return {
+        "Date": extract_date(props.get("Date")),
+        "Username": extract_title(props.get("Username")),
+        "Comment Text": extract_rich_text(props.get("Comment Text")),
+        "URL": props.get("URL", {}).get("url", "")
     }
-    response = await notion.databases.query(
-        database_id=NOTION_YOUTUBE_DB,
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    details = []
-    for page in results:
-        props = page.get("properties", {})
-        details.append({
-            "Date": extract_date(props.get("Date")),
-            "Youtube Channel": extract_rich_text(props.get("Youtube Channel")),
-            "Link to the video": props.get("Link to the video", {}).get("url", ""),
-            "Text of the comment": extract_rich_text(props.get("Text of the comment")),
-            "Profile": props.get("Profile", {}).get("select", {}).get("name", ""),
-            "Author ( Community Manager )": props.get("Author ( Community Manager )", {}).get("select", {}).get("name", "")
-        })
-    return details
-
-async def get_detailed_reddit_comments(start_iso: str, end_iso: str) -> list:
-    # Получаем ID базы для Reddit-комментариев
-    db_id = NOTION_TECHNICAL_ISSUES_DB.replace("TechnicalIssues", "RedditComments")
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
-        ]
+
+def analytics_detail(page: dict) -> dict:
+    props = page.get("properties", {})
+    return {
+        "Date": extract_date(props.get("Date")),
+        "Title": extract_rich_text(props.get("Title")),
+        "Reaction": props.get("Reaction", {}).get("select", {}).get("name", ""),
+        "URL": props.get("URL", {}).get("url", "")
     }
-    response = await notion.databases.query(
-        database_id=db_id,
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    details = []
-    for page in results:
-        props = page.get("properties", {})
-        details.append({
-            "Date": extract_date(props.get("Date")),
-            "Username": extract_title(props.get("Username")),
-            "Comment Text": extract_rich_text(props.get("Comment Text")),
-            "URL": props.get("URL", {}).get("url", "")
-        })
-    return details
-
-async def get_detailed_analytics(start_iso: str, end_iso: str) -> list:
-    filter_body = {
-        "and": [
-            {"property": "Date", "date": {"on_or_after": start_iso}},
-            {"property": "Date", "date": {"on_or_before": end_iso}}
+
+def detail_sources() -> list:
+    """Разделы подробного отчёта: (источник, заголовок, ID базы, преобразование записи)."""
+    return [
+        ("issues", "Technical Issues", NOTION_TECHNICAL_ISSUES_DB, technical_issue_detail),
+        ("youtube", "YouTube Comments", youtube_db_id(), youtube_comment_detail),
+        ("reddit_comments", "Reddit Comments", reddit_comments_db_id(), reddit_comment_detail),
+        ("analytics", "Analytics", NOTION_ANALYTICS_DB, analytics_detail),
+    ]
+
+# --- Параллельное чтение источников ---
+
+def source_timeout() -> float:
+    return get_config().report_source_timeout
+
+async def _load_source(name: str, loader, timeout: float):
+    started = time.perf_counter()
+    try:
+        result = await loader(timeout)
+        print(f"Источник отчёта {name}: {time.perf_counter() - started:.2f} с")
+        return name, True, result, time.perf_counter() - started
+    except asyncio.TimeoutError:
+        print(f"Источник отчёта {name} не ответил за {timeout:g} с")
+    except Exception as e:
+        print(f"Ошибка источника отчёта {name} ({time.perf_counter() - started:.2f} с): {e}")
+    return name, False, None, time.perf_counter() - started
+
+async def load_sources(loaders: dict, timeout: float = None) -> tuple:
+    """
+    Параллельно выполняет загрузчики {источник: async-функция(срок)}. Срок каждый
+    загрузчик применяет сам и только к сети: догрузку зеркала по сроку перестают
+    ждать, но не отменяют, а записи, уже лежащие в зеркале, читаются всегда.
+    Возвращает (результаты, недоступные источники, задержки в секундах).
+    """
+    timeout = source_timeout() if timeout is None else timeout
+    outcomes = await asyncio.gather(*(_load_source(name, loader, timeout) for name, loader in loaders.items()))
+    results = {name: result for name, ok, result, _ in outcomes if ok}
+    unavailable = {name for name, ok, _, _ in outcomes if not ok}
+    latency = {name: round(elapsed, 3) for name, _, _, elapsed in outcomes}
+    return results, unavailable, latency
+
+async def iter_with_deadline(pages, deadline: float):
+    """Обрывает асинхронный итератор по сроку deadline (время цикла событий) с asyncio.TimeoutError."""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                page = await asyncio.wait_for(pages.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield page
+    finally:
+        await pages.aclose()
+
+# --- Снимок данных для одного отчёта ---
+
+class ReportSnapshot:
+    """
+    Данные всех баз за один период. Каждая база читается из Notion ровно один раз,
+    а краткий отчёт и подробный файл строятся из этого снимка.
+    """
+
+    def __init__(self, start_iso: str, end_iso: str, force_refresh: bool = False):
+        self.start_iso = start_iso
+        self.end_iso = end_iso
+        self.force_refresh = force_refresh
+        self.technical_issues = []
+        self.reddit_comments = []
+        self.youtube_comments = []
+        self.analytics = []
+        self.unavailable = set()
+        self.latency = {}
+        self._tables = {}
+
+    async def _fetch(self, database_id, timeout):
+        return await fetch_pages(database_id, self.start_iso, self.end_iso, self.force_refresh, timeout)
+
+    async def load(self):
+        """Базы читаются параллельно; не успевшие к сроку помечаются в self.unavailable."""
+        loaders = {
+            "issues": lambda timeout: self._fetch(NOTION_TECHNICAL_ISSUES_DB, timeout),
+            "reddit_comments": lambda timeout: self._fetch(reddit_comments_db_id(), timeout),
+            "analytics": lambda timeout: self._fetch(NOTION_ANALYTICS_DB, timeout),
+        }
+        NOTION_YOUTUBE_DB = youtube_db_id()
+        if NOTION_YOUTUBE_DB:
+            loaders["youtube"] = lambda timeout: self._fetch(NOTION_YOUTUBE_DB, timeout)
+        results, self.unavailable, self.latency = await load_sources(loaders)
+        self.technical_issues = results.get("issues", [])
+        self.reddit_comments = results.get("reddit_comments", [])
+        self.youtube_comments = results.get("youtube", [])
+        self.analytics = results.get("analytics", [])
+        self._tables = {}
+        return self
+
+    def _table(self, name, pages, dimensions) -> ColumnarTable:
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = ColumnarTable.from_pages(pages, dimensions)
+        return table
+
+    def issues(self) -> ColumnarTable:
+        """Колонки технических проблем: status, flair, platform, moderator, day, has_response."""
+        return self._table("issues", self.technical_issues, ISSUE_DIMENSIONS)
+
+    def counts(self, dim: str):
+        return self.issues().counts(dim)
+
+    def breakdown(self, *dims: str, where: dict = None):
+        """Произвольная разбивка технических проблем, например breakdown("status", "platform")."""
+        return self.issues().group_counts(*dims, where=where)
+
+    def tech(self) -> dict:
+        return summarize_technical_issues(self.issues())
+
+    def reddit_comments_count(self) -> int:
+        return len(self.reddit_comments)
+
+    def youtube_data(self) -> dict:
+        return summarize_youtube_comments(self._table("youtube", self.youtube_comments, YOUTUBE_DIMENSIONS))
+
+    def pos_neg(self) -> tuple:
+        return summarize_reactions(self._table("analytics", self.analytics, REACTION_DIMENSIONS))
+
+    def work_count(self) -> int:
+        return len(self.technical_issues)
+
+    def detailed_sections(self) -> list:
+        """Разделы подробного отчёта: (источник, заголовок, записи); записи преобразуются лениво."""
+        pages = {"issues": self.technical_issues, "youtube": self.youtube_comments,
+                 "reddit_comments": self.reddit_comments, "analytics": self.analytics}
+        return [
+            (source, title, map(detail, pages[source]))
+            for source, title, _, detail in detail_sources()
         ]
-    }
-    response = await notion.databases.query(
-        database_id=NOTION_ANALYTICS_DB,
-        filter=filter_body
-    )
-    results = response.get("results", [])
-    details = []
-    for page in results:
-        props = page.get("properties", {})
-        details.append({
-            "Date": extract_date(props.get("Date")),
-            "Title": extract_rich_text(props.get("Title")),
-            "Reaction": props.get("Reaction", {}).get("select", {}).get("name", ""),
-            "URL": props.get("URL", {}).get("url", "")
-        })
-    return details
 
+class RollupSnapshot:
+    """
+    Сводка за длинный период (неделя, месяц) из почасовых счётчиков зеркала:
+    вместо всех записей периода читаются суммы по часам и края окна.
+    Интерфейс совпадает с ReportSnapshot в части краткого отчёта.
+    """
+
+    def __init__(self, start_iso: str, end_iso: str):
+        self.start_iso = start_iso
+        self.end_iso = end_iso
+        self.totals = {}
+        self.unavailable = set()
+        self.latency = {}
+
+    @staticmethod
+    def available() -> bool:
+        if mirror is None or mirror.rollups is None:
+            return False
+        return all(db in mirror.rollups for db in (NOTION_TECHNICAL_ISSUES_DB, reddit_comments_db_id(), NOTION_ANALYTICS_DB))
+
+    async def _totals(self, database_id, timeout):
+        if not database_id or database_id not in mirror:
+            return None
+        if not await mirror.refresh(database_id, timeout):
+            raise RuntimeError("зеркало базы ещё не загружено")
+        return await mirror.rollup_totals(database_id, self.start_iso, self.end_iso)
+
+    async def load(self):
+        sources = {"issues": NOTION_TECHNICAL_ISSUES_DB, "reddit_comments": reddit_comments_db_id(),
+                   "youtube": youtube_db_id(), "analytics": NOTION_ANALYTICS_DB}
+        results, self.unavailable, self.latency = await load_sources(
+            {name: (lambda timeout, db=database_id: self._totals(db, timeout))
+             for name, database_id in sources.items()})
+        self.totals = {name: results.get(name) or Counter() for name in sources}
+        return self
+
+    @staticmethod
+    def _by_prefix(totals: Counter, prefix: str) -> Counter:
+        return Counter({metric[len(prefix):]: count for metric, count in totals.items() if metric.startswith(prefix)})
+
+    def counts(self, dim: str) -> Counter:
+        counts = self._by_prefix(self.totals["issues"], f"{dim}=")
+        if dim == "has_response":
+            # В счётчиках значение хранится строкой, ColumnarTable отдаёт bool
+            return Counter({value == "True": count for value, count in counts.items()})
+        return counts
+
+    def tech(self) -> dict:
+        issues = self.totals["issues"]
+        statuses = self._by_prefix(issues, "help_status=")
+        count_help = issues.get("flair=Help", 0)
+        return {
+            "count_help": count_help,
+            "status_counts": {status: statuses.get(status, 0) for status in TRACKED_STATUSES},
+            "moderator_response_count": issues.get("help_response", 0),
+            "total": issues.get("total", 0),
+            "other_count": issues.get("total", 0) - count_help
+        }
+
+    def reddit_comments_count(self) -> int:
+        return self.totals["reddit_comments"].get("total", 0)
+
+    def youtube_data(self) -> dict:
+        youtube = self.totals["youtube"]
+        authors = self._by_prefix(youtube, "author=")
+        return {"total": youtube.get("total", 0), "authors": {author: authors.get(author, 0) for author in YOUTUBE_AUTHORS}}
+
+    def pos_neg(self) -> tuple:
+        reactions = self._by_prefix(self.totals["analytics"], "reaction=")
+        return reactions.get("👍", 0), reactions.get("👎", 0)
+
+    def work_count(self) -> int:
+        return self.totals["issues"].get("total", 0)
 
 # --- Формирование текста отчета ---
 
 def format_report(report_type: str, start_dt: datetime, end_dt: datetime,
                   tech: dict, reddit_comments: int, youtube_data: dict, pos_neg: tuple,
-                  shift_label: str = None, shift_work: int = None) -> str:
+                  shift_label: str = None, shift_work: int = None, breakdowns: dict = None,
+                  unavailable: set = None) -> str:
+    unavailable = unavailable or set()
     period = f"{start_dt.strftime('%d.%m.%Y %H:%M')} – {end_dt.strftime('%d.%m.%Y %H:%M')}"
     lines = []
     lines.append(f"Отчет ({report_type.capitalize()}) за период: {period}\n")
     lines.append("Технические проблемы (Technical Issues):\n")
-    if tech["total"] == 0:
+    if "issues" in unavailable:
+        lines.append(f"  {UNAVAILABLE_TEXT}")
+    elif tech["total"] == 0:
         lines.append("  Нет данных.")
     else:
         lines.append(f'  Постов с флажком "Help" : {tech["count_help"]}')
@@ -289,175 +404,204 @@ def format_report(report_type: str, start_dt: datetime, end_dt: datetime,
             lines.append("")
             lines.append(f"  Работа в {shift_label} смене: {shift_work}")
     lines.append("")
-    lines.append(f"Комментарии в Reddit: {reddit_comments}")
+    lines.append(f"Комментарии в Reddit: {UNAVAILABLE_TEXT if 'reddit_comments' in unavailable else reddit_comments}")
     lines.append("")
     # Добавляем информацию по YouTube комментариям
-    lines.append(f"Комментарии на Youtube: {youtube_data['total']}")
+    lines.append(f"Комментарии на Youtube: {UNAVAILABLE_TEXT if 'youtube' in unavailable else youtube_data['total']}")
     if youtube_data['total'] > 0:
         authors_breakdown = ", ".join(f"{author}: {count}" for author, count in youtube_data["authors"].items())
         lines.append(f"  По авторам: {authors_breakdown}")
     lines.append("")
     plus, minus = pos_neg
     lines.append("Посты с реакциями (Positive/Negative Posts):")
-    lines.append(f"  👍: {plus}")
-    lines.append(f"  👎: {minus}")
-    if tech["total"] == 0 and reddit_comments == 0 and youtube_data["total"] == 0 and plus == 0 and minus == 0:
+    if "analytics" in unavailable:
+        lines.append(f"  {UNAVAILABLE_TEXT}")
+    else:
+        lines.append(f"  👍: {plus}")
+        lines.append(f"  👎: {minus}")
+    # Дополнительные разбивки технических проблем: {измерение: Counter}
+    for dim, counts in (breakdowns or {}).items():
+        if not counts:
+            continue
+        lines.append("")
+        lines.append(f"Технические проблемы по {BREAKDOWN_TITLES.get(dim, dim)}:")
+        for value, count in counts.most_common():
+            lines.append(f"  {value or '—'}: {count}")
+    if unavailable:
+        lines.append(f"\nНедоступные источники: {', '.join(sorted(unavailable))}.")
+    elif tech["total"] == 0 and reddit_comments == 0 and youtube_data["total"] == 0 and plus == 0 and minus == 0:
         lines.append("\nНедостаточно данных для отчета.")
     return "\n".join(lines)
 
-async def create_detailed_report_file(start_iso: str, end_iso: str) -> str:
-    tech = await get_detailed_technical_issues(start_iso, end_iso)
-    youtube = await get_detailed_youtube_comments(start_iso, end_iso)
-    reddit = await get_detailed_reddit_comments(start_iso, end_iso)
-    analytics = await get_detailed_analytics(start_iso, end_iso)
-
-    # Имя файла с отметкой времени
-    filename = f"detailed_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("ПОДРОБНЫЙ ОТЧЁТ\n")
-        f.write(f"Период: {start_iso} - {end_iso}\n\n")
-
-        f.write("=== Technical Issues ===\n")
-        if tech:
-            for item in tech:
-                for key, value in item.items():
-                    f.write(f"{key}: {value}\n")
-                f.write("-" * 40 + "\n")
-        else:
-            f.write("Нет данных.\n")
-        f.write("\n")
-
-        f.write("=== YouTube Comments ===\n")
-        if youtube:
-            for item in youtube:
-                for key, value in item.items():
-                    f.write(f"{key}: {value}\n")
-                f.write("-" * 40 + "\n")
-        else:
-            f.write("Нет данных.\n")
-        f.write("\n")
-
-        f.write("=== Reddit Comments ===\n")
-        if reddit:
-            for item in reddit:
-                for key, value in item.items():
-                    f.write(f"{key}: {value}\n")
-                f.write("-" * 40 + "\n")
-        else:
-            f.write("Нет данных.\n")
-        f.write("\n")
-
-        f.write("=== Analytics ===\n")
-        if analytics:
-            for item in analytics:
-                for key, value in item.items():
-                    f.write(f"{key}: {value}\n")
-                f.write("-" * 40 + "\n")
+async def iter_pages(database_id: str, start_iso: str, end_iso: str, force_refresh: bool = False,
+                     timeout: float = None):
+    """
+    Потоковое чтение записей за период: из зеркала порциями или из Notion по окнам.
+    timeout, как и в fetch_pages, ограничивает только сетевую часть.
+    """
+    if not database_id:
+        return
+    if mirror is not None and database_id in mirror and not force_refresh \
+            and await mirror.refresh(database_id, timeout):
+        async for page in mirror.iter_query(database_id, start_iso, end_iso):
+            yield page
+        return
+    pages = iter_date_range(notion, database_id, start_iso, end_iso)
+    if timeout is not None:
+        pages = iter_with_deadline(pages, asyncio.get_running_loop().time() + timeout)
+    async for page in pages:
+        yield page
+
+async def build_detailed_report(start_iso: str, end_iso: str, snapshot: ReportSnapshot = None,
+                                fmt: str = None, compress: bool = None):
+    """
+    Пишет подробный отчёт в буфер (без файлов на диске) и возвращает (буфер, имя файла).
+    Без снимка записи читаются потоком, так что память не растёт с размером периода.
+    Формат и сжатие по умолчанию берутся из REPORT_DETAIL_FORMAT и REPORT_DETAIL_GZIP.
+    """
+    config = get_config()
+    fmt = fmt or config.report_detail_format
+    if compress is None:
+        compress = config.report_detail_gzip
+    writer = DetailedReportWriter(fmt, compress)
+    try:
+        writer.begin(start_iso, end_iso)
+        if snapshot is not None:
+            for source, section, records in snapshot.detailed_sections():
+                writer.start_section(section)
+                for record in records:
+                    writer.write_record(record)
+                writer.end_section(unavailable=source in snapshot.unavailable)
         else:
-            f.write("Нет данных.\n")
-    return filename
+            # Поток без снимка: у каждого раздела свой срок на сеть, раздел по истечении обрывается
+            for source, section, database_id, detail in detail_sources():
+                writer.start_section(section)
+                started = time.perf_counter()
+                unavailable = False
+                try:
+                    async for page in iter_pages(database_id, start_iso, end_iso, timeout=source_timeout()):
+                        writer.write_record(detail(page))
+                except asyncio.TimeoutError:
+                    unavailable = True
+                    print(f"Раздел {section} подробного отчёта не загрузился к сроку")
+                except Exception as e:
+                    unavailable = True
+                    print(f"Ошибка раздела {section} подробного отчёта: {e}")
+                print(f"Раздел {section}: {time.perf_counter() - started:.2f} с")
+                writer.end_section(unavailable=unavailable)
+        buffer = writer.finish()
+    except Exception:
+        writer.close()
+        raise
+    return buffer, writer.filename(datetime.utcnow().strftime('%Y%m%d_%H%M%S'))
 
 
 # --- Отправка отчета через Telegram ---
 
-async def send_report(report_type: str):
+async def send_report(report_type: str, force_refresh: bool = False):
     if report_type == "night":
         now = datetime.now()
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
         start_dt = today - timedelta(days=1) + timedelta(hours=17)
         end_dt = today + timedelta(hours=4)
         shift_label = "ночную"
-        shift_work = await get_work_count(start_dt.isoformat() + "Z", end_dt.isoformat() + "Z")
     elif report_type == "day":
         now = datetime.now()
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
         start_dt = today + timedelta(hours=4)
         end_dt = today + timedelta(hours=17)
         shift_label = "дневную"
-        shift_work = await get_work_count(start_dt.isoformat() + "Z", end_dt.isoformat() + "Z")
     elif report_type == "weekly":
         now = datetime.utcnow()
         start_dt = now - timedelta(days=7)
         end_dt = now
         shift_label = None
-        shift_work = None
     elif report_type == "monthly":
         now = datetime.utcnow()
         start_dt = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         end_dt = now
         shift_label = None
-        shift_work = None
     else:
         now = datetime.utcnow()
         start_dt = now - timedelta(days=1)
         end_dt = now
         shift_label = None
-        shift_work = None
 
     start_iso = start_dt.isoformat() + "Z"
     end_iso = end_dt.isoformat() + "Z"
 
-    tech = await get_technical_issues_report(start_iso, end_iso)
-    reddit_comments = await get_reddit_comments_report(start_iso, end_iso)
-    youtube_data = await get_youtube_comments_report(start_iso, end_iso)
-    pos_neg = await get_positive_negative_report(start_iso, end_iso)
-    report_text = format_report(report_type, start_dt, end_dt, tech, reddit_comments, youtube_data, pos_neg, shift_label, shift_work)
+    started = time.perf_counter()
+    if report_type in ("weekly", "monthly") and not force_refresh and RollupSnapshot.available():
+        # Длинные периоды считаются по почасовым счётчикам, подробный файл читается потоком
+        snapshot = await RollupSnapshot(start_iso, end_iso).load()
+        detail_snapshot = None
+    else:
+        # Все базы читаются один раз; краткий и подробный отчёты строятся из снимка
+        snapshot = detail_snapshot = await ReportSnapshot(start_iso, end_iso, force_refresh).load()
+    # Работа смены считается за тот же период, что и отчёт
+    shift_work = snapshot.work_count() if shift_label else None
+    report_text = format_report(report_type, start_dt, end_dt, snapshot.tech(), snapshot.reddit_comments_count(),
+                                snapshot.youtube_data(), snapshot.pos_neg(), shift_label, shift_work,
+                                report_breakdowns(snapshot), snapshot.unavailable)
+    metrics.observe_report(report_type, time.perf_counter() - started)
 
     try:
         await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=report_text)
         print(f"{report_type.capitalize()} report sent successfully.")
 
         # Генерация подробного отчета и отправка файла
-        detailed_filename = await create_detailed_report_file(start_iso, end_iso)
-        with open(detailed_filename, "rb") as report_file:
-            await bot.send_document(chat_id=TELEGRAM_CHAT_ID, document=InputFile(report_file, filename=detailed_filename))
+        started = time.perf_counter()
+        report_buffer, detailed_filename = await build_detailed_report(start_iso, end_iso, detail_snapshot)
+        metrics.observe_report(f"{report_type}_detailed", time.perf_counter() - started)
+        # python-telegram-bot всё равно читает файл целиком, а у SpooledTemporaryFile
+        # в памяти нет name, по которому InputFile угадывает имя — передаём байты
+        with report_buffer:
+            document = InputFile(report_buffer.read(), filename=detailed_filename)
+        await bot.send_document(chat_id=TELEGRAM_CHAT_ID, document=document)
         print("Подробный отчет отправлен.")
     except Exception as e:
         print(f"Ошибка при отправке отчета: {e}")
 
-# --- Функции планирования ---
+# --- Расписание отчётов ---
 
-def seconds_until(target: datetime) -> float:
-    now = datetime.now()
-    delta = target - now
-    return max(delta.total_seconds(), 0)
+# Ночной — в 04:00, дневной — в 17:00, недельный — по понедельникам, месячный — первого числа
+REPORT_SCHEDULE = (
+    ("night", "0 4 * * *", CATCH_UP_SKIP),
+    ("day", "0 17 * * *", CATCH_UP_SKIP),
+    ("weekly", "0 17 * * 1", CATCH_UP_ONCE),
+    ("monthly", "0 17 1 * *", CATCH_UP_ONCE),
+)
 
-async def schedule_report(report_type: str, target_hour: int, target_minute: int):
-    while True:
-        now = datetime.now()
-        if report_type in ("night", "day"):
-            # Ежедневно – следующий запуск сегодня/завтра в заданное время
-            next_run = now.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-            if next_run <= now:
-                next_run += timedelta(days=1)
-        elif report_type == "weekly":
-            # Предположим, недельный отчёт должен идти в понедельник в заданное время.
-            # Если сегодня не понедельник, вычисляем следующий понедельник.
-            days_ahead = (0 - now.weekday()) % 7  # 0 = понедельник
-            if days_ahead == 0 and now.time() >= (datetime.min + timedelta(hours=target_hour, minutes=target_minute)).time():
-                days_ahead = 7
-            next_run = (now + timedelta(days=days_ahead)).replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        elif report_type == "monthly":
-            # Ежемесячно – первый день следующего месяца в заданное время.
-            if now.month == 12:
-                next_run = now.replace(year=now.year+1, month=1, day=1, hour=target_hour, minute=target_minute, second=0, microsecond=0)
-            else:
-                next_run = now.replace(month=now.month+1, day=1, hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        wait_sec = seconds_until(next_run)
-        print(f"Next {report_type} report scheduled in {wait_sec:.0f} seconds at {next_run}")
-        await asyncio.sleep(wait_sec)
-        await send_report(report_type)
+def register_report_jobs(scheduler: Scheduler, tz=None):
+    """
+    Регистрирует отчёты в планировщике. Время считается в tz (ZoneInfo), без него —
+    в локальном времени машины. Пропущенные за время простоя недельный и месячный
+    отчёты отправляются после старта; ночной и дневной уходят при запуске и так.
+    """
+    for report_type, expression, catch_up in REPORT_SCHEDULE:
+        scheduler.add_cron(f"report_{report_type}", expression, send_report, report_type, tz=tz, catch_up=catch_up)
 
-# --- Экспортируемая функция для запуска отчетов ---
-async def run_reports():
+async def send_boot_reports():
     print("Отправляю тестовый отчет...")
     await send_report("night")
     await send_report("day")
-    night_task = asyncio.create_task(schedule_report("night", 4, 0))
-    day_task = asyncio.create_task(schedule_report("day", 17, 0))
-    weekly_task = asyncio.create_task(schedule_report("weekly", 17, 0))
-    monthly_task = asyncio.create_task(schedule_report("monthly", 17, 0))
-    await asyncio.gather(night_task, day_task, weekly_task, monthly_task)
+
+# --- Экспортируемая функция для запуска отчетов ---
+async def run_reports(scheduler: Scheduler = None, tz=None, send_on_boot: bool = None):
+    """
+    Регистрирует отчёты в планировщике; без общего планировщика — свой (для отдельного
+    запуска модуля). Отчёты при запуске — только с SEND_REPORTS_ON_BOOT, чтобы
+    перезапуски при деплое не рассылали их каждый раз.
+    """
+    own = scheduler is None
+    scheduler = scheduler or Scheduler()
+    register_report_jobs(scheduler, tz)
+    if send_on_boot is None:
+        send_on_boot = get_config().send_reports_on_boot
+    if send_on_boot:
+        await send_boot_reports()
+    if own:
+        await scheduler.run()
 
 if __name__ == "__main__":
     asyncio.run(run_reports())
@@ -0,0 +1,43 @@
+import re
+import time
+
+from telegram.request import HTTPXRequest
+
+from common.metrics import metrics
+
+# Как у Application.builder() по умолчанию: обработчики команд выполняются параллельно
+CONNECTION_POOL_SIZE = 256
+# getUpdates — длинный опрос: его время — ожидание новых сообщений, а не задержка API
+SKIPPED_METHODS = {"getUpdates"}
+
+
+def method_name(url: str) -> str:
+    """.../bot<токен>/sendMessage -> send_message (как у методов Bot)."""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", url.rsplit("/", 1)[-1]).lower()
+
+
+class MeteredRequest(HTTPXRequest):
+    """
+    HTTPXRequest, который учитывает задержку и ошибки каждого вызова Bot API
+    (метрики telegram/<метод>, 429 — в счётчике ограничений). Подключается к
+    Application и Bot, так что в метриках и уведомления, и отчёты, и ответы
+    обработчиков команд: reply_text, edit_message_text, answer.
+    """
+
+    def __init__(self, connection_pool_size: int = CONNECTION_POOL_SIZE, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        if name in SKIPPED_METHODS:
+            return await super().do_request(url, method, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            metrics.observe_call("telegram", method_name(url), time.perf_counter() - started, error=True)
+            raise
+        metrics.observe_call("telegram", method_name(url), time.perf_counter() - started, error=code >= 400)
+        if code == 429:
+            metrics.count_rate_limited("telegram")
+        return code, payload
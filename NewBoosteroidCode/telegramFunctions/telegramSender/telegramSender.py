@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import time
+from datetime import timedelta
+
+from telegram.error import RetryAfter, TimedOut, NetworkError
+
+# Ограничения Telegram: ~20 сообщений в минуту в группу, 4096 символов в сообщении
+TELEGRAM_MESSAGE_LIMIT = 4096
+RATE_PER_MINUTE = 20
+BURST = 5
+MAX_QUEUE = 500
+MAX_RETRIES = 3
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+class _Outgoing:
+    __slots__ = ("text", "future", "on_sent")
+
+    def __init__(self, text, future, on_sent):
+        self.text = text
+        self.future = future
+        self.on_sent = on_sent
+
+
+class _ChatState:
+    def __init__(self, burst):
+        self.queue = collections.deque()
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.worker = None
+
+
+class TelegramSender:
+    """
+    Очередь исходящих сообщений по чатам. Пока лимит чата не исчерпан, сообщение
+    уходит сразу; при всплеске накопившиеся сообщения склеиваются в дайджесты
+    до 4096 символов. Соблюдает retry_after от Telegram.
+    """
+
+    def __init__(self, bot, rate_per_minute: float = RATE_PER_MINUTE, burst: int = BURST,
+                 max_queue: int = MAX_QUEUE, max_retries: int = MAX_RETRIES):
+        self.bot = bot
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._chats = {}
+        self.stats = {
+            "queued": 0,
+            "sent_messages": 0,
+            "delivered_items": 0,
+            "digests": 0,
+            "merged_items": 0,
+            "dropped": 0,
+            "retries": 0,
+            "flood_waits": 0,
+        }
+
+    def enqueue(self, chat_id, text: str, on_sent=None) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь чата. Возвращает future с отправленным
+        telegram.Message (или None, если сообщение пришлось отбросить).
+        on_sent(message) вызывается после доставки.
+        """
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState(self.burst)
+        future = asyncio.get_running_loop().create_future()
+        if len(state.queue) >= self.max_queue:
+            dropped = state.queue.popleft()
+            self._resolve(dropped, None)
+            self.stats["dropped"] += 1
+        state.queue.append(_Outgoing(text, future, on_sent))
+        self.stats["queued"] += 1
+        if state.worker is None or state.worker.done():
+            state.worker = asyncio.create_task(self._worker(chat_id, state))
+        return future
+
+    async def send(self, chat_id, text: str, on_sent=None):
+        return await self.enqueue(chat_id, text, on_sent)
+
+    def queue_depth(self) -> dict:
+        return {chat_id: len(state.queue) for chat_id, state in self._chats.items()}
+
+    def snapshot(self) -> dict:
+        stats = dict(self.stats)
+        stats["queue_depth"] = self.queue_depth()
+        return stats
+
+    # --- Внутреннее ---
+
+    def _resolve(self, item, message):
+        if not item.future.done():
+            item.future.set_result(message)
+        if message is not None and item.on_sent is not None:
+            try:
+                item.on_sent(message)
+            except Exception as e:
+                print(f"Ошибка в обработчике отправленного сообщения: {e}")
+
+    async def _wait_for_token(self, state):
+        while True:
+            now = time.monotonic()
+            if now < state.blocked_until:
+                await asyncio.sleep(state.blocked_until - now)
+                continue
+            state.tokens = min(float(self.burst), state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            if state.tokens >= 1:
+                state.tokens -= 1
+                return
+            await asyncio.sleep((1 - state.tokens) / self.rate)
+
+    @staticmethod
+    def _fit(text: str) -> str:
+        if len(text) <= TELEGRAM_MESSAGE_LIMIT:
+            return text
+        return text[:TELEGRAM_MESSAGE_LIMIT - 1] + "…"
+
+    def _take_batch(self, state) -> list:
+        """Первое сообщение очереди и все следующие, что помещаются в один дайджест."""
+        batch = [state.queue.popleft()]
+        length = len(self._fit(batch[0].text))
+        while state.queue:
+            extra = len(DIGEST_SEPARATOR) + len(state.queue[0].text)
+            if length + extra > TELEGRAM_MESSAGE_LIMIT:
+                break
+            length += extra
+            batch.append(state.queue.popleft())
+        return batch
+
+    @staticmethod
+    def _retry_after_seconds(error: RetryAfter) -> float:
+        retry_after = error.retry_after
+        if isinstance(retry_after, timedelta):
+            return retry_after.total_seconds()
+        return float(retry_after)
+
+    async def _worker(self, chat_id, state):
+        while state.queue:
+            await self._wait_for_token(state)
+            if not state.queue:
+                break
+            batch = self._take_batch(state)
+            if len(batch) == 1:
+                text = self._fit(batch[0].text)
+            else:
+                text = DIGEST_SEPARATOR.join(item.text for item in batch)
+            message = None
+            # Задержку и ошибки вызовов учитывает MeteredRequest бота
+            for attempt in range(self.max_retries + 1):
+                try:
+                    message = await self.bot.send_message(chat_id=chat_id, text=text)
+                    break
+                except RetryAfter as e:
+                    delay = self._retry_after_seconds(e)
+                    self.stats["flood_waits"] += 1
+                    state.blocked_until = time.monotonic() + delay
+                    print(f"Telegram просит подождать {delay:.0f} с перед отправкой в {chat_id}")
+                    await self._wait_for_token(state)
+                except (TimedOut, NetworkError) as e:
+                    if attempt >= self.max_retries:
+                        print(f"Ошибка при отправке уведомления в Telegram: {e}")
+                        break
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(2 ** attempt)
+                except Exception as e:
+                    print(f"Ошибка при отправке уведомления в Telegram: {e}")
+                    break
+            if message is None:
+                self.stats["dropped"] += len(batch)
+            else:
+                self.stats["sent_messages"] += 1
+                self.stats["delivered_items"] += len(batch)
+                if len(batch) > 1:
+                    self.stats["digests"] += 1
+                    self.stats["merged_items"] += len(batch)
+            for item in batch:
+                self._resolve(item, message)
+
+
+_sender = None
+
+
+def init_telegram_sender(bot, rate_per_minute: float = RATE_PER_MINUTE) -> TelegramSender:
+    """Создаёт общий отправитель уведомлений. Вызывается из main.py."""
+    global _sender
+    _sender = TelegramSender(bot, rate_per_minute=rate_per_minute)
+    return _sender
+
+
+def get_telegram_sender():
+    return _sender
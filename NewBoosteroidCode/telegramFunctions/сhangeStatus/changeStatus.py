@@ -2,9 +2,13 @@ import asyncio
 import datetime
 import logging
 import re
-import os
 
 from notion_client import AsyncClient
+from common.config.config import get_config
+from notion.notionQuery.notionQuery import iter_database
+from notion.notionRateLimiter.notionRateLimiter import rate_limited, INTERACTIVE
+from telegramFunctions.resultCache.resultCache import ResultCursorCache
+from telegramFunctions.telegramRequest.telegramRequest import MeteredRequest
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -18,31 +22,58 @@ from telegram.ext import (
 
 # Настройка логирования
 
+# Сколько команда ждёт догрузки зеркала, прежде чем искать по уже сохранённым записям
+MIRROR_REFRESH_TIMEOUT = 5.0
+
 
 def create_notion_client(NOTION_TOKEN):
-    return AsyncClient(auth=NOTION_TOKEN)
+    # Команды модераторов идут вперёд фоновой загрузки в общей очереди Notion
+    return rate_limited(AsyncClient(auth=NOTION_TOKEN), INTERACTIVE)
+
+def _plain_text(prop: dict, kind: str) -> str:
+    return "".join(
+        item.get("plain_text") or item.get("text", {}).get("content", "")
+        for item in (prop or {}).get(kind, [])
+    )
 
-async def fetch_recent_posts(query: str, notion, NOTION_TECHNICAL_ISSUES_DB):
+async def fetch_recent_posts(query: str, notion, NOTION_TECHNICAL_ISSUES_DB, mirror=None, search_index=None,
+                             limit: int = None, fuzzy: bool = True):
     """
     Ищет записи в Notion за последние 7 дней, содержащие ключевые слова в Title (тип Text)
-    или в Username (тип Title).
+    или в Username (тип Title). Если есть индекс поиска, ответ берётся из памяти
+    (с ранжированием и нечётким совпадением), иначе — из локального зеркала базы.
+    limit=None — все найденные записи (их листает курсор результатов);
+    fuzzy=False — только точные вхождения (зеркало и Notion нечётко не ищут).
     """
-    since = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=7)).isoformat()
-    response = await notion.databases.query(
-        database_id=NOTION_TECHNICAL_ISSUES_DB,
-        filter={
-            "and": [
-                {"property": "Date", "date": {"after": since}},
-                {
-                    "or": [
-                        {"property": "Title", "rich_text": {"contains": query}},
-                        {"property": "Username", "title": {"contains": query}}
-                    ]
-                }
-            ]
-        },
-    )
-    return response.get("results", [])
+    if search_index is not None and search_index.refreshed_at is not None:
+        return search_index.search(query, limit=limit, fuzzy=fuzzy)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    since = (now - datetime.timedelta(days=7)).isoformat()
+    if mirror is not None and NOTION_TECHNICAL_ISSUES_DB in mirror \
+            and await mirror.refresh(NOTION_TECHNICAL_ISSUES_DB, MIRROR_REFRESH_TIMEOUT):
+        pages = await mirror.query(NOTION_TECHNICAL_ISSUES_DB, since, now.isoformat())
+        needle = query.casefold()
+        return [
+            page for page in reversed(pages)
+            if needle in _plain_text(page["properties"].get("Title"), "rich_text").casefold()
+            or needle in _plain_text(page["properties"].get("Username"), "title").casefold()
+        ][:limit]
+    posts = []
+    async for page in iter_database(notion, NOTION_TECHNICAL_ISSUES_DB, filter={
+        "and": [
+            {"property": "Date", "date": {"after": since}},
+            {
+                "or": [
+                    {"property": "Title", "rich_text": {"contains": query}},
+                    {"property": "Username", "title": {"contains": query}}
+                ]
+            }
+        ]
+    }):
+        posts.append(page)
+        if limit is not None and len(posts) >= limit:
+            break
+    return posts
 
 async def update_post_status(notion, page_id: str, new_status: str):
     """Обновляет статус выбранного поста (поле Status типа Status)."""
@@ -68,30 +99,6 @@ async def update_post_email(notion, page_id: str, new_email: str):
 
 # --- Новые функции для изменения флажка ---
 
-async def handle_change_flair(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Обрабатывает команду /changeflair.
-    Ищет посты по ключевому слову (в Title или Username) за последние 7 дней и предлагает список найденных записей.
-    При выборе записи (callback_data вида "cfp_<page_id>") пользователь перейдет к выбору нового флажка.
-    """
-    query = " ".join(context.args)
-    notion_inst = context.bot_data["notion"]
-    NOTION_TECHNICAL_ISSUES_DB = context.bot_data["NOTION_TECHNICAL_ISSUES_DB"]
-    posts = await fetch_recent_posts(query, notion_inst, NOTION_TECHNICAL_ISSUES_DB)
-    if not posts:
-        await update.message.reply_text("Записи не найдены.")
-        return
-    keyboard = [
-        [InlineKeyboardButton(
-            post["properties"].get("Title", {}).get("rich_text", [{}])[0]
-                .get("text", {}).get("content", "(Без названия)"),
-            callback_data=f"cfp_{post['id']}"
-        )]
-        for post in posts
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Выберите запись для изменения флажка:", reply_markup=reply_markup)
-
 async def update_post_flair(notion, page_id: str, new_flair: str):
     """Обновляет флажок (Post Flair) выбранного поста."""
     try:
@@ -103,47 +110,78 @@ async def update_post_flair(notion, page_id: str, new_flair: str):
     except Exception as e:
         return f"Произошла ошибка при обновлении флажка: {e}"
 
-# --- Существующие функции (для смены статуса и email) остаются без изменений ---
+# --- Поиск записей с листанием результатов ---
 
-async def handle_change_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = " ".join(context.args)
-    notion_inst = context.bot_data["notion"]
-    NOTION_TECHNICAL_ISSUES_DB = context.bot_data["NOTION_TECHNICAL_ISSUES_DB"]
+RESULTS_PAGE_SIZE = 8
+SEARCH_PROMPTS = {
+    "csp": "Выберите запись для изменения статуса:",
+    "cep": "Выберите запись для изменения email:",
+    "cfp": "Выберите запись для изменения флажка:",
+}
 
-    posts = await fetch_recent_posts(query, notion_inst, NOTION_TECHNICAL_ISSUES_DB)
-    if not posts:
-        await update.message.reply_text("Записи не найдены.")
-        return
+def get_result_cache(context: ContextTypes.DEFAULT_TYPE) -> ResultCursorCache:
+    cache = context.bot_data.get("result_cache")
+    if cache is None:
+        cache = context.bot_data["result_cache"] = ResultCursorCache()
+    return cache
+
+def post_title(post: dict) -> str:
+    title = _plain_text(post["properties"].get("Title"), "rich_text").strip()
+    return title[:60] or "(Без названия)"
+
+def build_results_keyboard(cursor, action: str, page: int) -> InlineKeyboardMarkup:
+    """Страница результатов: кнопки записей (<action>_<page_id>) и листание (pg|<токен>|<страница>)."""
+    pages = max(1, -(-len(cursor.rows) // RESULTS_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * RESULTS_PAGE_SIZE
     keyboard = [
-        [InlineKeyboardButton(
-            post["properties"].get("Title", {}).get("rich_text", [{}])[0]
-                .get("text", {}).get("content", "(Без названия)"),
-            callback_data=f"csp_{post['id']}"
-        )]
-        for post in posts
+        [InlineKeyboardButton(title, callback_data=f"{action}_{page_id}")]
+        for page_id, title in cursor.rows[start:start + RESULTS_PAGE_SIZE]
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Выберите запись для изменения статуса:", reply_markup=reply_markup)
-
-async def handle_change_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"pg|{cursor.token}|{page - 1}"))
+        nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"pg|{cursor.token}|-"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"pg|{cursor.token}|{page + 1}"))
+        keyboard.append(nav)
+    return InlineKeyboardMarkup(keyboard)
+
+async def _handle_search(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str):
+    """
+    Общая часть /changestatus, /changeemail и /changeflair: ищет записи по ключевому
+    слову (в Title или Username) за последние 7 дней. Результат кешируется на чат и
+    запрос, повтор команды и листание страниц не обращаются к Notion.
+    """
     query = " ".join(context.args)
-    notion_inst = context.bot_data["notion"]
-    NOTION_TECHNICAL_ISSUES_DB = context.bot_data["NOTION_TECHNICAL_ISSUES_DB"]
-
-    posts = await fetch_recent_posts(query, notion_inst, NOTION_TECHNICAL_ISSUES_DB)
-    if not posts:
+    cache = get_result_cache(context)
+    chat_id = update.effective_chat.id
+    cursor = cache.get(chat_id, action, query)
+    if cursor is None:
+        notion_inst = context.bot_data["notion"]
+        NOTION_TECHNICAL_ISSUES_DB = context.bot_data["NOTION_TECHNICAL_ISSUES_DB"]
+        # Курсор листает результаты постранично, поэтому в него попадают все совпадения
+        posts = await fetch_recent_posts(query, notion_inst, NOTION_TECHNICAL_ISSUES_DB, context.bot_data.get("mirror"),
+                                         context.bot_data.get("search_index"), limit=None)
+        cursor = cache.put(chat_id, action, query, [(post["id"], post_title(post)) for post in posts])
+    if not cursor.rows:
         await update.message.reply_text("Записи не найдены.")
         return
-    keyboard = [
-        [InlineKeyboardButton(
-            post["properties"].get("Title", {}).get("rich_text", [{}])[0]
-                .get("text", {}).get("content", "(Без названия)"),
-            callback_data=f"cep_{post['id']}"
-        )]
-        for post in posts
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Выберите запись для изменения email:", reply_markup=reply_markup)
+    await update.message.reply_text(SEARCH_PROMPTS[action], reply_markup=build_results_keyboard(cursor, action, 0))
+
+async def handle_change_flair(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обрабатывает команду /changeflair.
+    При выборе записи (callback_data вида "cfp_<page_id>") пользователь перейдет к выбору нового флажка.
+    """
+    await _handle_search(update, context, "cfp")
+
+async def handle_change_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _handle_search(update, context, "csp")
+
+async def handle_change_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _handle_search(update, context, "cep")
 
 # --- Обработчик callback-запросов ---
 
@@ -153,7 +191,19 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = query.data
     notion_inst = context.bot_data["notion"]
 
-    if data.startswith("csp_"):
+    if data.startswith("pg|"):
+        # Листание сохранённого результата поиска
+        parts = data.split("|", 2)
+        cursor = get_result_cache(context).by_token(parts[1]) if len(parts) == 3 else None
+        if cursor is None:
+            await query.edit_message_text("Результаты поиска устарели, повторите команду.")
+            return
+        if not parts[2].isdigit():
+            return  # кнопка с номером страницы ничего не делает
+        action = cursor.key[1]
+        await query.edit_message_reply_markup(reply_markup=build_results_keyboard(cursor, action, int(parts[2])))
+
+    elif data.startswith("csp_"):
         page_id = data[len("csp_"):]
         keyboard = [
             [InlineKeyboardButton(status, callback_data=f"ss|{page_id}|{STATUS_CODES[status]}")]
@@ -184,10 +234,9 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data.startswith("cfp_"):
         # Пользователь выбрал запись для изменения флажка.
         page_id = data[len("cfp_"):]
-        flairs = ["Help", "Discussion", "Suggestion", "Misc", "Gameplay", "Feedback"]
         keyboard = [
             [InlineKeyboardButton(fl, callback_data=f"cf|{page_id}|{fl}")]
-            for fl in flairs
+            for fl in FLAIRS
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text("Выберите новый флажок:", reply_markup=reply_markup)
@@ -227,6 +276,7 @@ STATUS_CODES = {
     "Solved": "S",
 }
 CODES_STATUS = {v: k for k, v in STATUS_CODES.items()}
+FLAIRS = ["Help", "Discussion", "Suggestion", "Misc", "Gameplay", "Feedback"]
 
 ADD_YC_CHANNEL, ADD_YC_LINK, ADD_YC_COMMENT, ADD_YC_PROFILE, ADD_YC_AUTHOR = range(5)
 
@@ -277,7 +327,7 @@ async def add_yc_author(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     context.user_data["add_yc_author"] = author
 
     notion_inst = context.bot_data["notion"]
-    NOTION_YOUTUBE_DB = os.getenv("NOTION_YOUTUBE_DB")
+    NOTION_YOUTUBE_DB = get_config().notion_youtube_db
     if not NOTION_YOUTUBE_DB:
         await query.edit_message_text("Не настроена база данных для Youtube комментариев.")
         return ConversationHandler.END
@@ -323,7 +373,7 @@ async def add_yc_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
 # --- Команда для запуска бота команд ---
 async def start_telegram_commands_bot(NOTION_TOKEN, TELEGRAM_BOT_TOKEN, NOTION_TECHNICAL_ISSUES_DB):
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    app = Application.builder().token(TELEGRAM_BOT_TOKEN).request(MeteredRequest()).build()
     await app.bot.delete_webhook(drop_pending_updates=True)
     notion_inst = create_notion_client(NOTION_TOKEN)
     app.bot_data["notion"] = notion_inst